@@ -1,25 +1,228 @@
 # actions/actions.py (V11 - ENHANCED OLLAMA INTEGRATION)
-print("\n[ACTIONS.PY] --- Loading actions.py (V11 - Enhanced Ollama) ---")
 
 from typing import Any, Text, Dict, List
 from rasa_sdk import Action, Tracker
 from rasa_sdk.executor import CollectingDispatcher
 from rasa_sdk.events import SlotSet, BotUttered
+import asyncio
 import json
 import sqlite3
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import os
 import re
-
-print("[ACTIONS.PY] All imports successful.")
+import socket
+import threading
+import time
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.connection import HTTPConnection, HTTPSConnection
+
+from common import metrics
+from common.ambiguity import detect as detect_ambiguity, llm_hint, record as record_ambiguity
+from common.capture import Capture
+from common.contradictions import check_requirement, record as record_contradictions
+from common.dedupe import content_hash, find_duplicate, index_requirement, record_merge
+from common.embeddings import get_embedder, to_blob
+from common.log import get_logger
+from common.tracing import Tracer, current_span
+from common.pool import EndpointPool
+from common.quantities import extract as extract_values, record as record_values
+from common.router import ModelRouter, turn_complexity
+from common.triage import classify_turn, local_reply
+from common.turns import is_superseded, count_cancelled
+from common.warmup import ModelWarmer
+
+log = get_logger("actions")
 
 # ============================================
 # OLLAMA & DB CONFIG
 # ============================================
 OLLAMA_API_URL = "http://localhost:11434/api/chat"
+# Ollama servers to balance across, as comma-separated base URLs. Each sender
+# sticks to one server (prompt cache reuse) unless it is down or overloaded.
+OLLAMA_ENDPOINTS = os.environ.get("OLLAMA_ENDPOINTS", OLLAMA_API_URL.rsplit("/api/", 1)[0]).split(",")
 OLLAMA_MODEL = "phi3:mini"
 OLLAMA_TIMEOUT = 120 
 DB_PATH = "requirements.db"
+TRACE_DB_PATH = "traces.db"
+
+# How long Ollama keeps the model loaded after a request ("30m", "1h", -1 = forever).
+# The warmer preloads the model at startup and pings it OLLAMA_KEEP_WARM_MARGIN
+# seconds before it would unload; OLLAMA_WARMUP=0 turns both off.
+OLLAMA_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+OLLAMA_KEEP_WARM_MARGIN = 30.0
+OLLAMA_WARMUP = os.environ.get("OLLAMA_WARMUP", "1") != "0"
+
+# Models the router picks from per turn, smallest first ("phi3:mini,llama3.1:8b").
+# A single model disables routing. Above ROUTER_TTFT_TARGET seconds to first
+# token, turns are shifted toward the smaller models.
+OLLAMA_MODEL_LADDER = os.environ.get("OLLAMA_MODEL_LADDER", OLLAMA_MODEL).split(",")
+ROUTER_TTFT_TARGET = 4.0
+
+# Prompt history: at most HISTORY_WINDOW messages. Ollama reuses its cache
+# for the longest prefix shared with the previous request, so the window
+# start advances HISTORY_BLOCK messages at a time instead of one per turn.
+HISTORY_WINDOW = 20
+HISTORY_BLOCK = 8
+
+# How often (seconds) a generation checks whether a newer message has
+# arrived for the same session: between streamed chunks, and from a watcher
+# thread while Ollama queues the request or evaluates the prompt.
+CANCEL_POLL_INTERVAL = 0.25
+
+# Actions are async: the blocking work (Ollama, SQLite) runs on a pool of
+# ACTION_THREADS threads, so the action server's event loop keeps accepting
+# calls while turns generate. Further turns queue for a free thread.
+ACTION_THREADS = int(os.environ.get("ACTION_THREADS", "8"))
+
+# Acknowledgements ("ok", "sounds good") and phase endings ("that's all") are
+# answered from templates without calling the model; LOCAL_TRIAGE=0 sends
+# every turn to the LLM.
+LOCAL_TRIAGE = os.environ.get("LOCAL_TRIAGE", "1") != "0"
+
+# ============================================
+# METRICS (served at http://localhost:5056/metrics)
+# ============================================
+# 0 skips the side server: common/action_server.py workers serve /metrics
+# on their own port instead.
+METRICS_PORT = int(os.environ.get("ACTIONS_METRICS_PORT", "5056"))
+
+ACTION_RUNS = metrics.counter(
+    "actions_runs_total", "Custom action invocations", ["action"])
+ACTIONS_IN_FLIGHT = metrics.gauge(
+    "actions_in_flight", "Custom actions currently executing")
+ACTIONS_WAITING = metrics.gauge(
+    "actions_waiting", "Custom actions queued for a free action thread")
+HISTORY_BUILD = metrics.histogram(
+    "actions_history_build_seconds", "Time to build conversation history from the tracker")
+OLLAMA_REQUEST = metrics.histogram(
+    "actions_ollama_request_seconds", "Wall-clock time of the Ollama /api/chat call")
+OLLAMA_IN_FLIGHT = metrics.gauge(
+    "actions_ollama_in_flight", "Ollama requests currently open")
+# Reported by Ollama itself in the final response chunk (nanoseconds -> seconds)
+OLLAMA_DURATIONS = {
+    field: metrics.histogram(f"actions_ollama_{name}_seconds", f"Ollama-reported {field}")
+    for field, name in (
+        ("total_duration", "total"),
+        ("load_duration", "load"),
+        ("prompt_eval_duration", "prompt_eval"),
+        ("eval_duration", "eval"),
+    )
+}
+JSON_PARSE = metrics.histogram(
+    "actions_json_parse_seconds", "Time to extract JSON from the LLM reply")
+DB_WRITE = metrics.histogram(
+    "actions_db_write_seconds", "SQLite write latency for saved analysis")
+
+TRACER = Tracer("action_server", TRACE_DB_PATH)
+CAPTURE = Capture("action_server")
+
+ROUTER = ModelRouter(OLLAMA_MODEL_LADDER, ttft_target=ROUTER_TTFT_TARGET)
+
+OLLAMA_POOL = EndpointPool("ollama", OLLAMA_ENDPOINTS, health_path="/")
+
+# Ollama request being sent on this thread; its connection is recorded so a
+# watcher can close it before the first chunk arrives
+_OLLAMA_REQUEST = threading.local()
+
+
+class _TrackedConnection:
+    def request(self, *args, **kwargs):
+        watch = getattr(_OLLAMA_REQUEST, "watch", None)
+        if watch is not None:
+            watch.connection = self
+        return super().request(*args, **kwargs)
+
+
+class _TrackedHTTPConnection(_TrackedConnection, HTTPConnection):
+    pass
+
+
+class _TrackedHTTPSConnection(_TrackedConnection, HTTPSConnection):
+    pass
+
+
+class _TrackedHTTPPool(HTTPConnectionPool):
+    ConnectionCls = _TrackedHTTPConnection
+
+
+class _TrackedHTTPSPool(HTTPSConnectionPool):
+    ConnectionCls = _TrackedHTTPSConnection
+
+
+class CancellableAdapter(HTTPAdapter):
+    """HTTPAdapter whose connections can be closed mid-request by a CancelWatch."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _TrackedHTTPPool, "https": _TrackedHTTPSPool}
+
+
+class CancelWatch:
+    """
+    Polls should_cancel() until stop(); on cancellation shuts down the
+    request's socket, so Ollama drops the request even while it is still
+    queued or evaluating the prompt and nothing has been streamed yet.
+    """
+
+    def __init__(self, should_cancel):
+        self.should_cancel = should_cancel
+        self.connection = None
+        self.cancelled = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="ollama-cancel-watch", daemon=True)
+
+    def __enter__(self):
+        _OLLAMA_REQUEST.watch = self
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+        _OLLAMA_REQUEST.watch = None
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.wait(CANCEL_POLL_INTERVAL):
+            if self.should_cancel():
+                self.cancelled.set()
+                sock = getattr(self.connection, "sock", None)
+                if sock is not None:
+                    try:
+                        sock.shutdown(socket.SHUT_RDWR)
+                    except OSError:
+                        pass
+                return
+
+
+# One keep-alive connection pool for every Ollama call in this process
+OLLAMA_HTTP = requests.Session()
+for _scheme in ("http://", "https://"):
+    OLLAMA_HTTP.mount(_scheme, CancellableAdapter(pool_connections=len(OLLAMA_ENDPOINTS),
+                                                  pool_maxsize=ACTION_THREADS))
+
+ACTION_EXECUTOR = ThreadPoolExecutor(max_workers=ACTION_THREADS, thread_name_prefix="action")
+
+# One warmer per Ollama server, keeping the smallest ladder model resident
+WARMERS = {
+    endpoint.url: ModelWarmer(endpoint.url, OLLAMA_MODEL_LADDER[0],
+                              keep_alive=OLLAMA_KEEP_ALIVE, margin=OLLAMA_KEEP_WARM_MARGIN)
+    for endpoint in OLLAMA_POOL.endpoints
+}
+if OLLAMA_WARMUP:
+    for warmer in WARMERS.values():
+        warmer.start()
+
+if METRICS_PORT:
+    try:
+        metrics.start_metrics_server(METRICS_PORT)
+        log.info("metrics.serving", port=METRICS_PORT)
+    except OSError as e:
+        log.warning("metrics.unavailable", port=METRICS_PORT, error=str(e))
 
 # ============================================
 # SYSTEM PROMPTS WITH EXAMPLES
@@ -133,25 +336,192 @@ def get_db_connection():
     conn.row_factory = sqlite3.Row
     return conn
 
-def get_conversation_history(tracker: Tracker) -> List[Dict[str, str]]:
-    """Extract recent conversation history from Rasa tracker."""
-    print("[HISTORY] Building conversation history...")
-    history = []
-    
-    # Get events in reverse to collect recent messages
-    for event in reversed(tracker.events):
+async def run_in_action_thread(fn, *args):
+    """Run blocking action code on the action thread pool, off the event loop."""
+    ACTIONS_WAITING.inc()
+
+    def call():
+        ACTIONS_WAITING.dec()
+        return fn(*args)
+
+    return await asyncio.get_running_loop().run_in_executor(ACTION_EXECUTOR, call)
+
+def get_conversation_history(tracker: Tracker, window: int = None, block: int = None) -> List[Dict[str, str]]:
+    """
+    Extract recent conversation history from Rasa tracker, ending with the
+    latest user message. Assistant turns are replayed exactly as the model
+    generated them (kept in the bot event metadata), and the window start only
+    moves in steps of `block` messages, so consecutive prompts share a prefix.
+    """
+    window = window or HISTORY_WINDOW
+    block = block or HISTORY_BLOCK
+    messages = []
+    for event in tracker.events:
         if event['event'] == 'user':
-            history.insert(0, {"role": "user", "content": event['text']})
-        elif event['event'] == 'bot':
-            if event.get('text'):
-                history.insert(0, {"role": "assistant", "content": event['text']})
-        
-        # Keep last 10 exchanges to avoid token limits
-        if len(history) >= 20:
-            break
+            messages.append({"role": "user", "content": event['text']})
+        elif event['event'] == 'bot' and event.get('text'):
+            raw = (event.get('metadata') or {}).get('llm_raw')
+            messages.append({"role": "assistant", "content": raw or event['text']})
+    
+    # Keep at most `window` messages to avoid token limits
+    if len(messages) > window:
+        start = -(-(len(messages) - window) // block) * block
+        messages = messages[start:]
     
-    print(f"[HISTORY] Found {len(history)} messages.")
-    return history
+    log.debug("history.built", sample=0.1, messages=len(messages))
+    return messages
+
+class GenerationCancelled(Exception):
+    """Raised when a newer message supersedes the turn being generated."""
+
+def get_turn_info(tracker: Tracker):
+    """Return (session_key, turn_seq) passed by the backend in message metadata."""
+    metadata = tracker.latest_message.get("metadata") or {}
+    return metadata.get("session_key"), metadata.get("turn_seq")
+
+def get_trace_context(tracker: Tracker):
+    """Return (trace_id, parent_span_id) propagated by the backend, if any."""
+    metadata = tracker.latest_message.get("metadata") or {}
+    return metadata.get("trace_id"), metadata.get("parent_span_id")
+
+def turn_superseded(session_key, turn_seq) -> bool:
+    """True if the backend has registered a newer message for this session."""
+    if not session_key or not turn_seq:
+        return False
+    try:
+        conn = get_db_connection()
+        try:
+            return is_superseded(conn, session_key, turn_seq)
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        log.warning("cancel.check_failed", error=str(e))
+        return False
+
+def stream_ollama_chat(payload: Dict[str, Any], should_cancel, sticky_key=None):
+    """
+    Stream a chat completion from the Ollama pool.
+    Returns (content, stats) where stats is the final chunk carrying Ollama's
+    token counts and durations. Raises GenerationCancelled (and closes the
+    stream, which makes Ollama stop generating) as soon as should_cancel()
+    returns True. A server that refuses the connection or drops it
+    mid-stream is skipped and the next best one is tried.
+    """
+    tried = []
+    while True:
+        try:
+            with OLLAMA_POOL.acquire(sticky_key, exclude=tried, ignore=GenerationCancelled) as endpoint:
+                content, stats = _stream_from(endpoint.url, payload, should_cancel)
+            # Only the warmed model's requests say it is loaded and keep it in use
+            warmer = WARMERS[endpoint.url]
+            if payload.get("model") == warmer.model:
+                warmer.touch(stats)
+            return content, stats
+        except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError) as e:
+            # Refused, or dropped mid-stream: generation has no side effects, so retry elsewhere
+            tried.append(endpoint)
+            if len(tried) >= len(OLLAMA_POOL.endpoints):
+                raise
+            log.warning("ollama.failover", endpoint=endpoint.url, error=str(e))
+
+def _stream_from(base_url, payload, should_cancel):
+    with TRACER.span("ollama.chat", model=payload.get("model"), endpoint=base_url) as span, \
+            OLLAMA_REQUEST.time(), OLLAMA_IN_FLIGHT.track_inprogress():
+        started = time.monotonic()
+        first_chunk = True
+        with CancelWatch(should_cancel) as watch:
+            try:
+                response = OLLAMA_HTTP.post(
+                    f"{base_url}/api/chat",
+                    data=json.dumps(payload),
+                    headers={"Content-Type": "application/json", "X-Trace-Id": span.trace_id},
+                    timeout=OLLAMA_TIMEOUT,
+                    stream=True
+                )
+                try:
+                    response.raise_for_status()
+                    parts = []
+                    stats = {}
+                    last_check = time.monotonic()
+                    for line in response.iter_lines():
+                        if not line:
+                            continue
+                        chunk = json.loads(line)
+                        if first_chunk:
+                            # Includes queueing inside Ollama; drives the router's load shift
+                            first_chunk = False
+                            watch.stop()
+                            ttft = time.monotonic() - started
+                            span.set(ttft_ms=round(ttft * 1000, 1))
+                            ROUTER.observe_ttft(ttft)
+                        parts.append(chunk.get("message", {}).get("content", ""))
+                        if chunk.get("done"):
+                            stats = chunk
+                            span.set(**{k: v for k, v in chunk.items() if k.endswith(("_count", "_duration"))})
+                            break
+                        now = time.monotonic()
+                        if now - last_check >= CANCEL_POLL_INTERVAL:
+                            last_check = now
+                            if should_cancel():
+                                raise GenerationCancelled()
+                finally:
+                    response.close()
+            except (requests.exceptions.RequestException, ValueError):
+                # The watch closed the socket: not a failed server, so no failover
+                if watch.cancelled.is_set():
+                    raise GenerationCancelled()
+                raise
+            if watch.cancelled.is_set() and not stats:
+                raise GenerationCancelled()
+
+    for field, histogram in OLLAMA_DURATIONS.items():
+        if stats.get(field) is not None:
+            histogram.observe(stats[field] / 1e9)
+    return "".join(parts), stats
+
+def extract_llm_json(response_text: str):
+    """Return the {"reply", "analysis"} JSON object in the model output, or None."""
+    with TRACER.span("json.parse"), JSON_PARSE.time():
+        json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
+        if json_match:
+            try:
+                return json.loads(json_match.group())
+            except json.JSONDecodeError:
+                log.info("parse.fallback", reason="invalid_json")
+        else:
+            log.info("parse.fallback", reason="no_json")
+        return None
+
+def parse_llm_response(response_text: str) -> Dict[str, Any]:
+    """Extract the {"reply", "analysis"} JSON object, falling back to the raw text as reply."""
+    response_json = extract_llm_json(response_text)
+    if response_json is None:
+        return {"reply": response_text, "analysis": {"type": "General"}}
+    return response_json
+
+def record_llm_call(project_id, session_key, trace_id, phase, model, stats: Dict[str, Any],
+                    complexity=None, parse_ok=None):
+    """Persist token counts, Ollama timings and routing outcome for one call to the llm_calls ledger."""
+    if not stats:
+        return
+    try:
+        with DB_WRITE.time():
+            conn = get_db_connection()
+            conn.execute('''
+                INSERT INTO llm_calls (project_id, session_key, trace_id, phase, model,
+                                       prompt_eval_count, eval_count, total_duration,
+                                       load_duration, prompt_eval_duration, eval_duration,
+                                       complexity, parse_ok, timestamp)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (project_id, session_key, trace_id, phase, model,
+                  stats.get("prompt_eval_count"), stats.get("eval_count"), stats.get("total_duration"),
+                  stats.get("load_duration"), stats.get("prompt_eval_duration"), stats.get("eval_duration"),
+                  complexity, None if parse_ok is None else int(parse_ok),
+                  datetime.now().isoformat()))
+            conn.commit()
+            conn.close()
+    except sqlite3.Error as e:
+        log.error("db.llm_call_failed", error=str(e))
 
 class ActionIntelligentAnalysis(Action):
     """
@@ -162,107 +532,194 @@ class ActionIntelligentAnalysis(Action):
     def name(self) -> Text:
         return "action_intelligent_analysis"
 
-    def run(self, dispatcher: CollectingDispatcher,
-            tracker: Tracker,
-            domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
-        
-        print("\n" + "="*60)
-        print("[ACTION] 'action_intelligent_analysis' CALLED")
-        print("="*60)
+    async def run(self, dispatcher: CollectingDispatcher,
+                  tracker: Tracker,
+                  domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+        ACTION_RUNS.inc(action=self.name())
+        return await run_in_action_thread(self.run_traced, tracker)
+
+    def run_traced(self, tracker: Tracker) -> List[Dict[Text, Any]]:
+        trace_id, parent_id = get_trace_context(tracker)
+        with ACTIONS_IN_FLIGHT.track_inprogress(), \
+                TRACER.span(self.name(), trace_id=trace_id, parent_id=parent_id):
+            return self.analyze(tracker)
 
+    def analyze(self, tracker: Tracker) -> List[Dict[Text, Any]]:
         # 1. Get current state
         user_message = tracker.latest_message.get("text", "")
         current_phase = tracker.get_slot("elicitation_phase") or "vision"
         project_id = tracker.get_slot("project_id") or 1
+        session_key, turn_seq = get_turn_info(tracker)
         
-        print(f"[STATE] Project: {project_id}, Phase: {current_phase}")
-        print(f"[USER] Message: {user_message[:100]}...")
+        def superseded():
+            return turn_superseded(session_key, turn_seq)
+        
+        log.info("action.start", action=self.name(), project_id=project_id, phase=current_phase,
+                 trace_id=current_span().trace_id)
+        log.debug("action.user_message", sample=0.1, text=user_message[:100])
         
         # Handle 'done' phase
         if current_phase == "done":
-            print("[ACTION] Elicitation complete.")
+            log.info("action.elicitation_done", project_id=project_id)
             return [BotUttered(
                 text="✅ I believe I have captured all essential requirements. You can now export your SRS document. Great work!",
                 metadata={"from_action": "action_intelligent_analysis"}
             )]
 
+        # A newer message is already queued behind this one - don't start generating
+        if superseded():
+            log.info("cancel.before_generation", session_key=session_key, turn_seq=turn_seq)
+            count_cancelled("generations_cancelled")
+            count_cancelled("analyses_skipped")
+            return []
+
+        # Trivial turns (acks, "that's all") don't need the model
+        if LOCAL_TRIAGE:
+            events = self.answer_locally(tracker, user_message, current_phase, project_id)
+            if events is not None:
+                return events
+
         # 2. Build conversation history
-        conversation_history = get_conversation_history(tracker)
-        conversation_history.append({"role": "user", "content": user_message})
+        with TRACER.span("history.build"), HISTORY_BUILD.time():
+            conversation_history = get_conversation_history(tracker)
+        # The tracker normally already ends with this message; sending it twice
+        # would also stop the next turn's prompt from extending this one
+        if not conversation_history or conversation_history[-1] != {"role": "user", "content": user_message}:
+            conversation_history.append({"role": "user", "content": user_message})
 
         # 3. Get system prompt for current phase
         system_prompt = SYSTEM_PROMPTS.get(current_phase, SYSTEM_PROMPTS["vision"])
 
-        # 4. Build Ollama payload
+        # Vague wording ("fast", "many users") is recorded here, not left to the model
+        with TRACER.span("ambiguity.detect"):
+            vague_terms = detect_ambiguity(user_message)
+        if vague_terms:
+            self.save_vague_terms(project_id, user_message, vague_terms)
+
+        # 4. Pick a model for this turn and build the Ollama payload
+        complexity = turn_complexity(user_message, current_phase, tracker.latest_message.get("entities"))
+        model, routed_complexity = ROUTER.choose(complexity)
         messages_payload = [{"role": "system", "content": system_prompt}]
         messages_payload.extend(conversation_history)
+        # After the history, so the cached prompt prefix is unchanged
+        if vague_terms:
+            messages_payload.append({"role": "system", "content": llm_hint(vague_terms)})
         
         payload = {
-            "model": OLLAMA_MODEL,
+            "model": model,
             "messages": messages_payload,
-            "stream": False
+            "stream": True,
+            "keep_alive": OLLAMA_KEEP_ALIVE
         }
 
-        # 5. Call Ollama
+        # 5. Call Ollama (streamed, so a newer message can abort it)
         try:
-            print(f"[OLLAMA] Calling {OLLAMA_MODEL} for phase '{current_phase}'...")
-            response = requests.post(
-                OLLAMA_API_URL,
-                data=json.dumps(payload),
-                headers={"Content-Type": "application/json"},
-                timeout=OLLAMA_TIMEOUT
-            )
-            response.raise_for_status()
-            print("[OLLAMA] Request successful.")
+            log.debug("ollama.request", model=model, phase=current_phase,
+                      complexity=round(complexity, 3), routed_complexity=round(routed_complexity, 3))
+            sent = time.time()
+            response_text, stats = stream_ollama_chat(payload, superseded, sticky_key=tracker.sender_id)
+            CAPTURE.record("ollama", ts=sent, trace_id=current_span().trace_id, session_key=session_key,
+                           turn_seq=turn_seq, phase=current_phase, duration_ms=round((time.time() - sent) * 1000, 3),
+                           payload=payload, content=response_text, stats=stats)
+            log.info("ollama.response", model=model, eval_count=stats.get("eval_count"),
+                     total_ms=round(stats.get("total_duration", 0) / 1e6))
 
             # 6. Parse Ollama response
-            response_data = response.json()
-            response_text = response_data.get('message', {}).get('content', '')
-            
-            # Try to extract JSON
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-            if json_match:
-                try:
-                    response_json = json.loads(json_match.group())
-                    print("[PARSE] JSON extracted successfully.")
-                except json.JSONDecodeError:
-                    print("[PARSE] JSON parsing failed, using plain text.")
-                    response_json = {"reply": response_text, "analysis": {"type": "General"}}
-            else:
-                print("[PARSE] No JSON found, using plain text.")
+            response_json = extract_llm_json(response_text)
+            parse_ok = response_json is not None
+            if not parse_ok:
                 response_json = {"reply": response_text, "analysis": {"type": "General"}}
+            ROUTER.record_result(model, time.time() - sent, parse_ok)
+            record_llm_call(int(project_id), session_key, current_span().trace_id,
+                            current_phase, model, stats, round(complexity, 3), parse_ok)
             
             # 7. Extract analysis and reply
             bot_response_text = response_json.get("reply", response_text)
             analysis_data = response_json.get("analysis", {})
             
-            print(f"[RESPONSE] {bot_response_text[:80]}...")
+            log.debug("action.reply", sample=0.1, text=bot_response_text[:80])
             
-            # 8. Save analysis to database
-            self.save_analysis_to_db(analysis_data, project_id, user_message)
+            # 8. Save analysis to database (unless the turn went stale meanwhile)
+            if superseded():
+                log.info("cancel.after_generation", session_key=session_key, turn_seq=turn_seq)
+                count_cancelled("analyses_skipped")
+                return []
+            with TRACER.span("db.save_analysis", type=analysis_data.get("type", "General")):
+                self.save_analysis_to_db(analysis_data, project_id, user_message, bool(vague_terms))
+
+            # Raw model output goes back into later prompts verbatim (prefix reuse)
+            bot_metadata = {"from_action": "action_intelligent_analysis", "llm_raw": response_text}
 
             # 9. Check for phase transition
             next_phase = analysis_data.get("next_phase", current_phase)
             if next_phase != current_phase and next_phase in ["functional", "non_functional", "constraints", "done"]:
-                print(f"[PHASE CHANGE] {current_phase} → {next_phase}")
+                log.info("phase.change", project_id=project_id, from_phase=current_phase, to_phase=next_phase)
                 return [
                     SlotSet("elicitation_phase", next_phase),
-                    BotUttered(text=bot_response_text, metadata={"from_action": "action_intelligent_analysis"})
+                    BotUttered(text=bot_response_text, metadata=bot_metadata)
                 ]
             
             # No phase change
-            return [BotUttered(text=bot_response_text, metadata={"from_action": "action_intelligent_analysis"})]
+            return [BotUttered(text=bot_response_text, metadata=bot_metadata)]
 
+        except GenerationCancelled:
+            log.info("cancel.during_generation", session_key=session_key, turn_seq=turn_seq)
+            count_cancelled("generations_cancelled")
+            count_cancelled("analyses_skipped")
+            return []
         except requests.exceptions.Timeout:
-            print(f"[ERROR] Ollama timeout after {OLLAMA_TIMEOUT}s")
+            log.error("ollama.timeout", timeout=OLLAMA_TIMEOUT)
             bot_response_text = "I'm thinking... please give me a moment. Could you repeat that?"
         except Exception as e:
-            print(f"[ERROR] Unexpected error: {e}")
+            log.exception("action.error", error=str(e))
             bot_response_text = "I encountered an error. Could you please rephrase that?"
         
         return [BotUttered(text=bot_response_text, metadata={"from_action": "action_intelligent_analysis"})]
 
-    def save_analysis_to_db(self, analysis_data: Dict[str, Any], project_id: int, user_message: str):
+    def answer_locally(self, tracker: Tracker, user_message: str, current_phase: str, project_id):
+        """Events for a turn the triage rules can answer, or None if it needs the LLM."""
+        last_bot_text = next((e.get('text') for e in reversed(tracker.events)
+                              if e['event'] == 'bot' and e.get('text')), None)
+        kind, reason = classify_turn(user_message, tracker.latest_message.get("intent"), last_bot_text)
+        if kind == "llm":
+            return None
+
+        turn = sum(1 for e in tracker.events if e['event'] == 'user')
+        reply, next_phase = local_reply(kind, current_phase, turn)
+        # Stored in the model's own format so later prompts read like its replies
+        llm_raw = json.dumps({"reply": reply, "analysis": {"type": "General", "next_phase": next_phase}})
+        bot_metadata = {"from_action": "action_intelligent_analysis", "llm_raw": llm_raw, "triage": kind}
+        log.info("triage.local", project_id=project_id, phase=current_phase, kind=kind, reason=reason)
+        if next_phase != current_phase:
+            log.info("phase.change", project_id=project_id, from_phase=current_phase, to_phase=next_phase)
+            return [SlotSet("elicitation_phase", next_phase), BotUttered(text=reply, metadata=bot_metadata)]
+        return [BotUttered(text=reply, metadata=bot_metadata)]
+
+    def save_vague_terms(self, project_id, user_message: str, findings: List[Dict[str, Any]]):
+        """Record the lexicon detector's findings as one ambiguity for this message."""
+        try:
+            with DB_WRITE.time():
+                conn = get_db_connection()
+                inserted = record_ambiguity(conn, int(project_id), user_message, findings)
+                conn.commit()
+                conn.close()
+            log.info("ambiguity.detected", project_id=project_id, inserted=inserted,
+                     terms=[f["term"] for f in findings])
+        except sqlite3.Error as e:
+            log.error("db.ambiguity_failed", error=str(e))
+
+    def embed_requirement(self, content: str):
+        """(float16 embedding bytes, embedder name) for a new requirement; (None, None) if the embedder fails."""
+        try:
+            embedder = get_embedder()
+            return to_blob(embedder.embed([content])[0]), embedder.name
+        except Exception as e:
+            # python -m common.vector_index --backfill catches up later
+            log.warning("embedding.failed", error=str(e))
+            return None, None
+
+    def save_analysis_to_db(self, analysis_data: Dict[str, Any], project_id: int, user_message: str,
+                            ambiguity_recorded: bool = False):
         """
         FIX #4: Save Ollama's analysis to the database.
         """
@@ -273,31 +730,63 @@ class ActionIntelligentAnalysis(Action):
 
             # Skip generic responses
             if req_type == "General":
-                print("[DB] Skipping 'General' type - not saving.")
+                log.debug("db.skip_general", sample=0.1)
                 return 
 
+            # The lexicon detector already stored an ambiguity for this message
+            if req_type == "Ambiguity" and ambiguity_recorded:
+                log.debug("db.skip_ambiguity_recorded", sample=0.1)
+                return
+
             # Determine which table to save to
             if req_type == "Ambiguity":
                 table_name = "ambiguities"
-                print("[DB] Saving AMBIGUITY...")
             elif req_type == "Contradiction":
                 table_name = "contradictions"
-                print("[DB] Saving CONTRADICTION...")
             elif req_type == "Constraint":
                 table_name = "requirements"
-                print("[DB] Saving CONSTRAINT requirement...")
             else:  # Requirement
                 table_name = "requirements"
-                print("[DB] Saving REQUIREMENT...")
 
+            write_start = time.perf_counter()
             conn = get_db_connection()
             cursor = conn.cursor()
             
             if table_name == "requirements":
-                cursor.execute('''
-                    INSERT INTO requirements (project_id, content, req_type, priority, status, timestamp)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (project_id, content, req_type, priority, 'captured', datetime.now().isoformat()))
+                # Said before, in these or nearly these words: record the merge instead
+                duplicate = find_duplicate(conn, project_id, content)
+                if not duplicate:
+                    embedding = self.embed_requirement(content)
+                    cursor.execute('''
+                        INSERT INTO requirements (project_id, content, req_type, priority, status, timestamp,
+                                                  content_hash, embedding, embedding_model)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT (project_id, content_hash) DO NOTHING
+                    ''', (project_id, content, req_type, priority, 'captured', datetime.now().isoformat(),
+                          content_hash(content), *embedding))
+                    # Another worker stored the same text in between
+                    if not cursor.rowcount:
+                        duplicate = find_duplicate(conn, project_id, content)
+                if duplicate:
+                    record_merge(conn, project_id, duplicate, content, req_type, priority)
+                    conn.commit()
+                    conn.close()
+                    DB_WRITE.observe(time.perf_counter() - write_start)
+                    log.info("db.requirement_merged", project_id=project_id, requirement_id=duplicate["id"],
+                             kind=duplicate["kind"], similarity=duplicate["similarity"])
+                    return
+                index_requirement(conn, project_id, cursor.lastrowid, content)
+                # Budgets, deadlines, user counts...: from the user's own words,
+                # the model's paraphrase if they had none
+                values = extract_values(user_message) or extract_values(content)
+                if values:
+                    record_values(conn, project_id, cursor.lastrowid, values)
+                # Conflicts with anything said earlier in the project, however long ago
+                conflicts = check_requirement(conn, project_id, cursor.lastrowid, content, values)
+                if conflicts:
+                    record_contradictions(conn, project_id, cursor.lastrowid, conflicts)
+                    log.info("contradiction.detected", project_id=project_id, requirement_id=cursor.lastrowid,
+                             checks=[c["check"] for c in conflicts])
                 
             elif table_name == "ambiguities":
                 cursor.execute('''
@@ -313,10 +802,11 @@ class ActionIntelligentAnalysis(Action):
             
             conn.commit()
             conn.close()
-            print(f"[DB] ✓ Saved to {table_name}: {content[:60]}...")
+            DB_WRITE.observe(time.perf_counter() - write_start)
+            log.info("db.saved", table=table_name, type=req_type, project_id=project_id)
 
         except Exception as e:
-            print(f"[DB ERROR] {e}")
+            log.error("db.save_failed", error=str(e))
 
 
 class ActionSetProjectId(Action):
@@ -325,12 +815,11 @@ class ActionSetProjectId(Action):
     def name(self) -> Text:
         return "action_set_project_id"
     
-    def run(self, dispatcher: CollectingDispatcher,
-            tracker: Tracker,
-            domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+    async def run(self, dispatcher: CollectingDispatcher,
+                  tracker: Tracker,
+                  domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         
-        print("\n[ACTION] Setting initial state...")
-        print("[ACTION] Project ID: 1, Elicitation Phase: vision")
+        log.info("action.set_initial_state", project_id=1, phase="vision")
         
         # Start in 'vision' phase
         return [
@@ -345,8 +834,8 @@ class ActionGenerateSRS(Action):
     def name(self) -> Text:
         return "nodoc: "
     
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         # This is handled by the backend export endpoint
         return []
 
-print("[ACTIONS.PY] ✓ Successfully loaded actions.py (V11)")
\ No newline at end of file
+log.info("actions.loaded", version="V11")
\ No newline at end of file
@@ -1,66 +1,169 @@
 # backend/app.py (V4 - FIXED)
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, Response
 from flask_cors import CORS
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import sqlite3
 from datetime import datetime
 import os
 import sys
+import time
 from collections import defaultdict
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common import doctor, metrics
+from common.capture import Capture
+from common.embeddings import from_blob, get_embedder
+from common.log import get_logger
+from common.pool import EndpointPool
+from common.tracing import Tracer, new_trace_id, get_span_tree, connect as connect_traces
+from common.turns import session_key, begin_turn, is_superseded, count_cancelled
+from common.vector_index import project_index
+from common.warmup import COLD_LOAD_SECONDS
+from database.setup import init_database
 
 app = Flask(__name__)
 CORS(app)
 
 RASA_SERVER_URL = "http://localhost:5005"
 DB_PATH = "../requirements.db"
+# Trace spans, in their own file so tracing never takes the app's write lock
+TRACE_DB_PATH = "../traces.db"
+
+# Comma-separated Rasa instances. Each sender id is consistently hashed to
+# one of them so its tracker stays on one node; a node that stops answering
+# is ejected and its senders move to the next node on the ring until it is
+# back. Connections are kept alive through one shared session.
+RASA_SERVER_URLS = os.environ.get("RASA_SERVER_URLS", RASA_SERVER_URL).split(",")
+RASA_MAX_CONNECTIONS = int(os.environ.get("RASA_MAX_CONNECTIONS", "32"))
+RASA_POOL = EndpointPool("rasa", RASA_SERVER_URLS, strategy="hash", health_path="/")
+RASA_HTTP = requests.Session()
+for _scheme in ("http://", "https://"):
+    RASA_HTTP.mount(_scheme, HTTPAdapter(pool_connections=len(RASA_SERVER_URLS), pool_maxsize=RASA_MAX_CONNECTIONS))
+
+TRACER = Tracer("backend", TRACE_DB_PATH)
+CAPTURE = Capture("backend")
+
+# Deep health checks probe Rasa, the action server, Ollama and SQLite at most
+# once per HEALTH_CACHE_SECONDS, however often /api/health?deep=1 is polled.
+HEALTH_CACHE_SECONDS = 10
+DEEP_HEALTH = doctor.CachedHealth([
+    *[lambda url=url, n=n: dict(doctor.probe_rasa(url), name="rasa" if n == 0 else f"rasa-{n + 1}")
+      for n, url in enumerate(RASA_SERVER_URLS)],
+    lambda: doctor.probe_action_server(),
+    lambda: doctor.probe_ollama(),
+    lambda: doctor.probe_database(DB_PATH),
+], ttl=HEALTH_CACHE_SECONDS)
+log = get_logger("backend")
+
+# ==================== METRICS ====================
+
+HTTP_REQUESTS = metrics.counter(
+    "backend_http_requests_total", "HTTP requests handled", ["endpoint", "method", "status"])
+HTTP_LATENCY = metrics.histogram(
+    "backend_http_request_seconds", "HTTP request latency", ["endpoint"])
+RASA_ROUND_TRIP = metrics.histogram(
+    "backend_rasa_round_trip_seconds", "Time waiting on the Rasa REST webhook")
+DB_WRITE = metrics.histogram(
+    "backend_db_write_seconds", "SQLite write latency", ["operation"])
+CHAT_QUEUE_DEPTH = metrics.gauge(
+    "backend_chat_queue_depth", "/api/chat requests waiting on Rasa")
 
 def get_db_connection():
     conn = sqlite3.connect(DB_PATH)
     conn.row_factory = sqlite3.Row
     return conn
 
-def send_message_to_rasa(message, sender_id="user_1"):
+def send_message_to_rasa(message, sender_id="user_1", metadata=None):
     """Send message to Rasa and get response. Rasa will call Ollama via actions."""
     try:
         payload = {"sender": sender_id, "message": message}
-        response = requests.post(
-            f"{RASA_SERVER_URL}/webhooks/rest/webhook",
-            json=payload,
-            timeout=120
-        )
-        response.raise_for_status()
+        if metadata:
+            payload["metadata"] = metadata
+        with RASA_ROUND_TRIP.time(), CHAT_QUEUE_DEPTH.track_inprogress():
+            response = post_to_rasa(payload, sender_id)
         return response.json()
     except requests.exceptions.Timeout:
-        print("Error: RASA request timed out.")
+        log.error("rasa.timeout", sender_id=sender_id)
         return []
     except Exception as e:
-        print(f"Error communicating with RASA: {e}")
+        log.error("rasa.error", sender_id=sender_id, error=str(e))
         return {"error": str(e)}
 
-def save_conversation(project_id, user_message, bot_response, intent):
+def post_to_rasa(payload, sender_id):
+    """POST to the sender's Rasa node; fail over only when the node could not be reached."""
+    tried = []
+    while True:
+        try:
+            with RASA_POOL.acquire(key=sender_id, exclude=tried) as endpoint:
+                response = RASA_HTTP.post(f"{endpoint.url}/webhooks/rest/webhook", json=payload, timeout=120)
+                response.raise_for_status()
+                return response
+        except requests.exceptions.ConnectionError as e:
+            tried.append(endpoint)
+            if len(tried) >= len(RASA_POOL.endpoints):
+                raise
+            log.warning("rasa.failover", sender_id=sender_id, endpoint=endpoint.url, error=str(e))
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def save_conversation(project_id, user_message, bot_response, intent, sender_id=None):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO conversation_history (project_id, user_message, bot_response, intent)
-            VALUES (?, ?, ?, ?)
-        ''', (project_id, user_message, bot_response, intent))
-        conn.commit()
-        conn.close()
+        with DB_WRITE.time(operation="save_conversation"):
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO conversation_history (project_id, user_message, bot_response, intent, sender_id)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (project_id, user_message, bot_response, intent, sender_id))
+            conn.commit()
+            conn.close()
         return True
     except Exception as e:
-        print(f"Error saving conversation: {e}")
+        log.error("db.save_conversation_failed", project_id=project_id, error=str(e))
         return False
 
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    HTTP_REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    if "request_start" in g:
+        HTTP_LATENCY.observe(time.perf_counter() - g.request_start, endpoint=endpoint)
+    return response
+
 # ==================== API ENDPOINTS ====================
 
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
 @app.route('/api/health', methods=['GET'])
 def health():
-    return jsonify({"status": "ok", "message": "Backend server is running"}), 200
+    if request.args.get('deep') not in ('1', 'true'):
+        return jsonify({"status": "ok", "message": "Backend server is running"}), 200
+    
+    results, age = DEEP_HEALTH.get()
+    healthy = all(r["ok"] for r in results)
+    return jsonify({
+        "status": "ok" if healthy else "degraded",
+        "message": "Backend server is running",
+        "checked_seconds_ago": round(age, 1),
+        "dependencies": {r["name"]: r for r in results},
+        "rasa_pool": RASA_POOL.snapshot()
+    }), 200 if healthy else 503
 
 @app.route('/api/projects', methods=['POST'])
 def create_project():
@@ -108,7 +211,20 @@ def chat():
     """
     FIX #1: Send message to Rasa which routes through action_intelligent_analysis.
     This action calls Ollama and saves analysis to DB.
+    Each request gets a trace id, returned in the X-Trace-Id header.
     """
+    g.trace_id = new_trace_id()
+    arrived = time.time()
+    with TRACER.span("api.chat", trace_id=g.trace_id) as span:
+        response, status = process_chat()
+    response.headers["X-Trace-Id"] = g.trace_id
+    # Optional capture for benchmarks/replay.py (set CAPTURE_DIR)
+    CAPTURE.record("chat", ts=arrived, trace_id=g.trace_id, duration_ms=round(span.duration_ms, 3),
+                   request=request.get_json(silent=True), status=status,
+                   response=response.get_json(silent=True))
+    return response, status
+
+def process_chat():
     try:
         data = request.get_json()
         message = data.get('message', '')
@@ -118,8 +234,41 @@ def chat():
         if not message:
             return jsonify({"error": "Message cannot be empty"}), 400
         
-        # Send to Rasa - it will invoke action_intelligent_analysis -> Ollama
-        rasa_response = send_message_to_rasa(message, sender_id)
+        # Register this turn; any generation still running for an older
+        # turn of the same session will notice and abort.
+        key = session_key(sender_id, project_id)
+        with TRACER.span("db.begin_turn"), DB_WRITE.time(operation="begin_turn"):
+            conn = get_db_connection()
+            turn_seq = begin_turn(conn, key)
+            conn.close()
+        
+        # Send to Rasa - it will invoke action_intelligent_analysis -> Ollama.
+        # The action server continues the trace under this span.
+        with TRACER.span("rasa.round_trip", sender_id=sender_id) as rasa_span:
+            rasa_response = send_message_to_rasa(message, sender_id, metadata={
+                "session_key": key,
+                "turn_seq": turn_seq,
+                "trace_id": rasa_span.trace_id,
+                "parent_span_id": rasa_span.span_id,
+            })
+        
+        # A newer message arrived while this one was processed - drop the stale
+        # reply, but keep what the stakeholder said
+        conn = get_db_connection()
+        superseded = is_superseded(conn, key, turn_seq)
+        conn.close()
+        if superseded:
+            count_cancelled("turns_superseded")
+            with TRACER.span("db.save_conversation"):
+                save_conversation(project_id, message, "", "superseded", sender_id)
+            return jsonify({
+                "success": True,
+                "cancelled": True,
+                "user_message": message,
+                "bot_response": "",
+                "project_id": project_id,
+                "trace_id": g.trace_id
+            }), 200
         
         bot_messages = []
         if isinstance(rasa_response, list):
@@ -130,17 +279,248 @@ def chat():
         bot_response = " ".join(bot_messages) if bot_messages else "I didn't understand that. Could you rephrase?"
         
         # Save conversation
-        save_conversation(project_id, message, bot_response, "user_message")
+        with TRACER.span("db.save_conversation"):
+            save_conversation(project_id, message, bot_response, "user_message", sender_id)
         
         return jsonify({
             "success": True,
             "user_message": message,
             "bot_response": bot_response,
-            "project_id": project_id
+            "project_id": project_id,
+            "trace_id": g.trace_id
+        }), 200
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/traces/<trace_id>', methods=['GET'])
+def get_trace(trace_id):
+    """Span tree for one chat turn, showing where the time went."""
+    try:
+        conn = connect_traces(TRACE_DB_PATH)
+        spans = get_span_tree(conn, trace_id)
+        conn.close()
+        
+        if not spans:
+            return jsonify({"error": "Trace not found"}), 404
+        
+        return jsonify({
+            "success": True,
+            "trace_id": trace_id,
+            "spans": spans
+        }), 200
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+# ==================== LLM USAGE LEDGER ====================
+
+@app.route('/api/projects/<int:project_id>/llm-usage', methods=['GET'])
+def get_project_llm_usage(project_id):
+    """Tokens and LLM time spent on a project, overall and per phase."""
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT phase,
+                   COUNT(*) AS calls,
+                   COALESCE(SUM(prompt_eval_count), 0) AS prompt_tokens,
+                   COALESCE(SUM(eval_count), 0) AS completion_tokens,
+                   COALESCE(SUM(total_duration), 0) / 1e9 AS total_seconds,
+                   COALESCE(MAX(prompt_eval_count), 0) AS max_prompt_tokens
+            FROM llm_calls WHERE project_id = ?
+            GROUP BY phase
+        ''', (project_id,))
+        phases = [dict(row) for row in cursor.fetchall()]
+        conn.close()
+        
+        totals = {
+            "calls": sum(p["calls"] for p in phases),
+            "prompt_tokens": sum(p["prompt_tokens"] for p in phases),
+            "completion_tokens": sum(p["completion_tokens"] for p in phases),
+            "total_seconds": round(sum(p["total_seconds"] for p in phases), 3),
+        }
+        totals["total_tokens"] = totals["prompt_tokens"] + totals["completion_tokens"]
+        
+        return jsonify({
+            "success": True,
+            "project_id": project_id,
+            "totals": totals,
+            "phases": phases
+        }), 200
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/llm/latency', methods=['GET'])
+def get_llm_latency():
+    """p50/p95 of Ollama total, prompt-eval and eval time per phase (seconds)."""
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        query = 'SELECT phase, total_duration, prompt_eval_duration, eval_duration FROM llm_calls'
+        params = ()
+        if request.args.get('project_id'):
+            query += ' WHERE project_id = ?'
+            params = (int(request.args['project_id']),)
+        cursor.execute(query, params)
+        
+        by_phase = defaultdict(lambda: defaultdict(list))
+        for row in cursor.fetchall():
+            for field in ('total_duration', 'prompt_eval_duration', 'eval_duration'):
+                if row[field] is not None:
+                    by_phase[row['phase']][field].append(row[field] / 1e9)
+        conn.close()
+        
+        phases = {}
+        for phase, fields in by_phase.items():
+            phases[phase] = {"calls": len(fields['total_duration'])}
+            for field, values in fields.items():
+                values.sort()
+                name = field.replace('_duration', '')
+                phases[phase][f"{name}_p50"] = percentile(values, 50)
+                phases[phase][f"{name}_p95"] = percentile(values, 95)
+        
+        return jsonify({"success": True, "phases": phases}), 200
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/llm/cold-starts', methods=['GET'])
+def get_llm_cold_starts():
+    """Latency of turns that paid a model load vs turns that hit a resident model."""
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        query = 'SELECT load_duration, total_duration FROM llm_calls WHERE total_duration IS NOT NULL'
+        params = ()
+        if request.args.get('model'):
+            query += ' AND model = ?'
+            params = (request.args['model'],)
+        cursor.execute(query, params)
+        
+        groups = {"cold": [], "warm": []}
+        load_seconds = 0.0
+        for row in cursor.fetchall():
+            load = (row['load_duration'] or 0) / 1e9
+            if load > COLD_LOAD_SECONDS:
+                groups["cold"].append(row['total_duration'] / 1e9)
+                load_seconds += load
+            else:
+                groups["warm"].append(row['total_duration'] / 1e9)
+        conn.close()
+        
+        result = {}
+        for start, values in groups.items():
+            values.sort()
+            result[start] = {
+                "calls": len(values),
+                "total_p50": percentile(values, 50),
+                "total_p95": percentile(values, 95),
+            }
+        calls = len(groups["cold"]) + len(groups["warm"])
+        
+        return jsonify({
+            "success": True,
+            "cold_threshold_seconds": COLD_LOAD_SECONDS,
+            "cold_fraction": round(len(groups["cold"]) / calls, 4) if calls else None,
+            "seconds_spent_loading": round(load_seconds, 3),
+            **result
         }), 200
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
+@app.route('/api/llm/models', methods=['GET'])
+def get_llm_model_throughput():
+    """Prompt-eval and generation tokens/sec per model, for hardware sizing."""
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT model,
+                   COUNT(*) AS calls,
+                   SUM(prompt_eval_count) AS prompt_tokens,
+                   SUM(prompt_eval_duration) AS prompt_eval_ns,
+                   SUM(eval_count) AS completion_tokens,
+                   SUM(eval_duration) AS eval_ns,
+                   AVG(load_duration) AS avg_load_ns
+            FROM llm_calls
+            GROUP BY model
+        ''')
+        models = []
+        for row in cursor.fetchall():
+            models.append({
+                "model": row['model'],
+                "calls": row['calls'],
+                "prompt_tokens_per_sec": round(row['prompt_tokens'] / (row['prompt_eval_ns'] / 1e9), 2) if row['prompt_eval_ns'] else None,
+                "completion_tokens_per_sec": round(row['completion_tokens'] / (row['eval_ns'] / 1e9), 2) if row['eval_ns'] else None,
+                "avg_load_seconds": round(row['avg_load_ns'] / 1e9, 3) if row['avg_load_ns'] else None,
+            })
+        conn.close()
+        
+        return jsonify({"success": True, "models": models}), 200
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/llm/routing', methods=['GET'])
+def get_llm_routing():
+    """Per routed model: turn complexity, latency and JSON parse success, to validate the router."""
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT model, complexity, parse_ok, total_duration
+            FROM llm_calls
+            WHERE complexity IS NOT NULL
+        ''')
+        
+        by_model = defaultdict(lambda: {"complexity": [], "parsed": [], "total": []})
+        for row in cursor.fetchall():
+            stats = by_model[row['model']]
+            stats["complexity"].append(row['complexity'])
+            if row['parse_ok'] is not None:
+                stats["parsed"].append(row['parse_ok'])
+            if row['total_duration'] is not None:
+                stats["total"].append(row['total_duration'] / 1e9)
+        conn.close()
+        
+        models = []
+        for model, stats in by_model.items():
+            stats["total"].sort()
+            models.append({
+                "model": model,
+                "calls": len(stats["complexity"]),
+                "avg_complexity": round(sum(stats["complexity"]) / len(stats["complexity"]), 3),
+                "parse_success_rate": round(sum(stats["parsed"]) / len(stats["parsed"]), 4) if stats["parsed"] else None,
+                "total_p50": percentile(stats["total"], 50),
+                "total_p95": percentile(stats["total"], 95),
+            })
+        
+        return jsonify({"success": True, "models": models}), 200
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/llm/sessions', methods=['GET'])
+def get_llm_sessions():
+    """Sessions ranked by largest prompt, to spot runaway conversation context."""
+    try:
+        limit = int(request.args.get('limit', 20))
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT session_key, project_id,
+                   COUNT(*) AS calls,
+                   MAX(prompt_eval_count) AS max_prompt_tokens,
+                   SUM(prompt_eval_count) + SUM(eval_count) AS total_tokens
+            FROM llm_calls
+            WHERE session_key IS NOT NULL
+            GROUP BY session_key, project_id
+            ORDER BY max_prompt_tokens DESC
+            LIMIT ?
+        ''', (limit,))
+        sessions = [dict(row) for row in cursor.fetchall()]
+        conn.close()
+        
+        return jsonify({"success": True, "sessions": sessions}), 200
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
 @app.route('/api/projects/<int:project_id>/summary', methods=['GET'])
 def get_project_summary(project_id):
     """
@@ -151,7 +531,7 @@ def get_project_summary(project_id):
         cursor = conn.cursor()
         
         # Get all requirements
-        cursor.execute('SELECT * FROM requirements WHERE project_id = ?', (project_id,))
+        cursor.execute('SELECT id, req_type FROM requirements WHERE project_id = ?', (project_id,))
         requirements = [dict(row) for row in cursor.fetchall()]
 
         # Count by type
@@ -165,6 +545,10 @@ def get_project_summary(project_id):
         cursor.execute('SELECT COUNT(*) as count FROM contradictions WHERE project_id = ? AND status = ?', (project_id, 'flagged'))
         contradictions = cursor.fetchone()['count']
         
+        # Restatements folded into an existing requirement (common/dedupe.py)
+        cursor.execute('SELECT COUNT(*) as count FROM requirement_merges WHERE project_id = ?', (project_id,))
+        merged = cursor.fetchone()['count']
+        
         conn.close()
         
         return jsonify({
@@ -177,12 +561,100 @@ def get_project_summary(project_id):
                 "total_ambiguities": ambiguities,
                 "ambiguities_resolved": 0,
                 "total_contradictions": contradictions,
-                "contradictions_resolved": 0
+                "contradictions_resolved": 0,
+                "duplicates_merged": merged
             }
         }), 200
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
+@app.route('/api/projects/<int:project_id>/values', methods=['GET'])
+def get_project_values(project_id):
+    """Budgets, deadlines, counts and targets extracted from the project's requirements (?subject=, ?kind=)."""
+    try:
+        query = '''
+            SELECT v.id, v.requirement_id, v.kind, v.subject, v.comparator, v.value, v.unit,
+                   v.date_value, v.text, r.content AS requirement
+            FROM requirement_values v LEFT JOIN requirements r ON r.id = v.requirement_id
+            WHERE v.project_id = ?
+        '''
+        params = [project_id]
+        for column in ("subject", "kind"):
+            if request.args.get(column):
+                query += f' AND v.{column} = ?'
+                params.append(request.args[column])
+        query += ' ORDER BY v.subject, v.id'
+
+        conn = get_db_connection()
+        values = [dict(row) for row in conn.execute(query, params).fetchall()]
+        conn.close()
+        return jsonify({"success": True, "project_id": project_id, "values": values}), 200
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+# Requirements returned by /requirements/similar at most
+SIMILAR_MAX = 50
+
+@app.route('/api/projects/<int:project_id>/requirements/similar', methods=['GET'])
+def get_similar_requirements(project_id):
+    """Requirements closest in meaning to ?q= text or to ?requirement_id=, best first (?k=, default 10)."""
+    try:
+        k = min(int(request.args.get('k', 10)), SIMILAR_MAX)
+        requirement_id = request.args.get('requirement_id', type=int)
+        text = request.args.get('q', '').strip()
+        if not text and requirement_id is None:
+            return jsonify({"error": "Pass q or requirement_id"}), 400
+
+        embedder = get_embedder()
+        conn = get_db_connection()
+        exclude = set()
+        if requirement_id is not None:
+            row = conn.execute('SELECT content, embedding, embedding_model FROM requirements WHERE id = ? AND project_id = ?',
+                               (requirement_id, project_id)).fetchone()
+            if not row:
+                conn.close()
+                return jsonify({"error": "Requirement not found"}), 404
+            exclude.add(requirement_id)
+            if row['embedding'] and row['embedding_model'] == embedder.name:
+                query = from_blob(row['embedding'])
+            else:
+                query = embedder.embed([row['content']])[0]
+        else:
+            query = embedder.embed([text])[0]
+
+        index = project_index(DB_PATH, project_id, embedder)
+        with index.lock:
+            index.refresh(conn)
+            # A few extra in case some indexed requirements were since merged away
+            hits = index.search(query, k=k + 5, exclude=exclude)[0]
+        rows = {row['id']: dict(row) for row in conn.execute(
+            f'SELECT id, content, req_type, priority, status FROM requirements '
+            f'WHERE project_id = ? AND id IN ({",".join("?" * len(hits))})',
+            (project_id, *[i for i, _ in hits])).fetchall()} if hits else {}
+        conn.close()
+
+        similar = [dict(rows[i], score=round(score, 4)) for i, score in hits if i in rows][:k]
+        return jsonify({"success": True, "project_id": project_id, "embedder": embedder.name,
+                        "similar": similar}), 200
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+def format_value(value):
+    """'<= 2 s', '50,000 USD', '2025-03-01 (month)' for the SRS export."""
+    comparator = "" if value['comparator'] == '=' else value['comparator'] + " "
+    if value['kind'] == 'date':
+        return f"{comparator}{value['date_value']} ({value['unit']})"
+    number, unit = value['value'], value['unit']
+    if value['kind'] == 'duration':
+        # Stored in seconds; shown in the largest whole-ish unit
+        for name, seconds in (("days", 86400), ("hours", 3600), ("minutes", 60)):
+            if number >= seconds:
+                number, unit = number / seconds, name
+                break
+    elif value['kind'] == 'count' and number != 1:
+        unit = "people" if unit == "person" else unit + "s"
+    return f"{comparator}{number:,.{12 if number >= 1e6 else 6}g} {unit}"
+
 @app.route('/api/projects/<int:project_id>/export', methods=['GET'])
 def export_requirements(project_id):
     """Export SRS document with all captured data."""
@@ -193,7 +665,8 @@ def export_requirements(project_id):
         cursor.execute('SELECT * FROM projects WHERE id = ?', (project_id,))
         project = dict(cursor.fetchone() or {})
         
-        cursor.execute('SELECT * FROM requirements WHERE project_id = ? ORDER BY timestamp DESC', (project_id,))
+        cursor.execute('SELECT id, content, req_type, priority, status, timestamp FROM requirements '
+                       'WHERE project_id = ? ORDER BY timestamp DESC', (project_id,))
         requirements = [dict(row) for row in cursor.fetchall()]
         
         cursor.execute('SELECT * FROM conversation_history WHERE project_id = ? ORDER BY timestamp', (project_id,))
@@ -205,6 +678,9 @@ def export_requirements(project_id):
         cursor.execute('SELECT * FROM contradictions WHERE project_id = ? ORDER BY timestamp DESC', (project_id,))
         contradictions = [dict(row) for row in cursor.fetchall()]
         
+        cursor.execute('SELECT * FROM requirement_values WHERE project_id = ? ORDER BY subject, id', (project_id,))
+        values = [dict(row) for row in cursor.fetchall()]
+        
         conn.close()
         
         doc = f"""
@@ -229,7 +705,8 @@ Document Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
         for i, conv in enumerate(conversations, 1):
             doc += f"\n[Exchange {i}]\n"
             doc += f"User: {conv.get('user_message', '')}\n"
-            doc += f"Bot: {conv.get('bot_response', '')}\n"
+            if conv.get('bot_response'):
+                doc += f"Bot: {conv.get('bot_response', '')}\n"
             doc += f"Timestamp: {conv.get('timestamp', '')}\n"
             doc += "-" * 40 + "\n"
             
@@ -261,6 +738,11 @@ Document Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
         else:
             doc += "No constraints captured yet.\n"
         
+        if values:
+            doc += "\nKey figures:\n"
+            for value in values:
+                doc += f"  {value['subject'].replace('_', ' ')}: {format_value(value)}   (\"{value['text']}\")\n"
+        
         doc += f"\n{'='*80}\n5. AMBIGUITIES DETECTED\n{'='*80}\n\n"
         if ambiguities:
             for i, amb in enumerate(ambiguities, 1):
@@ -306,9 +788,11 @@ def internal_error(error):
 
 if __name__ == '__main__':
     if not os.path.exists(DB_PATH):
-        print("Database not found. Creating...")
+        log.info("db.creating", path=DB_PATH)
         os.system(f'python {os.path.join(os.path.dirname(__file__), "../database/setup.py")}')
+    else:
+        # Bring existing databases up to date with any newly added tables
+        init_database(DB_PATH)
     
-    print("Starting Flask backend server...")
-    print("Access at: http://localhost:5000")
+    log.info("backend.starting", url="http://localhost:5000")
     app.run(debug=True, port=5000, use_reloader=False)
\ No newline at end of file
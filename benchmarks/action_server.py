@@ -0,0 +1,147 @@
+# benchmarks/action_server.py
+# Action throughput: stock `rasa run actions` vs the multi-worker action server.
+#
+#   python -m benchmarks.action_server --senders 32 --messages 5 --workers 4
+#   python -m benchmarks.action_server --restart-after 3     # SIGHUP the multi-worker run mid-way
+#
+# Starts an Ollama stub (--ttft to first token, no concurrency limit, so the
+# action server is the bottleneck) and a Rasa stub that sends every message
+# to the action server under test as a real action call. Each sender sends
+# its messages one after another. Scenarios, each a separate server process
+# run from a scratch directory with its own database:
+#
+#   one thread    rasa_sdk, ACTION_THREADS=1 - one action at a time per
+#                 process, like the synchronous actions before
+#   rasa_sdk      rasa_sdk with the async actions (ACTION_THREADS threads)
+#   workers       python -m common.action_server --workers N
+#
+# "errors" counts messages that did not get a reply; with --restart-after
+# it shows whether a rolling restart dropped any.
+
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from common.log import configure_logging
+
+configure_logging(level="WARNING")
+
+import requests
+
+from benchmarks.corpus import PHASE_MESSAGES
+from benchmarks.stats import summarize
+from benchmarks.stubs import start_ollama_stub, start_rasa_stub
+from database.setup import init_database
+
+
+def start_server(command, env, workdir, port):
+    process = subprocess.Popen(command, cwd=workdir, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 180
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/health", timeout=1).ok:
+                return process
+        except requests.RequestException:
+            pass
+        if process.poll() is not None:
+            break
+        time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"{' '.join(command)} did not come up")
+
+
+def run_scenario(name, command, extra_env, args, ollama_url, restart_after=None):
+    port = args.port
+    with tempfile.TemporaryDirectory() as workdir:
+        init_database(os.path.join(workdir, "requirements.db"))
+        env = dict(os.environ, PYTHONPATH=ROOT, OLLAMA_ENDPOINTS=ollama_url, OLLAMA_WARMUP="0",
+                   ACTIONS_METRICS_PORT="0", LOG_LEVEL="WARNING", **extra_env)
+        server = start_server(command + ["--port", str(port)], env, workdir, port)
+        rasa = start_rasa_stub(0, latency="fixed:0", action_url=f"http://127.0.0.1:{port}/webhook")
+        rasa_url = f"http://127.0.0.1:{rasa.server_address[1]}/webhooks/rest/webhook"
+
+        latencies = []
+        errors = Counter()
+        lock = threading.Lock()
+        messages = PHASE_MESSAGES["functional"]
+
+        def sender(index):
+            session = requests.Session()
+            for turn in range(args.messages):
+                payload = {"sender": f"{name}-{index}", "message": messages[(index + turn) % len(messages)]}
+                start = time.perf_counter()
+                try:
+                    response = session.post(rasa_url, json=payload, timeout=300)
+                    response.raise_for_status()
+                    ok = bool(response.json())
+                except (requests.RequestException, ValueError) as e:
+                    with lock:
+                        errors[type(e).__name__] += 1
+                    continue
+                with lock:
+                    if ok:
+                        latencies.append(time.perf_counter() - start)
+                    else:
+                        errors["no reply"] += 1
+
+        if restart_after is not None:
+            threading.Timer(restart_after, server.send_signal, args=(signal.SIGHUP,)).start()
+        threads = [threading.Thread(target=sender, args=(i,), daemon=True) for i in range(args.senders)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - start
+
+        rasa.stop()
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+
+    lat = summarize(latencies)
+    print(f"{name:<13}{len(latencies) / wall:>8.1f}{lat.get('p50', 0):>9.2f}{lat.get('p95', 0):>9.2f}"
+          f"{sum(errors.values()):>8}  {dict(errors) or ''}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the action server against stub Rasa and Ollama")
+    parser.add_argument("--senders", type=int, default=32)
+    parser.add_argument("--messages", type=int, default=5, help="messages per sender")
+    parser.add_argument("--workers", type=int, default=4, help="worker processes in the multi-worker scenario")
+    parser.add_argument("--threads", type=int, default=8, help="ACTION_THREADS per process")
+    parser.add_argument("--ttft", default="fixed:0.5", help="Ollama stub time to first token")
+    parser.add_argument("--port", type=int, default=5155)
+    parser.add_argument("--restart-after", type=float, default=None,
+                        help="send SIGHUP to the multi-worker server this many seconds into its run")
+    parser.add_argument("--scenarios", default="one thread,rasa_sdk,workers")
+    args = parser.parse_args()
+
+    ollama = start_ollama_stub(0, ttft=args.ttft, tokens_per_sec=400.0, load_seconds=0, parallel=0)
+    ollama_url = f"http://127.0.0.1:{ollama.server_address[1]}"
+    rasa_sdk = [sys.executable, "-m", "rasa_sdk", "--actions", "actions"]
+    scenarios = {
+        "one thread": (rasa_sdk, {"ACTION_THREADS": "1"}, None),
+        "rasa_sdk": (rasa_sdk, {"ACTION_THREADS": str(args.threads)}, None),
+        "workers": ([sys.executable, "-m", "common.action_server", "--workers", str(args.workers)],
+                    {"ACTION_THREADS": str(args.threads)}, args.restart_after),
+    }
+
+    print(f"cpus: {os.cpu_count()}, {args.senders} senders x {args.messages} messages, Ollama ttft {args.ttft}")
+    print(f"{'scenario':<13}{'msg/s':>8}{'p50 s':>9}{'p95 s':>9}{'errors':>8}")
+    for name in args.scenarios.split(","):
+        command, extra_env, restart_after = scenarios[name]
+        run_scenario(name, command, extra_env, args, ollama_url, restart_after)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# benchmarks/ambiguity.py
+# Throughput of the lexicon ambiguity detector (common/ambiguity.py).
+#
+#   python -m benchmarks.ambiguity --messages 100000
+#   python -m benchmarks.ambiguity --exchanges 200000      # also time a rescan of that many stored messages
+#
+# Times three ways to find the lexicon terms in the same messages:
+#
+#   per-term regex   one compiled \bterm\b pattern per lexicon phrase, the
+#                    obvious implementation (no overlap resolution)
+#   alternation      all phrases in one regex alternation, longest first
+#   automaton        detect(): tokenise once, walk the word automaton
+#
+# The messages are corpus messages, follow-ups and filler clauses combined
+# like benchmarks/gen_db.py does. The rescan then runs detect() over a
+# generated database's conversation_history and writes the ambiguities.
+
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from common.log import configure_logging
+
+configure_logging(level="WARNING")
+
+from benchmarks.corpus import FOLLOW_UPS, PHASE_MESSAGES
+from benchmarks.gen_db import FILLER, generate
+from common.ambiguity import _phrases, detect, rescan
+
+
+def build_messages(count, seed):
+    rng = random.Random(seed)
+    sentences = [m for phase in PHASE_MESSAGES.values() for m in phase] + FOLLOW_UPS
+    return [" ".join([rng.choice(sentences)] + rng.sample(FILLER, k=rng.randint(0, 2))) for _ in range(count)]
+
+
+def per_term_regex():
+    patterns = [re.compile(r"\b" + r"\W+".join(map(re.escape, phrase.split())) + r"\b", re.IGNORECASE)
+                for phrase, category in _phrases().items() if category]
+    return lambda text: [m for p in patterns for m in p.finditer(text)]
+
+
+def alternation():
+    phrases = sorted((p for p, c in _phrases().items() if c), key=len, reverse=True)
+    pattern = re.compile(r"\b(?:" + "|".join(r"\W+".join(map(re.escape, p.split())) for p in phrases) + r")\b",
+                         re.IGNORECASE)
+    return lambda text: pattern.findall(text)
+
+
+def time_detector(name, fn, messages):
+    start = time.perf_counter()
+    flagged = sum(1 for text in messages if fn(text))
+    elapsed = time.perf_counter() - start
+    print(f"{name:<18}{len(messages) / elapsed:>12,.0f}{elapsed * 1e6 / len(messages):>10.1f}{flagged:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the lexicon ambiguity detector")
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--exchanges", type=int, default=0, help="stored messages to rescan (0 = skip)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    messages = build_messages(args.messages, args.seed)
+    print(f"{len(_phrases())} phrases, {args.messages} messages")
+    print(f"{'detector':<18}{'msg/s':>12}{'us/msg':>10}{'flagged':>10}")
+    time_detector("per-term regex", per_term_regex(), messages)
+    time_detector("alternation", alternation(), messages)
+    time_detector("automaton", detect, messages)
+
+    if args.exchanges:
+        with tempfile.TemporaryDirectory() as workdir:
+            path = os.path.join(workdir, "rescan.db")
+            generate(path, projects=10, exchanges=args.exchanges // 10, seed=args.seed)
+            counts = rescan(path)
+            print(f"rescan: {counts['messages']} messages, {counts['flagged']} flagged, "
+                  f"{counts['inserted']} inserted in {counts['seconds']} s "
+                  f"({counts['messages'] / counts['seconds']:,.0f} msg/s)")
+            counts = rescan(path)
+            print(f"second rescan: {counts['inserted']} inserted in {counts['seconds']} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# benchmarks/contradictions.py
+# Speed and accuracy of the local contradiction checks (common/contradictions.py).
+#
+#   python -m benchmarks.contradictions --sizes 1000,10000 --checks 200
+#
+# For each size, a project is filled with that many requirements built like
+# benchmarks/gen_db.py builds them (corpus messages with filler clauses, so
+# near-duplicates with and without a "without ..." clause are common), with
+# their extracted values. Then --checks new requirements are stored and
+# checked one by one, as the action does: half are harmless corpus
+# requirements, half contradict a stored one (a negated or antonym
+# rewrite, or a changed budget, deadline or team size).
+#
+# "first check" includes loading the project's vectors into memory; the
+# following checks only add the new row. Findings on harmless requirements
+# count as false positives, and contradicting requirements without a finding
+# as misses.
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from common.log import configure_logging
+
+configure_logging(level="WARNING")
+
+from benchmarks.corpus import PHASE_MESSAGES
+from benchmarks.gen_db import FILLER
+from benchmarks.stats import summarize
+from common import contradictions
+from common.quantities import extract, record as record_values
+from database.setup import init_database
+
+STATEMENTS = [
+    ("The app must work offline", "The app does not need to work offline"),
+    ("Login is optional for guests", "Login is required for guests"),
+    ("Payments are processed automatically", "Payments are processed manually"),
+    ("Customers can cancel a booking online", "Customers cannot cancel a booking online"),
+    ("Patient records are encrypted at rest", "Patient records are stored unencrypted at rest"),
+    ("Managers are allowed to export reports", "Managers are forbidden to export reports"),
+    ("The admin dashboard is public", "The admin dashboard is private"),
+    ("Email notifications are enabled by default", "Email notifications are disabled by default"),
+]
+FIGURES = [
+    ("The budget is $50,000", "The budget is $120,000"),
+    ("The deadline is March 2025", "The deadline is October 2025"),
+    ("Five developers are available", "Twelve developers are available"),
+    ("Support at least 1000 concurrent users", "Up to 200 concurrent users"),
+]
+
+
+def harmless(rng):
+    messages = [m for phase in PHASE_MESSAGES.values() for m in phase if not extract(m)]
+    return " ".join([rng.choice(messages)] + rng.sample(FILLER, k=rng.randint(0, 2)))
+
+
+def store(conn, project_id, content):
+    requirement_id = conn.execute('INSERT INTO requirements (project_id, content) VALUES (?, ?)',
+                                  (project_id, content)).lastrowid
+    values = extract(content)
+    if values:
+        record_values(conn, project_id, requirement_id, values)
+    return requirement_id, values
+
+
+def run_size(size, args, workdir):
+    rng = random.Random(args.seed)
+    path = os.path.join(workdir, f"contradictions-{size}.db")
+    init_database(path)
+    conn = sqlite3.connect(path)
+    pairs = STATEMENTS + FIGURES
+    with conn:
+        for i in range(size):
+            # The first half of each pair is stated once, early on
+            content = pairs[i][0] if i < len(pairs) else harmless(rng)
+            store(conn, 1, content)
+
+    contradictions._projects.clear()
+    latencies = []
+    false_positives = misses = 0
+    for i in range(args.checks):
+        conflicting = i % 2 == 1
+        content = rng.choice(pairs)[1] if conflicting else harmless(rng)
+        with conn:
+            requirement_id, values = store(conn, 1, content)
+            start = time.perf_counter()
+            findings = contradictions.check_requirement(conn, 1, requirement_id, content, values)
+            latencies.append(time.perf_counter() - start)
+        if conflicting:
+            misses += not findings
+        else:
+            false_positives += bool(findings)
+    conn.close()
+
+    warm = summarize(latencies[1:])
+    print(f"{size:>8}{latencies[0] * 1000:>14.1f}{warm['p50'] * 1000:>10.2f}{warm['p95'] * 1000:>10.2f}"
+          f"{misses:>8}/{args.checks // 2:<5}{false_positives:>6}/{args.checks - args.checks // 2}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the local contradiction checks")
+    parser.add_argument("--sizes", default="1000,10000", type=lambda s: [int(x) for x in s.split(",")])
+    parser.add_argument("--checks", type=int, default=200, help="new requirements checked per size")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'stored':>8}{'first check ms':>14}{'p50 ms':>10}{'p95 ms':>10}{'missed':>14}{'false +':>10}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            run_size(size, args, workdir)
+
+
+if __name__ == "__main__":
+    main()
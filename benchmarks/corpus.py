@@ -0,0 +1,57 @@
+# benchmarks/corpus.py
+# Stakeholder messages per elicitation phase, modelled on data/nlu.yml.
+# Shared by the load generator and the synthetic data generators.
+
+PHASE_ORDER = ["vision", "functional", "non_functional", "constraints"]
+
+PHASE_MESSAGES = {
+    "vision": [
+        "We need a web application for booking appointments at our clinics",
+        "The project is about e-commerce for handmade furniture",
+        "I want a mobile app that helps field engineers log site inspections",
+        "Our staff currently track everything in spreadsheets and it keeps breaking",
+        "The main users are patients, receptionists and doctors",
+        "It should replace our old desktop tool that only works on Windows",
+    ],
+    "functional": [
+        "Users should be able to login with their email address",
+        "We need a search feature across all orders and customers",
+        "Integration with a payment gateway such as Stripe",
+        "Users upload documents and the admin reviews them",
+        "Automated email notifications when a booking changes",
+        "An admin dashboard with daily statistics",
+        "User role management for staff and managers",
+        "Real-time notifications on mobile",
+        "Customers can cancel a booking up to 24 hours in advance",
+        "That's all the features I can think of for now",
+    ],
+    "non_functional": [
+        "Performance should support 1000 concurrent users",
+        "Pages should load in under 2 seconds",
+        "We need encryption for security of patient data",
+        "GDPR compliance needed",
+        "High availability required, at least 99.9% uptime",
+        "Responsive design for mobile and tablets",
+        "Multi-language support for English and Spanish",
+        "Audit logging required for every change",
+        "Data backup daily with a disaster recovery plan",
+    ],
+    "constraints": [
+        "Budget is $50,000",
+        "Deadline is March 2025",
+        "Five developers available for the first release",
+        "Cloud hosting on AWS is mandatory",
+        "The database should be MySQL because the team knows it",
+        "Three-month timeline for the MVP",
+        "Unit test coverage above 80%",
+        "No more constraints, I think we're done",
+    ],
+}
+
+FOLLOW_UPS = [
+    "yes, that's right",
+    "ok",
+    "no, I meant the mobile version",
+    "Can you repeat the last question?",
+    "Actually it should be fast and user-friendly",
+]
@@ -0,0 +1,143 @@
+# benchmarks/dedupe.py
+# Cost and accuracy of duplicate suppression (common/dedupe.py) as a
+# project grows.
+#
+#   python -m benchmarks.dedupe --sizes 1000,10000,100000 --inserts 400
+#
+# For each size, one project is filled with that many distinct generated
+# requirements ("Clerks must approve refund requests from the kiosk within
+# 30 seconds", words drawn from a few thousand). Then --inserts new
+# statements go through the action's write path - find_duplicate(), then
+# either record_merge() or the INSERT plus index_requirement() - in equal
+# parts:
+#
+#   exact      a stored requirement with other casing and punctuation
+#   near       a stored requirement with one content word added or dropped
+#   new        a freshly generated requirement
+#   changed    a stored requirement with another number or a negation,
+#              which must be stored, not merged
+#
+# Times are per statement inside a transaction; the commit, which costs the
+# same at any size, is left out.
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from common.log import configure_logging
+
+configure_logging(level="WARNING")
+
+from benchmarks.stats import summarize
+from common import dedupe
+from database.setup import init_database
+
+SYLLABLES = ["ka", "lo", "mi", "re", "tu", "sa", "ven", "dor", "pil", "gra", "nu", "te", "bri", "os", "cal", "mer"]
+MODALS = ["must", "should", "shall", "can"]
+KINDS = ("exact", "near", "new", "changed")
+
+
+def vocabulary(rng, size):
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))))
+    return sorted(words)
+
+
+def requirement(rng, words):
+    actor, verb, *rest = rng.sample(words, 6)
+    text = f"{actor.capitalize()}s {rng.choice(MODALS)} {verb} the {' '.join(rest[:2])} from the {' '.join(rest[2:])}"
+    if rng.random() < 0.3:
+        text += f" within {rng.randint(2, 90)} seconds"
+    return text + "."
+
+
+def variant(rng, kind, stored, words):
+    if kind == "exact":
+        return "The " + stored.upper().rstrip(".") + " !"
+    if kind == "near":
+        tokens = stored.rstrip(".").split()
+        if rng.random() < 0.5:
+            tokens.insert(rng.randint(1, len(tokens)), rng.choice(words))
+        else:
+            del tokens[tokens.index("the") + 1]
+        return " ".join(tokens) + "."
+    if kind == "changed":
+        if "within" in stored:
+            number = stored.split("within ")[1].split()[0]
+            return stored.replace(f"within {number}", f"within {int(number) + 5}")
+        return stored.replace(" the ", " not the ", 1)
+    return requirement(rng, words)
+
+
+def insert(conn, project_id, content):
+    duplicate = dedupe.find_duplicate(conn, project_id, content)
+    if duplicate:
+        dedupe.record_merge(conn, project_id, duplicate, content, "Functional", "medium")
+        return duplicate
+    cursor = conn.execute('INSERT INTO requirements (project_id, content, req_type, priority, status, content_hash) '
+                          'VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (project_id, content_hash) DO NOTHING',
+                          (project_id, content, "Functional", "medium", "captured", dedupe.content_hash(content)))
+    dedupe.index_requirement(conn, project_id, cursor.lastrowid, content)
+    return None
+
+
+def run_size(size, args, workdir):
+    rng = random.Random(args.seed)
+    words = vocabulary(rng, args.words)
+    path = os.path.join(workdir, f"dedupe-{size}.db")
+    init_database(path)
+    conn = sqlite3.connect(path)
+    stored = []
+    start = time.perf_counter()
+    with conn:
+        while len(stored) < size:
+            content = requirement(rng, words)
+            if not insert(conn, 1, content):
+                stored.append(content)
+    fill = time.perf_counter() - start
+
+    latencies = {kind: [] for kind in KINDS}
+    errors = {kind: 0 for kind in KINDS}
+    # Each stored requirement is restated at most once
+    for i, original in enumerate(rng.sample(stored, args.inserts)):
+        kind = KINDS[i % len(KINDS)]
+        content = variant(rng, kind, original, words)
+        with conn:
+            start = time.perf_counter()
+            merged = insert(conn, 1, content)
+            latencies[kind].append(time.perf_counter() - start)
+        expected = kind in ("exact", "near")
+        errors[kind] += bool(merged) != expected
+    conn.close()
+
+    for kind in KINDS:
+        stats = summarize(latencies[kind])
+        print(f"{size:>8}{kind:>9}{stats['p50'] * 1000:>10.3f}{stats['p95'] * 1000:>10.3f}"
+              f"{errors[kind]:>8}/{len(latencies[kind])}")
+    print(f"{'':>8}{'fill':>9}  {size / fill:,.0f} req/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark duplicate-requirement suppression")
+    parser.add_argument("--sizes", default="1000,10000,100000", type=lambda s: [int(x) for x in s.split(",")])
+    parser.add_argument("--inserts", type=int, default=400, help="statements written per size")
+    parser.add_argument("--words", type=int, default=3000, help="vocabulary of the generated requirements")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'stored':>8}{'kind':>9}{'p50 ms':>10}{'p95 ms':>10}{'wrong':>13}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            run_size(size, args, workdir)
+
+
+if __name__ == "__main__":
+    main()
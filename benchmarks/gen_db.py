@@ -0,0 +1,164 @@
+# benchmarks/gen_db.py
+# Synthetic large-scale database generator for scale testing.
+#
+#   python -m benchmarks.gen_db --output /tmp/big.db --projects 200 --exchanges 5000
+#
+# Creates the schema with database/setup.py:init_database, then bulk-loads
+# projects, conversation history, requirements, ambiguities and
+# contradictions using batched executemany inside large transactions with
+# journaling and fsync turned off for the load. Text lengths follow what
+# real sessions produce: short-to-medium stakeholder messages and longer
+# bot replies.
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import PHASE_MESSAGES, FOLLOW_UPS
+from database.setup import init_database
+
+REQ_TYPES = ["functional", "non-functional", "Constraint", "Requirement"]
+PRIORITIES = ["high", "medium", "low"]
+
+BOT_SENTENCES = [
+    "Thanks, that helps me understand the scope.",
+    "Could you tell me more about who will use this feature?",
+    "I have recorded that as a functional requirement.",
+    "How many users do you expect at peak times?",
+    "What should happen if the payment fails?",
+    "Is there a deadline for the first release?",
+    "Should this work offline as well?",
+    "Let's move on to the non-functional requirements.",
+]
+
+FILLER = [
+    "because our current process is slow",
+    "for both the web and mobile versions",
+    "and it has to integrate with the existing CRM",
+    "which the managers asked for last quarter",
+    "ideally before the end of the year",
+    "without adding extra work for the receptionists",
+]
+
+
+def _text_pool(rng, size, sentences, extra, min_parts, max_parts):
+    """Pre-build a pool of varied texts so generation cost stays in SQLite, not Python."""
+    pool = []
+    for _ in range(size):
+        parts = [rng.choice(sentences)]
+        parts += rng.sample(extra, k=min(len(extra), rng.randint(min_parts, max_parts)))
+        pool.append(" ".join(parts))
+    return pool
+
+
+def generate(path, projects=10, exchanges=1000, requirement_ratio=0.6, ambiguity_ratio=0.1,
+             contradiction_ratio=0.03, seed=42, batch_size=50_000, overwrite=True):
+    """
+    Build a synthetic database at `path`. Each project gets `exchanges`
+    conversation rows; requirements, ambiguities and contradictions are
+    created per exchange with the given probabilities. Returns row counts.
+    """
+    if overwrite and os.path.exists(path):
+        os.remove(path)
+    init_database(path)
+
+    rng = random.Random(seed)
+    messages = [m for phase in PHASE_MESSAGES.values() for m in phase]
+    user_pool = _text_pool(rng, 2000, messages + FOLLOW_UPS, FILLER, 0, 3)
+    bot_pool = _text_pool(rng, 2000, BOT_SENTENCES, BOT_SENTENCES, 1, 5)
+    start_time = datetime(2025, 1, 1)
+
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA cache_size = -200000")
+
+    counts = {"projects": projects, "conversation_history": 0, "requirements": 0,
+              "ambiguities": 0, "contradictions": 0}
+
+    with conn:
+        conn.executemany(
+            "INSERT INTO projects (id, project_name, description, created_date, modified_date) VALUES (?, ?, ?, ?, ?)",
+            [(pid, f"Synthetic project {pid}", rng.choice(user_pool),
+              (start_time + timedelta(days=pid % 365)).isoformat(sep=" "),
+              (start_time + timedelta(days=pid % 365 + 30)).isoformat(sep=" "))
+             for pid in range(1, projects + 1)])
+
+    # Timestamps are passed as epoch seconds and formatted by SQLite itself
+    history_sql = ("INSERT INTO conversation_history (project_id, user_message, bot_response, intent, timestamp) "
+                   "VALUES (?, ?, ?, 'user_message', datetime(?, 'unixepoch'))")
+    requirement_sql = ("INSERT INTO requirements (project_id, content, req_type, priority, status, timestamp) "
+                       "VALUES (?, ?, ?, ?, 'captured', datetime(?, 'unixepoch'))")
+    ambiguity_sql = ("INSERT INTO ambiguities (project_id, content, status, timestamp) "
+                     "VALUES (?, 'Ambiguous: ' || ?, 'detected', datetime(?, 'unixepoch'))")
+    contradiction_sql = ("INSERT INTO contradictions (project_id, message, status, timestamp) "
+                         "VALUES (?, 'Conflicts with an earlier statement: ' || ?, 'flagged', datetime(?, 'unixepoch'))")
+
+    outcomes = ["requirement", "ambiguity", "contradiction", None]
+    weights = [requirement_ratio, ambiguity_ratio, contradiction_ratio,
+               max(0.0, 1.0 - requirement_ratio - ambiguity_ratio - contradiction_ratio)]
+    epoch = int(start_time.timestamp())
+
+    for pid in range(1, projects + 1):
+        base = epoch + (pid % 365) * 86400
+        for offset in range(0, exchanges, batch_size):
+            n = min(batch_size, exchanges - offset)
+            # Draw whole columns at once; per-row Python work is the bottleneck
+            users = rng.choices(user_pool, k=n)
+            bots = rng.choices(bot_pool, k=n)
+            kinds = rng.choices(outcomes, weights=weights, k=n)
+            types = rng.choices(REQ_TYPES, k=n)
+            priorities = rng.choices(PRIORITIES, k=n)
+            stamps = range(base + 30 * offset, base + 30 * (offset + n), 30)
+
+            history = list(zip([pid] * n, users, bots, stamps))
+            requirements = [(pid, u, t, pr, ts) for u, t, pr, ts, k in zip(users, types, priorities, stamps, kinds)
+                            if k == "requirement"]
+            ambiguities = [(pid, u, ts) for u, ts, k in zip(users, stamps, kinds) if k == "ambiguity"]
+            contradictions = [(pid, u, ts) for u, ts, k in zip(users, stamps, kinds) if k == "contradiction"]
+            with conn:
+                conn.executemany(history_sql, history)
+                conn.executemany(requirement_sql, requirements)
+                conn.executemany(ambiguity_sql, ambiguities)
+                conn.executemany(contradiction_sql, contradictions)
+            counts["conversation_history"] += len(history)
+            counts["requirements"] += len(requirements)
+            counts["ambiguities"] += len(ambiguities)
+            counts["contradictions"] += len(contradictions)
+
+    conn.execute("PRAGMA journal_mode = DELETE")
+    conn.execute("ANALYZE")
+    conn.close()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a large synthetic requirements database")
+    parser.add_argument("--output", required=True, help="database file to create (overwritten)")
+    parser.add_argument("--projects", type=int, default=100)
+    parser.add_argument("--exchanges", type=int, default=1000, help="conversation exchanges per project")
+    parser.add_argument("--requirement-ratio", type=float, default=0.6)
+    parser.add_argument("--ambiguity-ratio", type=float, default=0.1)
+    parser.add_argument("--contradiction-ratio", type=float, default=0.03)
+    parser.add_argument("--batch-size", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    counts = generate(args.output, args.projects, args.exchanges, args.requirement_ratio,
+                      args.ambiguity_ratio, args.contradiction_ratio, args.seed, args.batch_size)
+    elapsed = time.perf_counter() - start
+    total = sum(counts.values())
+    print(f"Wrote {total:,} rows to {args.output} in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)")
+    for table, count in counts.items():
+        print(f"  {table:<22}{count:>12,}")
+
+
+if __name__ == "__main__":
+    main()
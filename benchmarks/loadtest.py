@@ -0,0 +1,219 @@
+# benchmarks/loadtest.py
+# End-to-end load generator for the Flask backend.
+#
+# Simulates N concurrent stakeholders, each creating a project and walking
+# through the elicitation phases with think time between messages, the way
+# the React frontend drives /api/chat and polls /api/projects/<id>/summary.
+#
+#   # Backend running normally, Rasa/Ollama replaced by in-process stubs
+#   python -m benchmarks.loadtest --users 20 --turns-per-phase 4 --stubs
+#
+#   # Compare against an earlier run
+#   python -m benchmarks.loadtest --users 20 --output after.json --compare before.json
+#
+# The backend itself must already be running (python backend/app.py).
+# --stubs starts the Rasa stub on :5005 and the Ollama stub on :11434 inside
+# this process; add --stub-action-url to route through the real action server.
+
+import argparse
+import json
+import random
+import subprocess
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime
+
+import requests
+
+from benchmarks.corpus import PHASE_ORDER, PHASE_MESSAGES, FOLLOW_UPS
+from benchmarks.stats import summarize
+from benchmarks.stubs import Distribution, start_ollama_stub, start_rasa_stub
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = []
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, latency, error=None):
+        with self._lock:
+            self.samples.append((endpoint, latency, error))
+
+
+def timed_request(recorder, session, endpoint, method, url, timeout, **kwargs):
+    """Issue one request, classify the outcome and record its latency."""
+    start = time.perf_counter()
+    error = None
+    body = None
+    try:
+        response = session.request(method, url, timeout=timeout, **kwargs)
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        text = response.text.lower()
+        if "database is locked" in text or "database table is locked" in text:
+            error = "sqlite_locked"
+        elif response.status_code >= 400:
+            error = f"http_{response.status_code}"
+        elif isinstance(body, dict) and body.get("success") is False:
+            error = "app_error"
+    except requests.exceptions.Timeout:
+        error = "timeout"
+    except requests.exceptions.ConnectionError:
+        error = "connection"
+    recorder.record(endpoint, time.perf_counter() - start, error)
+    return body
+
+
+def stakeholder(index, args, recorder, think_time, deadline, run_id):
+    rng = random.Random(args.seed + index)
+    session = requests.Session()
+    base = args.base_url.rstrip("/")
+    sender_id = f"loadtest-{run_id}-{index}"
+
+    # Stagger session starts over the ramp-up window
+    time.sleep(args.ramp_up * index / max(1, args.users))
+
+    project = timed_request(recorder, session, "create_project", "POST", f"{base}/api/projects", args.timeout,
+                            json={"project_name": f"Load test {index}", "description": "synthetic"})
+    project_id = (project or {}).get("project_id", 1)
+
+    turn = 0
+    for phase in PHASE_ORDER:
+        for _ in range(args.turns_per_phase):
+            if time.monotonic() >= deadline:
+                return
+            if rng.random() < args.follow_up_ratio:
+                message = rng.choice(FOLLOW_UPS)
+            else:
+                message = rng.choice(PHASE_MESSAGES[phase])
+            timed_request(recorder, session, "chat", "POST", f"{base}/api/chat", args.timeout,
+                          json={"message": message, "project_id": project_id, "sender_id": sender_id})
+            turn += 1
+            if turn % args.summary_every == 0:
+                timed_request(recorder, session, "summary", "GET",
+                              f"{base}/api/projects/{project_id}/summary", args.timeout)
+            time.sleep(think_time.sample())
+
+
+def build_report(recorder, wall_seconds, args):
+    by_endpoint = defaultdict(list)
+    errors = defaultdict(Counter)
+    for endpoint, latency, error in recorder.samples:
+        by_endpoint[endpoint].append(latency)
+        if error:
+            errors[endpoint][error] += 1
+
+    endpoints = {}
+    for endpoint, latencies in by_endpoint.items():
+        failed = sum(errors[endpoint].values())
+        endpoints[endpoint] = {
+            "requests": len(latencies),
+            "throughput_rps": len(latencies) / wall_seconds,
+            "error_rate": failed / len(latencies),
+            "errors": dict(errors[endpoint]),
+            "latency_seconds": summarize(latencies),
+        }
+
+    total = len(recorder.samples)
+    total_errors = sum(sum(c.values()) for c in errors.values())
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "commit": _git_commit(),
+            "config": vars(args),
+        },
+        "wall_seconds": wall_seconds,
+        "requests": total,
+        "throughput_rps": total / wall_seconds if wall_seconds else 0.0,
+        "error_rate": total_errors / total if total else 0.0,
+        "sqlite_lock_errors": sum(c["sqlite_locked"] for c in errors.values()),
+        "endpoints": endpoints,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report, baseline=None):
+    print(f"\nRequests: {report['requests']} in {report['wall_seconds']:.1f}s "
+          f"({report['throughput_rps']:.2f} req/s), error rate {report['error_rate']:.2%}, "
+          f"SQLite lock errors {report['sqlite_lock_errors']}")
+    print(f"{'endpoint':<16}{'reqs':>7}{'rps':>8}{'err%':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for endpoint, stats in sorted(report["endpoints"].items()):
+        lat = stats["latency_seconds"]
+        line = (f"{endpoint:<16}{stats['requests']:>7}{stats['throughput_rps']:>8.2f}"
+                f"{stats['error_rate'] * 100:>7.1f}{lat['p50'] * 1000:>10.1f}"
+                f"{lat['p95'] * 1000:>10.1f}{lat['p99'] * 1000:>10.1f}")
+        old = (baseline or {}).get("endpoints", {}).get(endpoint)
+        if old:
+            delta = (lat["p95"] / old["latency_seconds"]["p95"] - 1) * 100
+            line += f"   p95 {delta:+.1f}% vs baseline"
+        print(line)
+        if stats["errors"]:
+            print(f"{'':<16}errors: {stats['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /api/chat with simulated stakeholders")
+    parser.add_argument("--base-url", default="http://localhost:5000")
+    parser.add_argument("--users", type=int, default=10, help="concurrent stakeholder sessions")
+    parser.add_argument("--turns-per-phase", type=int, default=3)
+    parser.add_argument("--think-time", default="lognormal:3:0.5", help="pause between messages (distribution)")
+    parser.add_argument("--follow-up-ratio", type=float, default=0.2, help="share of short confirmations/corrections")
+    parser.add_argument("--summary-every", type=int, default=2, help="poll the summary every N chat turns")
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="seconds over which sessions start")
+    parser.add_argument("--duration", type=float, default=600.0, help="stop issuing requests after this many seconds")
+    parser.add_argument("--timeout", type=float, default=180.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="write the JSON report here")
+    parser.add_argument("--compare", default=None, help="earlier JSON report to compare against")
+    parser.add_argument("--stubs", action="store_true", help="start stub Rasa (:5005) and Ollama (:11434) in-process")
+    parser.add_argument("--stub-rasa-latency", default="lognormal:0.02:0.3")
+    parser.add_argument("--stub-action-url", default=None, help="make the Rasa stub call this action server")
+    parser.add_argument("--stub-ttft", default="lognormal:0.3:0.4")
+    parser.add_argument("--stub-tokens-per-sec", type=float, default=40.0)
+    args = parser.parse_args()
+
+    if args.stubs:
+        start_ollama_stub(11434, ttft=args.stub_ttft, tokens_per_sec=args.stub_tokens_per_sec, seed=args.seed)
+        start_rasa_stub(5005, latency=args.stub_rasa_latency, action_url=args.stub_action_url, seed=args.seed)
+
+    recorder = Recorder()
+    think_time = Distribution(args.think_time, random.Random(args.seed))
+    run_id = uuid.uuid4().hex[:6]
+    deadline = time.monotonic() + args.duration
+
+    threads = [
+        threading.Thread(target=stakeholder, args=(i, args, recorder, think_time, deadline, run_id), daemon=True)
+        for i in range(args.users)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_seconds = time.perf_counter() - start
+
+    report = build_report(recorder, wall_seconds, args)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+# benchmarks/lock_store.py
+# Multi-process stress test for the Rasa lock store.
+#
+#   python -m benchmarks.lock_store --workers 4 --conversations 20 --messages 25     # needs Rasa installed
+#
+# Starts --workers processes, each with its own lock store instance, the
+# way several `rasa run` processes share one deployment. Each conversation
+# gets --messages messages in bursts of --burst, --gap seconds apart
+# (a user double-sending, or a client retrying), dealt round-robin to the
+# workers, so consecutive messages of a conversation arrive at different
+# processes while earlier ones are still being handled. Handling a message
+# takes the conversation's lock, then does a deliberately non-atomic
+# read / sleep --hold / write on a per-conversation counter.
+#
+# A correct lock store shows no overlaps (two messages of one conversation
+# handled at once), no lost counter updates, and no message handled before
+# one that reached the store ahead of it. Rasa's in-memory store, which only locks within
+# one process, runs first for comparison.
+
+import argparse
+import json
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from common.log import configure_logging
+
+configure_logging(level="WARNING")
+
+from benchmarks.stats import summarize
+
+
+def make_store(kind, db_path, poll_interval):
+    if kind == "in-memory":
+        from rasa.core.lock_store import InMemoryLockStore
+        return InMemoryLockStore()
+    from common.lock_store import SQLiteLockStore
+    return SQLiteLockStore(db=db_path, poll_interval=poll_interval)
+
+
+def worker(kind, db_path, counters_path, messages, args, ready, start_at, results_path):
+    import asyncio
+
+    store = make_store(kind, db_path, args.poll_interval)
+    counters = sqlite3.connect(counters_path, timeout=30, isolation_level=None)
+
+    # A message reaches the store while its ticket is being issued: between
+    # `requested` and `issued`
+    issued = {}
+    issue_ticket = store.issue_ticket
+
+    def timed_issue_ticket(conversation_id, *rest):
+        ticket = issue_ticket(conversation_id, *rest)
+        issued[conversation_id, ticket] = time.time()
+        return ticket
+
+    store.issue_ticket = timed_issue_ticket
+
+    async def handle(conversation_id, seq):
+        arrival = (seq // args.burst) * args.pause + (seq % args.burst) * args.gap
+        await asyncio.sleep(max(0.0, start_at.value + arrival - time.time()))
+        requested = time.time()
+        async with store.lock(conversation_id, wait_time_in_seconds=args.poll_interval) as lock:
+            entered = time.time()
+            arrived = issued[conversation_id, lock.now_serving]
+            value = counters.execute('SELECT value FROM counters WHERE conversation_id = ?',
+                                     (conversation_id,)).fetchone()[0]
+            await asyncio.sleep(args.hold)
+            counters.execute('UPDATE counters SET value = ? WHERE conversation_id = ?', (value + 1, conversation_id))
+            left = time.time()
+        return conversation_id, requested, arrived, entered, left
+
+    async def run_all():
+        return await asyncio.gather(*(handle(c, s) for c, s in messages))
+
+    ready.wait()
+    while start_at.value == 0:
+        time.sleep(0.001)
+    results = asyncio.run(run_all())
+    counters.close()
+    with open(results_path, "w") as f:
+        json.dump(results, f)
+
+
+def run_kind(kind, args, workdir):
+    db_path = os.path.join(workdir, f"{kind}-locks.db")
+    counters_path = os.path.join(workdir, f"{kind}-counters.db")
+    conn = sqlite3.connect(counters_path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('CREATE TABLE counters (conversation_id TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+    conversations = [f"conv-{i}" for i in range(args.conversations)]
+    conn.executemany('INSERT INTO counters VALUES (?, 0)', [(c,) for c in conversations])
+    conn.commit()
+    conn.close()
+
+    # Message seq of conversation c goes to worker (seq + c) % workers
+    assignments = defaultdict(list)
+    for c, conversation_id in enumerate(conversations):
+        for seq in range(args.messages):
+            assignments[(seq + c) % args.workers].append((conversation_id, seq))
+
+    ready = multiprocessing.Barrier(args.workers + 1)
+    start_at = multiprocessing.Value("d", 0.0)
+    paths = [os.path.join(workdir, f"{kind}-{w}.json") for w in range(args.workers)]
+    processes = [multiprocessing.Process(target=worker, args=(kind, db_path, counters_path, assignments[w],
+                                                              args, ready, start_at, paths[w]))
+                 for w in range(args.workers)]
+    for process in processes:
+        process.start()
+    ready.wait()
+    start_at.value = time.time() + 0.5
+    for process in processes:
+        process.join()
+
+    results = []
+    for path in paths:
+        with open(path) as f:
+            results.extend(json.load(f))
+
+    by_conversation = defaultdict(list)
+    for conversation_id, requested, arrived, entered, left in results:
+        by_conversation[conversation_id].append((entered, left, requested, arrived))
+    overlaps = out_of_order = 0
+    for handled in by_conversation.values():
+        handled.sort()
+        for (_, left, _, _), (entered, _, _, _) in zip(handled, handled[1:]):
+            overlaps += entered < left
+        # Pairs where the message handled later had certainly reached the store first
+        for i, (_, _, requested, _) in enumerate(handled):
+            out_of_order += sum(1 for _, _, _, arrived in handled[i + 1:] if arrived < requested)
+
+    conn = sqlite3.connect(counters_path)
+    counted = conn.execute('SELECT SUM(value) FROM counters').fetchone()[0]
+    conn.close()
+    waits = summarize([entered - requested for _, requested, _, entered, _ in results])
+    first = min(r[1] for r in results)
+    last = max(r[4] for r in results)
+    print(f"{kind:<11}{len(results):>9}{overlaps:>10}{out_of_order:>14}{len(results) - counted:>13}"
+          f"{waits['p50'] * 1000:>13.0f}{waits['p95'] * 1000:>9.0f}{len(results) / (last - first):>9.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress a Rasa lock store from several processes")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--conversations", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=25, help="messages per conversation")
+    parser.add_argument("--burst", type=int, default=5, help="messages a conversation sends back to back")
+    parser.add_argument("--gap", type=float, default=0.005, help="seconds between messages of a burst")
+    parser.add_argument("--pause", type=float, default=0.3, help="seconds between the starts of two bursts")
+    parser.add_argument("--hold", type=float, default=0.02, help="seconds each message holds the lock")
+    parser.add_argument("--poll-interval", type=float, default=0.01)
+    parser.add_argument("--stores", default="in-memory,sqlite")
+    args = parser.parse_args()
+
+    print(f"{'store':<11}{'messages':>9}{'overlaps':>10}{'out of order':>14}{'lost writes':>13}"
+          f"{'wait p50 ms':>13}{'p95':>9}{'msg/s':>9}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for kind in args.stores.split(","):
+            run_kind(kind, args, workdir)
+
+
+if __name__ == "__main__":
+    main()
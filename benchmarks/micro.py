@@ -0,0 +1,216 @@
+# benchmarks/micro.py
+# Microbenchmarks for the Python hot paths of the action server and backend.
+#
+#   python -m benchmarks.micro                      # run, compare with stored baseline
+#   python -m benchmarks.micro --save-baseline      # store this run as the baseline
+#   python -m benchmarks.micro --only history,summary --sizes 100,10000
+#
+# Every case runs with a fixed seed, a warmup phase and several timed
+# repeats; results report mean/stdev/p50/p95 per call. A case regresses when
+# its median is more than --threshold slower than the stored baseline.
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "backend"))
+
+from common.log import configure_logging
+
+# Keep the per-call log lines out of the measurements, and don't let the
+# action server's model warmer talk to Ollama while we measure
+configure_logging(level="WARNING")
+os.environ.setdefault("OLLAMA_WARMUP", "0")
+
+from benchmarks.corpus import PHASE_MESSAGES
+from benchmarks.gen_db import generate
+from benchmarks.stats import summarize
+
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmarks", "baselines", "micro.json")
+
+
+# ============================================
+# HARNESS
+# ============================================
+
+def measure(fn, warmup=3, repeat=15, min_time=0.05):
+    """
+    Time fn() and return per-call durations (seconds), one per repeat.
+    Each repeat runs fn enough times to last at least min_time so that
+    sub-microsecond calls are still measurable.
+    """
+    for _ in range(warmup):
+        fn()
+
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1_000_000:
+            break
+        number *= 2
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number)
+    return samples
+
+
+# ============================================
+# SYNTHETIC DATA
+# ============================================
+
+def build_database(path, size, seed):
+    """Create a database with one project holding `size` exchanges."""
+    generate(path, projects=1, exchanges=size, requirement_ratio=0.6, ambiguity_ratio=0.1,
+             contradiction_ratio=0.05, seed=seed)
+
+
+def build_tracker(events_count, seed):
+    from rasa_sdk import Tracker
+
+    rng = random.Random(seed)
+    messages = [m for phase in PHASE_MESSAGES.values() for m in phase]
+    events = []
+    for i in range(events_count):
+        if i % 4 == 0:
+            events.append({"event": "user", "text": rng.choice(messages)})
+        elif i % 4 == 1:
+            events.append({"event": "action", "name": "action_intelligent_analysis"})
+        elif i % 4 == 2:
+            events.append({"event": "bot", "text": "Got it. What else can you tell me?"})
+        else:
+            events.append({"event": "action", "name": "action_listen"})
+    return Tracker("bench", {"elicitation_phase": "functional", "project_id": 1.0},
+                   {"text": "hello", "metadata": {}}, events, False, None, {}, "action_listen")
+
+
+LLM_OUTPUTS = {
+    "clean": json.dumps({"reply": "What key features should it have?",
+                         "analysis": {"type": "Requirement", "priority": "high",
+                                      "requirement": "Users can book appointments online",
+                                      "next_phase": "functional"}}),
+    "wrapped": "Sure! Here is my answer:\n```json\n" + json.dumps({
+        "reply": "How many users do you expect?",
+        "analysis": {"type": "Ambiguity", "priority": "medium",
+                     "requirement": "User count unspecified", "next_phase": "functional"}}) + "\n```\nLet me know!",
+    "plain": "I think we should talk about your users first. " * 8,
+}
+
+
+# ============================================
+# CASES
+# ============================================
+
+def cases(sizes, seed, workdir):
+    """Yield (name, size, fn) for every benchmark case."""
+    import actions.actions as actions_module
+    import app as backend_app
+
+    # Measure the functions themselves, not the span writer
+    actions_module.TRACER.enabled = False
+    backend_app.TRACER.enabled = False
+
+    for size in sizes:
+        tracker = build_tracker(size, seed)
+        yield "history", size, lambda t=tracker: actions_module.get_conversation_history(t)
+
+    for kind, text in LLM_OUTPUTS.items():
+        yield f"parse_{kind}", len(text), lambda t=text: actions_module.parse_llm_response(t)
+
+    for size in sizes:
+        path = os.path.join(workdir, f"bench_{size}.db")
+        build_database(path, size, seed)
+
+        actions_module.DB_PATH = path
+        backend_app.DB_PATH = path
+        action = actions_module.ActionIntelligentAnalysis()
+        analysis = {"type": "Requirement", "priority": "high", "requirement": "The system shall send reminders"}
+
+        yield "save_analysis", size, lambda: action.save_analysis_to_db(analysis, 1, "remind patients")
+        yield "save_conversation", size, lambda: backend_app.save_conversation(1, "hello", "hi there", "user_message")
+
+        def view(fn):
+            def call():
+                with backend_app.app.test_request_context():
+                    fn(1)
+            return call
+
+        yield "summary", size, view(backend_app.get_project_summary)
+        yield "export", size, view(backend_app.export_requirements)
+
+
+def run(args):
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, size, fn in cases(args.sizes, args.seed, workdir):
+            if args.only and name not in args.only and name.split("_")[0] not in args.only:
+                continue
+            random.seed(args.seed)
+            samples = measure(fn, warmup=args.warmup, repeat=args.repeat)
+            stats = summarize(samples)
+            results[f"{name}[{size}]"] = stats
+            print(f"{name + '[' + str(size) + ']':<28} p50 {stats['p50'] * 1e6:>12.1f} us"
+                  f"   p95 {stats['p95'] * 1e6:>12.1f} us   stdev {stats['stdev'] * 1e6:>10.1f} us")
+    return results
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    print(f"\n{'case':<28}{'baseline p50':>16}{'now p50':>14}{'change':>10}")
+    for key, stats in results.items():
+        old = baseline.get("results", {}).get(key)
+        if not old:
+            continue
+        change = stats["p50"] / old["p50"] - 1
+        flag = "  REGRESSION" if change > threshold else ""
+        print(f"{key:<28}{old['p50'] * 1e6:>13.1f} us{stats['p50'] * 1e6:>11.1f} us{change * 100:>+9.1f}%{flag}")
+        if flag:
+            regressions.append(key)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks for the hot paths")
+    parser.add_argument("--sizes", default="100,1000,10000",
+                        type=lambda s: [int(x) for x in s.split(",")],
+                        help="tracker events / rows per table")
+    parser.add_argument("--only", default=None, type=lambda s: set(s.split(",")),
+                        help="comma-separated case names (history, parse, save, summary, export...)")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=15)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed median slowdown (0.15 = 15%%)")
+    args = parser.parse_args()
+
+    results = run(args)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump({"timestamp": datetime.now().isoformat(), "results": results}, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
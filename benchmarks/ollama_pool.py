@@ -0,0 +1,123 @@
+# benchmarks/ollama_pool.py
+# Throughput of the action server's Ollama pool over stub servers of different speeds.
+#
+#   python -m benchmarks.ollama_pool --speeds 40,20,10 --sessions 12 --turns 6
+#   python -m benchmarks.ollama_pool --speeds 40,40 --kill-after 5     # one node dies mid-run
+#
+# Starts one in-process Ollama stub per entry in --speeds (generation
+# tokens/s), then runs concurrent sessions through actions.stream_ollama_chat
+# - the same pool, stickiness and failover code the action server uses -
+# first against the first stub alone, then against the whole pool. Each
+# session resends its growing history, so stickiness shows up as prompt
+# tokens served from the stub's prompt cache.
+
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+os.environ.setdefault("OLLAMA_WARMUP", "0")
+
+from common.log import configure_logging
+
+configure_logging(level="WARNING")
+
+from benchmarks.corpus import PHASE_MESSAGES
+from benchmarks.stats import summarize
+from benchmarks.stubs import start_ollama_stub
+from common.pool import EndpointPool
+from common.warmup import ModelWarmer
+
+
+def run_scenario(actions_module, urls, args):
+    actions_module.OLLAMA_POOL = EndpointPool("ollama", urls, cooldown=5.0, health_path="/", health_interval=1.0)
+    actions_module.WARMERS = {url: ModelWarmer(url, actions_module.OLLAMA_MODEL) for url in urls}
+
+    latencies = []
+    served = Counter()
+    prompt_tokens = Counter()
+    errors = Counter()
+    lock = threading.Lock()
+
+    def session(index):
+        history = [{"role": "system", "content": actions_module.SYSTEM_PROMPTS["functional"]}]
+        messages = PHASE_MESSAGES["functional"]
+        for turn in range(args.turns):
+            history.append({"role": "user", "content": messages[(index + turn) % len(messages)]})
+            payload = {"model": actions_module.OLLAMA_MODEL, "messages": list(history), "stream": True}
+            start = time.perf_counter()
+            try:
+                content, stats = actions_module.stream_ollama_chat(payload, lambda: False, sticky_key=f"s{index}")
+            except Exception as e:
+                with lock:
+                    errors[type(e).__name__] += 1
+                continue
+            elapsed = time.perf_counter() - start
+            history.append({"role": "assistant", "content": content})
+            with lock:
+                latencies.append(elapsed)
+                served[stats.get("_endpoint", "?")] += 1
+                prompt_tokens["evaluated"] += stats.get("prompt_eval_count", 0)
+
+    threads = [threading.Thread(target=session, args=(i,), daemon=True) for i in range(args.sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    requests_done = len(latencies)
+    lat = summarize(latencies)
+    print(f"  {requests_done} calls in {wall:.1f}s ({requests_done / wall:.2f} calls/s), "
+          f"p50 {lat.get('p50', 0) * 1000:.0f} ms, p95 {lat.get('p95', 0) * 1000:.0f} ms, "
+          f"prompt tokens evaluated {prompt_tokens['evaluated']}")
+    if errors:
+        print(f"  errors: {dict(errors)}")
+    for state in actions_module.OLLAMA_POOL.snapshot():
+        print(f"  {state['url']:<28} requests {served.get(state['url'], 0):>4}  "
+              f"latency {state['latency_ms']} ms  healthy {state['healthy']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Ollama endpoint pool against stub servers")
+    parser.add_argument("--speeds", default="40,20,10", help="tokens/s of each stub server")
+    parser.add_argument("--sessions", type=int, default=12)
+    parser.add_argument("--turns", type=int, default=6)
+    parser.add_argument("--parallel", type=int, default=1, help="requests each stub processes at once")
+    parser.add_argument("--kill-after", type=float, default=None,
+                        help="shut the first stub down this many seconds into the pool run")
+    args = parser.parse_args()
+
+    import actions.actions as actions_module
+    actions_module.TRACER.enabled = False
+
+    # Record which server answered each call
+    original = actions_module._stream_from
+
+    def stream_from(base_url, payload, should_cancel):
+        content, stats = original(base_url, payload, should_cancel)
+        return content, dict(stats, _endpoint=base_url)
+
+    actions_module._stream_from = stream_from
+
+    servers = [start_ollama_stub(0, tokens_per_sec=float(speed), ttft="fixed:0.05", load_seconds=0,
+                                 parallel=args.parallel, seed=i)
+               for i, speed in enumerate(args.speeds.split(","))]
+    urls = [f"http://127.0.0.1:{s.server_address[1]}" for s in servers]
+
+    print(f"Single server ({args.speeds.split(',')[0]} tok/s):")
+    run_scenario(actions_module, urls[:1], args)
+
+    if args.kill_after is not None:
+        threading.Timer(args.kill_after, servers[0].stop).start()
+    print(f"Pool of {len(urls)} ({args.speeds} tok/s):")
+    run_scenario(actions_module, urls, args)
+
+
+if __name__ == "__main__":
+    main()
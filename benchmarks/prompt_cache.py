@@ -0,0 +1,139 @@
+# benchmarks/prompt_cache.py
+# Prompt-evaluation cost per turn over one long elicitation session.
+#
+#   python -m benchmarks.prompt_cache --turns 60                 # against an in-process Ollama stub
+#   python -m benchmarks.prompt_cache --ollama-url http://localhost:11434 --turns 40
+#
+# Drives ActionIntelligentAnalysis directly with a growing tracker, the way
+# Rasa would, once per history strategy:
+#
+#   sliding   window moves one message per turn, assistant turns replayed as
+#             reply text only (the behaviour before prefix-stable history)
+#   anchored  window moves HISTORY_BLOCK messages at a time and assistant
+#             turns are replayed as the raw model output (current default)
+#
+# and reports Ollama's prompt_eval_count / prompt_eval_duration per turn,
+# taken from the llm_calls ledger. With a real Ollama, run it with the
+# model already loaded so the first turn's load time doesn't skew results.
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+os.environ.setdefault("OLLAMA_WARMUP", "0")
+
+from common.log import configure_logging
+
+configure_logging(level="WARNING")
+
+import sqlite3
+
+from benchmarks.corpus import PHASE_MESSAGES, FOLLOW_UPS
+from benchmarks.stats import summarize
+from benchmarks.stubs import start_ollama_stub
+from common.pool import EndpointPool
+from common.warmup import ModelWarmer
+from database.setup import init_database
+
+STRATEGIES = {
+    "sliding": {"block": 1, "raw": False},
+    "anchored": {"block": None, "raw": True},
+}
+
+
+def run_session(actions_module, project_id, turns, block, raw):
+    """Play `turns` user messages through the action; each Ollama call lands in llm_calls."""
+    from rasa_sdk import Tracker
+    from rasa_sdk.executor import CollectingDispatcher
+
+    action = actions_module.ActionIntelligentAnalysis()
+    slots = {"elicitation_phase": "vision", "project_id": float(project_id)}
+    events = []
+    counters = {}
+    actions_module.HISTORY_BLOCK = block
+
+    for turn in range(turns):
+        phase = slots["elicitation_phase"]
+        if phase == "done":
+            slots["elicitation_phase"] = phase = "constraints"
+        pool = PHASE_MESSAGES.get(phase, PHASE_MESSAGES["vision"])
+        index = counters.get(phase, 0)
+        counters[phase] = index + 1
+        message = FOLLOW_UPS[turn % len(FOLLOW_UPS)] if turn % 5 == 4 else pool[index % len(pool)]
+
+        latest = {"text": message, "intent": {"name": "user_message", "confidence": 1.0}, "entities": [], "metadata": {}}
+        events.append({"event": "user", "text": message, "parse_data": latest, "metadata": {}})
+        tracker = Tracker(f"prompt-cache-{project_id}", dict(slots), latest, list(events),
+                          False, None, {}, "action_listen")
+
+        for event in asyncio.run(action.run(CollectingDispatcher(), tracker, {})):
+            if event.get("event") == "slot":
+                slots[event["name"]] = event["value"]
+            elif event.get("event") == "bot" and not raw:
+                event = dict(event, metadata={k: v for k, v in (event.get("metadata") or {}).items() if k != "llm_raw"})
+            events.append(event)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompt-eval cost per turn: sliding vs prefix-anchored history")
+    parser.add_argument("--turns", type=int, default=60)
+    parser.add_argument("--ollama-url", default=None, help="real Ollama base URL (default: in-process stub)")
+    parser.add_argument("--stub-prompt-tokens-per-sec", type=float, default=250.0)
+    parser.add_argument("--strategies", default="sliding,anchored")
+    parser.add_argument("--per-turn", action="store_true", help="print prompt tokens evaluated for every turn")
+    args = parser.parse_args()
+
+    import actions.actions as actions_module
+    default_block = actions_module.HISTORY_BLOCK
+
+    if args.ollama_url:
+        base_url = args.ollama_url.rstrip("/")
+    else:
+        server = start_ollama_stub(0, ttft="fixed:0.01", tokens_per_sec=5000,
+                                   prompt_tokens_per_sec=args.stub_prompt_tokens_per_sec, load_seconds=0, seed=1)
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    actions_module.OLLAMA_POOL = EndpointPool("ollama", [base_url])
+    actions_module.WARMERS = {base_url: ModelWarmer(base_url, actions_module.OLLAMA_MODEL)}
+    actions_module.TRACER.enabled = False
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, "prompt_cache.db")
+        init_database(db_path)
+        actions_module.DB_PATH = db_path
+
+        results = {}
+        for project_id, name in enumerate(args.strategies.split(","), start=1):
+            conn = sqlite3.connect(db_path)
+            conn.execute("INSERT INTO projects (id, project_name) VALUES (?, ?)", (project_id, name))
+            conn.commit()
+            conn.close()
+
+            strategy = STRATEGIES[name]
+            run_session(actions_module, project_id, args.turns,
+                        strategy["block"] or default_block, strategy["raw"])
+
+            conn = sqlite3.connect(db_path)
+            rows = conn.execute('''
+                SELECT prompt_eval_count, prompt_eval_duration FROM llm_calls
+                WHERE project_id = ? ORDER BY id
+            ''', (project_id,)).fetchall()
+            conn.close()
+            results[name] = rows
+
+    print(f"{'strategy':<10}{'turns':>7}{'tokens/turn p50':>18}{'p95':>8}{'eval ms/turn p50':>19}{'p95':>9}{'total eval s':>14}")
+    for name, rows in results.items():
+        tokens = summarize([r[0] or 0 for r in rows])
+        millis = summarize([(r[1] or 0) / 1e6 for r in rows])
+        total = sum((r[1] or 0) for r in rows) / 1e9
+        print(f"{name:<10}{len(rows):>7}{tokens['p50']:>18.0f}{tokens['p95']:>8.0f}"
+              f"{millis['p50']:>19.1f}{millis['p95']:>9.1f}{total:>14.2f}")
+        if args.per_turn:
+            print("  " + " ".join(str(r[0]) for r in rows))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# benchmarks/quantities.py
+# Extraction speed and query cost of the typed requirement values
+# (common/quantities.py).
+#
+#   python -m benchmarks.quantities --projects 100 --exchanges 2000
+#
+# Generates a database with benchmarks/gen_db.py, backfills
+# requirement_values from every stored requirement, then answers the same
+# question two ways for each project - what is its budget, and which
+# requirements set a concurrent-user target above 500:
+#
+#   text scan   LIKE over requirements.content, then extract() on each hit,
+#               what a query has to do when the figures live only in text
+#   values      an indexed lookup on requirement_values
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from common.log import configure_logging
+
+configure_logging(level="WARNING")
+
+from benchmarks.corpus import PHASE_MESSAGES
+from benchmarks.gen_db import generate
+from benchmarks.stats import summarize
+from common.quantities import backfill, extract
+
+
+def text_scan(conn, project_id):
+    budget = [v for (content,) in conn.execute(
+        "SELECT content FROM requirements WHERE project_id = ? AND content LIKE '%budget%'", (project_id,))
+        for v in extract(content) if v["subject"] == "budget"]
+    users = [v for (content,) in conn.execute(
+        "SELECT content FROM requirements WHERE project_id = ? AND content LIKE '%users%'", (project_id,))
+        for v in extract(content) if v["subject"] == "concurrent_users" and v["value"] > 500]
+    return len(budget), len(users)
+
+
+def values_lookup(conn, project_id):
+    budget = conn.execute("SELECT value, unit FROM requirement_values WHERE project_id = ? AND subject = 'budget'",
+                          (project_id,)).fetchall()
+    users = conn.execute("SELECT requirement_id FROM requirement_values "
+                         "WHERE project_id = ? AND subject = 'concurrent_users' AND value > 500",
+                         (project_id,)).fetchall()
+    return len(budget), len(users)
+
+
+def time_queries(name, fn, conn, projects):
+    samples = []
+    for project_id in range(1, projects + 1):
+        start = time.perf_counter()
+        result = fn(conn, project_id)
+        samples.append(time.perf_counter() - start)
+    stats = summarize(samples)
+    print(f"{name:<12}{stats['p50'] * 1000:>10.3f}{stats['p95'] * 1000:>10.3f}   {result}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark typed requirement values against text scans")
+    parser.add_argument("--projects", type=int, default=100)
+    parser.add_argument("--exchanges", type=int, default=2000, help="conversation rows per project")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    messages = [m for phase in PHASE_MESSAGES.values() for m in phase]
+    found = sum(1 for m in messages if extract(m))
+    start = time.perf_counter()
+    rounds = 2000
+    for _ in range(rounds):
+        for message in messages:
+            extract(message)
+    rate = rounds * len(messages) / (time.perf_counter() - start)
+    print(f"corpus: values found in {found}/{len(messages)} messages, extract() {rate:,.0f} msg/s")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "values.db")
+        counts = generate(path, projects=args.projects, exchanges=args.exchanges, seed=args.seed)
+        filled = backfill(path)
+        print(f"backfill: {filled['requirements']} requirements, {filled['values']} values "
+              f"in {filled['seconds']} s ({filled['requirements'] / filled['seconds']:,.0f} req/s)")
+
+        conn = sqlite3.connect(path)
+        print(f"\n{counts['requirements']} requirements in {args.projects} projects")
+        print(f"{'query':<12}{'p50 ms':>10}{'p95 ms':>10}   result (last project)")
+        time_queries("text scan", text_scan, conn, args.projects)
+        time_queries("values", values_lookup, conn, args.projects)
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# benchmarks/rasa_pool.py
+# Chat throughput of the backend's Rasa client against one or several Rasa stubs.
+#
+#   python -m benchmarks.rasa_pool --nodes 3 --senders 30 --messages 20
+#   python -m benchmarks.rasa_pool --nodes 3 --kill-after 2      # one node dies mid-run
+#
+# Starts --nodes Rasa stubs that each process one message at a time
+# (--parallel 1, like a single Rasa process) and sends every sender's
+# messages through backend/app.py's post_to_rasa - the same session,
+# consistent hashing and failover the backend uses - in three scenarios:
+#
+#   no-keepalive  one node, a new connection per message (the old requests.post)
+#   one node      one node through the pooled session
+#   pool          all nodes, senders consistently hashed
+#
+# "moved" counts senders whose messages reached more than one node; it
+# stays 0 unless a node fails.
+
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "backend"))
+
+from common.log import configure_logging
+
+configure_logging(level="WARNING")
+
+import requests
+
+from benchmarks.corpus import PHASE_MESSAGES
+from benchmarks.stats import summarize
+from benchmarks.stubs import start_rasa_stub
+from common.pool import EndpointPool
+
+
+def run_scenario(backend, name, urls, args, keep_alive=True):
+    backend.RASA_POOL = EndpointPool("rasa", urls, strategy="hash", cooldown=5.0,
+                                     health_path="/", health_interval=1.0)
+    original_http = backend.RASA_HTTP
+    if not keep_alive:
+        backend.RASA_HTTP = requests  # module-level post: one connection per call
+
+    latencies = []
+    errors = Counter()
+    nodes_by_sender = defaultdict(set)
+    lock = threading.Lock()
+    messages = PHASE_MESSAGES["functional"]
+
+    def sender(index):
+        sender_id = f"rasa-pool-{index}"
+        for turn in range(args.messages):
+            payload = {"sender": sender_id, "message": messages[(index + turn) % len(messages)]}
+            start = time.perf_counter()
+            try:
+                response = backend.post_to_rasa(payload, sender_id)
+            except requests.RequestException as e:
+                with lock:
+                    errors[type(e).__name__] += 1
+                continue
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                nodes_by_sender[sender_id].add(urlsplit(response.url).netloc)
+
+    threads = [threading.Thread(target=sender, args=(i,), daemon=True) for i in range(args.senders)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    backend.RASA_HTTP = original_http
+
+    lat = summarize(latencies)
+    moved = sum(1 for nodes in nodes_by_sender.values() if len(nodes) > 1)
+    per_node = Counter(node for nodes in nodes_by_sender.values() for node in nodes)
+    print(f"{name:<14}{len(urls):>6}{len(latencies) / wall:>10.1f}{lat.get('p50', 0) * 1000:>9.1f}"
+          f"{lat.get('p95', 0) * 1000:>9.1f}{moved:>7}  {dict(errors) or ''}")
+    if len(urls) > 1:
+        print(" " * 14 + "senders per node: " + ", ".join(f"{node} {count}" for node, count in sorted(per_node.items())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the backend's Rasa pool against stub servers")
+    parser.add_argument("--nodes", type=int, default=3)
+    parser.add_argument("--senders", type=int, default=30)
+    parser.add_argument("--messages", type=int, default=20, help="messages per sender")
+    parser.add_argument("--latency", default="fixed:0.02", help="per-message processing time of each stub")
+    parser.add_argument("--parallel", type=int, default=1, help="messages each stub processes at once")
+    parser.add_argument("--kill-after", type=float, default=None,
+                        help="stop the first node this many seconds into the pool run")
+    args = parser.parse_args()
+
+    import app as backend
+
+    servers = [start_rasa_stub(0, latency=args.latency, parallel=args.parallel, seed=i) for i in range(args.nodes)]
+    urls = [f"http://127.0.0.1:{s.server_address[1]}" for s in servers]
+
+    print(f"{'scenario':<14}{'nodes':>6}{'msg/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'moved':>7}")
+    run_scenario(backend, "no-keepalive", urls[:1], args, keep_alive=False)
+    run_scenario(backend, "one node", urls[:1], args)
+    if args.kill_after is not None:
+        threading.Timer(args.kill_after, servers[0].stop).start()
+    run_scenario(backend, "pool", urls, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+# benchmarks/replay.py
+# Replay captured /api/chat traffic (common/capture.py) against a stack.
+#
+#   # What is in a capture?
+#   python -m benchmarks.replay inspect /var/tmp/reqbot-capture/backend-20261018.ndjson
+#
+#   # Re-drive it at 10x speed against staging
+#   python -m benchmarks.replay run /var/tmp/reqbot-capture --speed 10 --base-url http://staging:5000
+#
+# Each recorded sender becomes one replay session. Messages are sent at
+# their recorded offset from the first message divided by --speed, so
+# inter-arrival gaps across and within sessions are preserved; a session
+# never sends its next message before the previous reply has arrived, so
+# per-session ordering holds even when the target is slower than the
+# recording. Recorded projects are recreated on the target, and sender ids
+# get a per-run suffix so replays do not continue old Rasa conversations.
+
+import argparse
+import json
+import statistics
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+import requests
+
+from benchmarks.loadtest import Recorder, timed_request, build_report, print_report
+from benchmarks.stats import summarize
+from common.capture import read_capture
+
+
+def load_sessions(paths, limit_sessions=None, max_duration=None):
+    """Group captured chat requests by sender, in arrival order."""
+    chats = sorted(read_capture(paths, kind="chat"), key=lambda e: e["ts"])
+    chats = [e for e in chats if isinstance(e.get("request"), dict) and e["request"].get("message")]
+    if not chats:
+        return 0.0, {}
+    start = chats[0]["ts"]
+    if max_duration is not None:
+        chats = [e for e in chats if e["ts"] - start <= max_duration]
+
+    sessions = defaultdict(list)
+    for entry in chats:
+        sessions[entry["request"].get("sender_id", "user_1")].append(entry)
+    if limit_sessions:
+        sessions = dict(list(sessions.items())[:limit_sessions])
+    return start, sessions
+
+
+class ProjectMap:
+    """Creates one target project per recorded project id, on first use."""
+
+    def __init__(self, base, timeout, run_id, reuse):
+        self.base = base
+        self.timeout = timeout
+        self.run_id = run_id
+        self.reuse = reuse
+        self._ids = {}
+        self._lock = threading.Lock()
+
+    def get(self, session, recorded_id):
+        if self.reuse:
+            return recorded_id
+        with self._lock:
+            if recorded_id not in self._ids:
+                response = session.post(f"{self.base}/api/projects", timeout=self.timeout, json={
+                    "project_name": f"Replay {self.run_id} of project {recorded_id}",
+                    "description": "replayed traffic"})
+                self._ids[recorded_id] = response.json().get("project_id", recorded_id)
+            return self._ids[recorded_id]
+
+
+def replay_session(sender_id, entries, args, t0, wall_start, recorder, projects, lags, run_id):
+    session = requests.Session()
+    base = args.base_url.rstrip("/")
+    target_sender = sender_id if args.keep_sender_ids else f"{sender_id}-replay-{run_id}"
+
+    for entry in entries:
+        due = wall_start + (entry["ts"] - t0) / args.speed
+        delay = due - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        lags.append(max(0.0, time.monotonic() - due))
+
+        data = dict(entry["request"])
+        data["sender_id"] = target_sender
+        data["project_id"] = projects.get(session, data.get("project_id", 1))
+        timed_request(recorder, session, "chat", "POST", f"{base}/api/chat", args.timeout, json=data)
+
+
+def run(args):
+    t0, sessions = load_sessions(args.paths, args.limit_sessions, args.max_duration)
+    if not sessions:
+        print("No chat records found")
+        return
+
+    run_id = uuid.uuid4().hex[:6]
+    recorder = Recorder()
+    projects = ProjectMap(args.base_url.rstrip("/"), args.timeout, run_id, args.reuse_projects)
+    lags = []
+    messages = sum(len(e) for e in sessions.values())
+    span = max(e[-1]["ts"] for e in sessions.values()) - t0
+    print(f"Replaying {messages} messages from {len(sessions)} sessions "
+          f"({span:.0f}s recorded, ~{span / args.speed:.0f}s at {args.speed:g}x)")
+
+    wall_start = time.monotonic()
+    threads = [
+        threading.Thread(target=replay_session, daemon=True,
+                         args=(sender, entries, args, t0, wall_start, recorder, projects, lags, run_id))
+        for sender, entries in sessions.items()
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_seconds = time.perf_counter() - start
+
+    report = build_report(recorder, wall_seconds, args)
+    recorded = [e["duration_ms"] / 1000 for entries in sessions.values() for e in entries if "duration_ms" in e]
+    report["recorded_latency_seconds"] = summarize(recorded) if recorded else None
+    report["schedule_lag_seconds"] = summarize(lags) if lags else None
+    report["sessions"] = len(sessions)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if recorded:
+        rec = report["recorded_latency_seconds"]
+        print(f"Recorded chat latency: p50 {rec['p50'] * 1000:.1f} ms, p95 {rec['p95'] * 1000:.1f} ms")
+    if lags:
+        lag = report["schedule_lag_seconds"]
+        print(f"Schedule lag (sent later than recorded gap): p50 {lag['p50'] * 1000:.1f} ms, "
+              f"p95 {lag['p95'] * 1000:.1f} ms, max {lag['max'] * 1000:.1f} ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.output}")
+
+
+def inspect(args):
+    """Summarize a capture: sessions, arrival rate and prompt sizes sent to Ollama."""
+    t0, sessions = load_sessions(args.paths)
+    chats = [e for entries in sessions.values() for e in entries]
+    if not chats:
+        print("No chat records found")
+        return
+    span = max(e["ts"] for e in chats) - t0
+    per_session = [len(e) for e in sessions.values()]
+    print(f"Chat requests: {len(chats)} from {len(sessions)} sessions over {span / 60:.1f} min "
+          f"({len(chats) / span if span else 0:.2f} req/s)")
+    print(f"Messages per session: median {statistics.median(per_session):g}, max {max(per_session)}")
+    latency = summarize([e["duration_ms"] / 1000 for e in chats if "duration_ms" in e])
+    print(f"Recorded latency: p50 {latency['p50'] * 1000:.1f} ms, p95 {latency['p95'] * 1000:.1f} ms")
+
+    calls = list(read_capture(args.paths, kind="ollama"))
+    if calls:
+        prompt_chars = [sum(len(m.get("content", "")) for m in c["payload"].get("messages", [])) for c in calls]
+        prompt_tokens = [c["stats"]["prompt_eval_count"] for c in calls if c.get("stats", {}).get("prompt_eval_count")]
+        print(f"Ollama calls: {len(calls)}, prompt chars median {statistics.median(prompt_chars):g} "
+              f"max {max(prompt_chars)}")
+        if prompt_tokens:
+            print(f"Prompt tokens: median {statistics.median(prompt_tokens):g}, max {max(prompt_tokens)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or replay captured /api/chat traffic")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    inspect_parser = sub.add_parser("inspect", help="summarize capture files")
+    inspect_parser.add_argument("paths", nargs="+", help="capture files, globs or directories")
+
+    run_parser = sub.add_parser("run", help="re-drive captured traffic against a backend")
+    run_parser.add_argument("paths", nargs="+", help="capture files, globs or directories")
+    run_parser.add_argument("--base-url", default="http://localhost:5000")
+    run_parser.add_argument("--speed", type=float, default=1.0, help="time compression (10 = ten times faster)")
+    run_parser.add_argument("--limit-sessions", type=int, default=None)
+    run_parser.add_argument("--max-duration", type=float, default=None,
+                            help="only replay the first N recorded seconds")
+    run_parser.add_argument("--reuse-projects", action="store_true",
+                            help="send recorded project ids as-is instead of creating projects")
+    run_parser.add_argument("--keep-sender-ids", action="store_true",
+                            help="do not suffix sender ids with the run id")
+    run_parser.add_argument("--timeout", type=float, default=180.0)
+    run_parser.add_argument("--output", default=None, help="write the JSON report here")
+    run_parser.add_argument("--compare", default=None, help="earlier JSON report to compare against")
+
+    args = parser.parse_args()
+    if args.command == "inspect":
+        inspect(args)
+    else:
+        run(args)
+
+
+if __name__ == "__main__":
+    main()
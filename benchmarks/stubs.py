@@ -0,0 +1,588 @@
+# benchmarks/stubs.py
+# Stand-in Rasa and Ollama servers for benchmarking and fault testing
+# without a trained Rasa model or a local LLM.
+#
+#   python -m benchmarks.stubs ollama --port 11434 --ttft lognormal:0.4:0.5 --tokens-per-sec 35
+#   python -m benchmarks.stubs rasa --port 5005 --action-url http://localhost:5055/webhook
+#
+# The Ollama stub implements /api/chat (streaming and non-streaming),
+# /api/generate, /api/embed, /api/tags and /api/ps. Replies are canned JSON analysis
+# payloads for the phase named in the system prompt, emitted token by token
+# at the configured rate, with Ollama-style duration fields in the final chunk.
+# Like Ollama, it keeps the last sequence of each of --cache-slots slots and
+# only charges prompt evaluation for the part of a new prompt that does not
+# share a prefix with one of them (prompt_eval_count excludes cached tokens).
+#
+# The Rasa stub implements the REST channel webhook. By default it answers
+# with a canned reply after a configurable delay. With --action-url it keeps
+# a minimal tracker per sender and calls the real action server with
+# action_intelligent_analysis, so actions/actions.py runs end to end against
+# the Ollama stub.
+#
+# /api/embed answers with common/embeddings.py's hashing vectors, so the
+# "ollama" embedder can be exercised without an embedding model.
+#
+# Both stubs can inject errors (HTTP 500) and hangs (the request never
+# answers until the client gives up).
+
+import argparse
+import contextlib
+import itertools
+import json
+import math
+import random
+import re
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+# ============================================
+# LATENCY DISTRIBUTIONS
+# ============================================
+
+class Distribution:
+    """
+    Latency in seconds, parsed from "fixed:0.2", "uniform:0.1:0.5",
+    "normal:mean:stddev" or "lognormal:median:sigma".
+    """
+
+    def __init__(self, spec, rng=None):
+        self.spec = spec
+        self.rng = rng or random.Random()
+        kind, *params = spec.split(":")
+        self.kind = kind
+        self.params = [float(p) for p in params]
+        expected = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+        if expected.get(kind) != len(self.params):
+            raise ValueError(f"Bad latency spec {spec!r}")
+
+    def sample(self):
+        if self.kind == "fixed":
+            return self.params[0]
+        if self.kind == "uniform":
+            return self.rng.uniform(*self.params)
+        if self.kind == "normal":
+            return max(0.0, self.rng.gauss(*self.params))
+        median, sigma = self.params
+        return self.rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+
+
+class FaultInjector:
+    def __init__(self, error_rate=0.0, hang_rate=0.0, hang_seconds=600.0, rng=None):
+        self.error_rate = error_rate
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self.rng = rng or random.Random()
+
+    def pick(self):
+        """Return "error", "hang" or None for the next request."""
+        roll = self.rng.random()
+        if roll < self.error_rate:
+            return "error"
+        if roll < self.error_rate + self.hang_rate:
+            return "hang"
+        return None
+
+
+class _StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address, handler):
+        super().__init__(address, handler)
+        self._connections = set()
+        self._connections_lock = threading.Lock()
+
+    def process_request_thread(self, request, client_address):
+        with self._connections_lock:
+            self._connections.add(request)
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            with self._connections_lock:
+                self._connections.discard(request)
+
+    def stop(self):
+        """Go away like a killed process: stop listening and drop open keep-alive connections."""
+        self.shutdown()
+        self.server_close()
+        with self._connections_lock:
+            for connection in list(self._connections):
+                try:
+                    connection.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def send_json(self, body, status=200):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def inject_fault(self):
+        """Apply error/hang injection; returns True if the request was consumed."""
+        fault = self.server.faults.pick()
+        if fault == "error":
+            self.send_json({"error": "injected failure"}, status=500)
+            return True
+        if fault == "hang":
+            time.sleep(self.server.faults.hang_seconds)
+            self.close_connection = True
+            return True
+        return False
+
+    def handle(self):
+        try:
+            super().handle()
+        except (ConnectionResetError, BrokenPipeError):
+            # Client went away between keep-alive requests
+            pass
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+# ============================================
+# OLLAMA STUB
+# ============================================
+
+CANNED_ANALYSES = {
+    "vision": [
+        {"reply": "Thanks! Who are the main users of this system and what problem does it solve for them?",
+         "analysis": {"type": "General", "priority": "medium", "requirement": "Project vision captured", "next_phase": "vision"}},
+        {"reply": "Great, I understand the vision. Let's talk about the key features next.",
+         "analysis": {"type": "Requirement", "priority": "high", "requirement": "The system shall support online appointment booking for patients", "next_phase": "functional"}},
+    ],
+    "functional": [
+        {"reply": "Got it. What should happen after a user completes that task?",
+         "analysis": {"type": "Requirement", "priority": "high", "requirement": "Users shall be able to reset their password via email", "next_phase": "functional"}},
+        {"reply": "You mentioned many users - how many exactly do you expect?",
+         "analysis": {"type": "Ambiguity", "priority": "medium", "requirement": "Number of users is not specified", "next_phase": "functional"}},
+        {"reply": "Understood. Any other features, or shall we move on to quality attributes?",
+         "analysis": {"type": "Requirement", "priority": "medium", "requirement": "Admins shall be able to export reports as PDF", "next_phase": "non_functional"}},
+    ],
+    "non_functional": [
+        {"reply": "Noted. How quickly should pages load under peak load?",
+         "analysis": {"type": "Requirement", "priority": "high", "requirement": "The system shall support 1000 concurrent users", "next_phase": "non_functional"}},
+        {"reply": "Earlier you said 100 users, now 10000. Which one is right?",
+         "analysis": {"type": "Contradiction", "priority": "high", "requirement": "Conflicting expected user counts", "next_phase": "non_functional"}},
+        {"reply": "Thanks. Let's cover the project constraints next.",
+         "analysis": {"type": "Requirement", "priority": "medium", "requirement": "The system shall have 99.9% uptime", "next_phase": "constraints"}},
+    ],
+    "constraints": [
+        {"reply": "What is the deadline for the first release?",
+         "analysis": {"type": "Constraint", "priority": "high", "requirement": "Budget is limited to $50,000", "next_phase": "constraints"}},
+        {"reply": "I think I have everything I need. You can export the SRS now.",
+         "analysis": {"type": "Constraint", "priority": "high", "requirement": "The project must be delivered by March 2025", "next_phase": "done"}},
+    ],
+}
+
+# Checked in order: "NON-FUNCTIONAL ..." must come before the "FUNCTIONAL ..." it contains
+PHASE_MARKERS = {
+    "VISION phase": "vision",
+    "NON-FUNCTIONAL REQUIREMENTS phase": "non_functional",
+    "FUNCTIONAL REQUIREMENTS phase": "functional",
+    "CONSTRAINTS phase": "constraints",
+}
+
+
+def _phase_of(messages):
+    system = next((m.get("content", "") for m in messages if m.get("role") == "system"), "")
+    for marker, phase in PHASE_MARKERS.items():
+        if marker in system:
+            return phase
+    return "vision"
+
+
+def _count_tokens(text):
+    # Roughly what a BPE tokenizer produces for English prose
+    return max(1, len(text) // 4)
+
+
+def _tokenize(text):
+    return re.findall(r"\S+\s*|\s+", text)
+
+
+def _render_chat(messages):
+    # Stand-in for the model's chat template; only prefix equality matters
+    return "".join(f"<|{m.get('role')}|>\n{m.get('content', '')}<|end|>\n" for m in messages)
+
+
+def _common_prefix_length(a, b):
+    limit = min(len(a), len(b))
+    if a[:limit] == b[:limit]:
+        return limit
+    low, high = 0, limit
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[:mid] == b[:mid]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def _embed(texts):
+    # Imported here so the stubs only need numpy when embeddings are asked for
+    from common.embeddings import get_embedder
+    return get_embedder("hashing").embed(texts).tolist()
+
+
+class OllamaStubServer(_StubServer):
+
+    def __init__(self, address, ttft="lognormal:0.3:0.4", tokens_per_sec=40.0,
+                 prompt_tokens_per_sec=800.0, load_seconds=2.0, model="phi3:mini",
+                 cache_slots=4, parallel=4, error_rate=0.0, hang_rate=0.0, hang_seconds=600.0, seed=None, verbose=False):
+        super().__init__(address, OllamaStubHandler)
+        rng = random.Random(seed)
+        self.ttft = Distribution(ttft, rng)
+        self.tokens_per_sec = tokens_per_sec
+        self.prompt_tokens_per_sec = prompt_tokens_per_sec
+        self.load_seconds = load_seconds
+        self.model = model
+        self.faults = FaultInjector(error_rate, hang_rate, hang_seconds, rng)
+        self.verbose = verbose
+        self.loaded_until = 0.0
+        self.cache_slots = cache_slots
+        self.request_slots = threading.BoundedSemaphore(parallel) if parallel else contextlib.nullcontext()
+        self._slots = []  # most recently used last
+        self._lock = threading.Lock()
+        self._cycles = {phase: itertools.cycle(payloads) for phase, payloads in CANNED_ANALYSES.items()}
+
+    def next_reply(self, phase):
+        with self._lock:
+            return json.dumps(next(self._cycles.get(phase, self._cycles["vision"])))
+
+    def cached_prefix(self, prompt):
+        """Characters of `prompt` already evaluated in the best-matching slot; claims that slot."""
+        if not self.cache_slots:
+            return 0
+        with self._lock:
+            best, best_length = None, 0
+            for slot in self._slots:
+                length = _common_prefix_length(slot, prompt)
+                if length > best_length:
+                    best, best_length = slot, length
+            if best is not None:
+                self._slots.remove(best)
+            elif len(self._slots) >= self.cache_slots:
+                self._slots.pop(0)
+            return best_length
+
+    def store_sequence(self, sequence):
+        if self.cache_slots:
+            with self._lock:
+                self._slots.append(sequence)
+                del self._slots[:-self.cache_slots]
+
+    def load_model(self, keep_alive=300):
+        """Simulate model residency: returns the load time paid by this request."""
+        with self._lock:
+            now = time.time()
+            cold = now >= self.loaded_until
+            self.loaded_until = now + keep_alive if keep_alive >= 0 else math.inf
+        if cold and self.load_seconds:
+            time.sleep(self.load_seconds)
+            return self.load_seconds
+        return 0.0
+
+
+def _keep_alive_seconds(value):
+    if value is None:
+        return 300
+    if isinstance(value, (int, float)):
+        return value
+    match = re.fullmatch(r"(-?\d+)([smh]?)", str(value))
+    if not match:
+        return 300
+    return int(match.group(1)) * {"": 1, "s": 1, "m": 60, "h": 3600}[match.group(2)]
+
+
+class OllamaStubHandler(_StubHandler):
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/api/tags":
+            self.send_json({"models": [{"name": self.server.model, "model": self.server.model}]})
+        elif path == "/api/ps":
+            resident = time.time() < self.server.loaded_until
+            self.send_json({"models": [{"name": self.server.model, "model": self.server.model}] if resident else []})
+        elif path == "/":
+            self.send_json({"status": "Ollama is running"})
+        else:
+            self.send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        path = self.path.split("?")[0]
+        if path not in ("/api/chat", "/api/generate", "/api/embed"):
+            self.send_json({"error": "not found"}, status=404)
+            return
+        body = self.read_json()
+        if self.inject_fault():
+            return
+        if path == "/api/embed":
+            texts = body.get("input", [])
+            texts = [texts] if isinstance(texts, str) else texts
+            self.send_json({"model": body.get("model", self.server.model),
+                            "embeddings": _embed(texts)})
+            return
+        # Like OLLAMA_NUM_PARALLEL: extra requests queue for a free slot
+        with self.server.request_slots:
+            self._respond(path, body)
+
+    def _respond(self, path, body):
+        start = time.perf_counter()
+        load = self.server.load_model(_keep_alive_seconds(body.get("keep_alive")))
+
+        sequence = None
+        if path == "/api/chat":
+            messages = body.get("messages", [])
+            reply = self.server.next_reply(_phase_of(messages))
+            prompt = _render_chat(messages)
+            cached = self.server.cached_prefix(prompt) if load == 0 else 0
+            prompt_tokens = _count_tokens(prompt[cached:]) if cached < len(prompt) else 0
+            sequence = prompt + _render_chat([{"role": "assistant", "content": reply}])
+        else:
+            prompt_tokens = _count_tokens(body.get("prompt", "")) if body.get("prompt") else 0
+            reply = "OK" if body.get("prompt") else ""
+
+        prompt_eval = self.server.ttft.sample() + prompt_tokens / self.server.prompt_tokens_per_sec
+        time.sleep(prompt_eval)
+
+        tokens = _tokenize(reply)
+        stream = body.get("stream", True)
+        stats = {
+            "model": body.get("model", self.server.model),
+            "done": True,
+            "load_duration": int(load * 1e9),
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(prompt_eval * 1e9),
+            "eval_count": len(tokens),
+        }
+
+        if stream:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            eval_start = time.perf_counter()
+            try:
+                for token in tokens:
+                    time.sleep(1.0 / self.server.tokens_per_sec)
+                    self._write_chunk(self._chunk(path, token, body))
+                if sequence:
+                    self.server.store_sequence(sequence)
+                stats["eval_duration"] = int((time.perf_counter() - eval_start) * 1e9)
+                stats["total_duration"] = int((time.perf_counter() - start) * 1e9)
+                self._write_chunk(dict(self._chunk(path, "", body), **stats))
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                # Client closed the stream - exactly what cancellation does
+                self.close_connection = True
+            return
+
+        time.sleep(len(tokens) / self.server.tokens_per_sec)
+        if sequence:
+            self.server.store_sequence(sequence)
+        stats["eval_duration"] = int(len(tokens) / self.server.tokens_per_sec * 1e9)
+        stats["total_duration"] = int((time.perf_counter() - start) * 1e9)
+        self.send_json(dict(self._chunk(path, reply, body), **stats))
+
+    def _chunk(self, path, content, body):
+        chunk = {"model": body.get("model", self.server.model), "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ"), "done": False}
+        if path == "/api/chat":
+            chunk["message"] = {"role": "assistant", "content": content}
+        else:
+            chunk["response"] = content
+        return chunk
+
+    def _write_chunk(self, chunk):
+        line = (json.dumps(chunk) + "\n").encode("utf-8")
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+        self.wfile.flush()
+
+
+# ============================================
+# RASA STUB
+# ============================================
+
+class RasaStubServer(_StubServer):
+
+    def __init__(self, address, latency="lognormal:0.02:0.3", action_url=None,
+                 reply="Got it. What else can you tell me?", parallel=0, error_rate=0.0, hang_rate=0.0,
+                 hang_seconds=600.0, seed=None, verbose=False):
+        super().__init__(address, RasaStubHandler)
+        rng = random.Random(seed)
+        self.latency = Distribution(latency, rng)
+        self.action_url = action_url
+        self.reply = reply
+        self.request_slots = threading.BoundedSemaphore(parallel) if parallel else contextlib.nullcontext()
+        self.faults = FaultInjector(error_rate, hang_rate, hang_seconds, rng)
+        self.verbose = verbose
+        self.trackers = {}
+        self._trackers_lock = threading.Lock()
+        self.http = requests.Session()
+
+    def tracker_for(self, sender_id):
+        with self._trackers_lock:
+            if sender_id not in self.trackers:
+                self.trackers[sender_id] = {
+                    "lock": threading.Lock(),
+                    "slots": {"project_id": 1.0, "elicitation_phase": "vision"},
+                    "events": [],
+                }
+            return self.trackers[sender_id]
+
+
+class RasaStubHandler(_StubHandler):
+
+    def do_GET(self):
+        if self.path.split("?")[0] == "/":
+            body = b"Hello from Rasa: 3.5.10"
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self.send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        if self.path.split("?")[0] != "/webhooks/rest/webhook":
+            self.send_json({"error": "not found"}, status=404)
+            return
+        body = self.read_json()
+        if self.inject_fault():
+            return
+
+        sender_id = body.get("sender", "default")
+        message = body.get("message", "")
+        # NLU and policies; with --parallel 1 this is one Rasa process's event loop
+        with self.server.request_slots:
+            time.sleep(self.server.latency.sample())
+
+        if not self.server.action_url:
+            self.send_json([{"recipient_id": sender_id, "text": self.server.reply}])
+            return
+
+        tracker = self.server.tracker_for(sender_id)
+        # Like Rasa's lock store, one message per conversation at a time
+        with tracker["lock"]:
+            replies = self._run_action(sender_id, message, body.get("metadata") or {}, tracker)
+        self.send_json([{"recipient_id": sender_id, "text": text} for text in replies])
+
+    def _run_action(self, sender_id, message, metadata, tracker):
+        latest_message = {
+            "text": message,
+            "intent": {"name": "inform", "confidence": 1.0},
+            "entities": [],
+            "metadata": metadata,
+        }
+        tracker["events"].append({"event": "user", "text": message, "timestamp": time.time(),
+                                  "parse_data": latest_message, "metadata": metadata})
+        payload = {
+            "next_action": "action_intelligent_analysis",
+            "sender_id": sender_id,
+            "tracker": {
+                "sender_id": sender_id,
+                "slots": dict(tracker["slots"]),
+                "latest_message": latest_message,
+                "events": list(tracker["events"]),
+                "paused": False,
+                "followup_action": None,
+                "active_loop": {},
+                "latest_action_name": "action_listen",
+            },
+            "domain": {},
+            "version": "3.5.10",
+        }
+        response = self.server.http.post(self.server.action_url, json=payload, timeout=300)
+        response.raise_for_status()
+        result = response.json()
+
+        replies = []
+        for event in result.get("events", []):
+            if event.get("event") == "slot":
+                tracker["slots"][event["name"]] = event["value"]
+            elif event.get("event") == "bot" and event.get("text"):
+                replies.append(event["text"])
+            tracker["events"].append(event)
+        replies.extend(r["text"] for r in result.get("responses", []) if r.get("text"))
+        return replies
+
+
+# ============================================
+# ENTRY POINTS
+# ============================================
+
+def serve_in_thread(server):
+    """Run a stub server on a daemon thread and return it."""
+    thread = threading.Thread(target=server.serve_forever, name=type(server).__name__, daemon=True)
+    thread.start()
+    return server
+
+
+def start_ollama_stub(port=11434, host="127.0.0.1", **config):
+    return serve_in_thread(OllamaStubServer((host, port), **config))
+
+
+def start_rasa_stub(port=5005, host="127.0.0.1", **config):
+    return serve_in_thread(RasaStubServer((host, port), **config))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in Rasa / Ollama servers for benchmarks")
+    sub = parser.add_subparsers(dest="stub", required=True)
+
+    for name, port in (("ollama", 11434), ("rasa", 5005)):
+        p = sub.add_parser(name)
+        p.add_argument("--host", default="127.0.0.1")
+        p.add_argument("--port", type=int, default=port)
+        p.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with HTTP 500")
+        p.add_argument("--hang-rate", type=float, default=0.0, help="fraction of requests that never answer")
+        p.add_argument("--hang-seconds", type=float, default=600.0)
+        p.add_argument("--seed", type=int, default=None)
+        p.add_argument("--verbose", action="store_true")
+        if name == "ollama":
+            p.add_argument("--ttft", default="lognormal:0.3:0.4", help="time to first token distribution")
+            p.add_argument("--tokens-per-sec", type=float, default=40.0)
+            p.add_argument("--prompt-tokens-per-sec", type=float, default=800.0)
+            p.add_argument("--load-seconds", type=float, default=2.0, help="simulated cold model load")
+            p.add_argument("--cache-slots", type=int, default=4, help="prompt-cache slots (0 disables reuse)")
+            p.add_argument("--parallel", type=int, default=4, help="requests processed at once (0 = unlimited)")
+            p.add_argument("--model", default="phi3:mini")
+        else:
+            p.add_argument("--latency", default="lognormal:0.02:0.3", help="NLU/policy latency distribution")
+            p.add_argument("--action-url", default=None, help="call this action server instead of replying canned text")
+            p.add_argument("--reply", default="Got it. What else can you tell me?")
+            p.add_argument("--parallel", type=int, default=0,
+                           help="messages processed at once (1 = one Rasa process, 0 = unlimited)")
+
+    args = vars(parser.parse_args())
+    stub = args.pop("stub")
+    host, port = args.pop("host"), args.pop("port")
+    server_cls = OllamaStubServer if stub == "ollama" else RasaStubServer
+    server = server_cls((host, port), **args)
+    print(f"{stub} stub listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
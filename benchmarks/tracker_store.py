@@ -0,0 +1,89 @@
+# benchmarks/tracker_store.py
+# Tracker size and save/retrieve cost over a long session: Rasa's in-memory
+# store vs the bounded SQLite tracker store (common/tracker_store.py).
+#
+#   python -m benchmarks.tracker_store --turns 500
+#
+# Needs Rasa installed (run it in the Rasa environment). Every turn appends
+# the events Rasa would - user message, action, bot reply with the raw LLM
+# output, slot updates - then saves and reloads the tracker. The serialised
+# size is roughly what Rasa sends to the action server on every call.
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from common.log import configure_logging
+
+configure_logging(level="WARNING")
+
+from benchmarks.corpus import PHASE_MESSAGES
+from database.setup import init_database
+
+REPORT_AT = (10, 50, 100, 250, 500, 1000, 2000)
+
+
+async def play(store, turns, reply_chars):
+    from rasa.shared.core.events import ActionExecuted, BotUttered, SlotSet, UserUttered
+    from rasa.shared.core.trackers import EventVerbosity
+
+    sender_id = "tracker-bench"
+    messages = PHASE_MESSAGES["functional"]
+    raw = json.dumps({"reply": "x" * reply_chars, "analysis": {"type": "Requirement"}})
+    tracker = await store.get_or_create_tracker(sender_id)
+    tracker.update(SlotSet("project_id", 1.0))
+    rows = []
+    for turn in range(1, turns + 1):
+        tracker.update(UserUttered(messages[turn % len(messages)], {"name": "user_message", "confidence": 1.0}))
+        tracker.update(ActionExecuted("action_intelligent_analysis"))
+        tracker.update(BotUttered("x" * reply_chars, metadata={"llm_raw": raw}))
+        tracker.update(SlotSet("elicitation_phase", "functional"))
+        tracker.update(ActionExecuted("action_listen"))
+
+        start = time.perf_counter()
+        await store.save(tracker)
+        saved = time.perf_counter()
+        tracker = await store.retrieve(sender_id)
+        loaded = time.perf_counter()
+        if turn in REPORT_AT or turn == turns:
+            size = len(json.dumps(tracker.current_state(EventVerbosity.ALL)))
+            rows.append((turn, len(tracker.events), size, (saved - start) * 1000, (loaded - saved) * 1000))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tracker growth: in-memory vs bounded SQLite tracker store")
+    parser.add_argument("--turns", type=int, default=500)
+    parser.add_argument("--max-turns", type=int, default=20)
+    parser.add_argument("--archive-every", type=int, default=8)
+    parser.add_argument("--reply-chars", type=int, default=300, help="length of each bot reply")
+    args = parser.parse_args()
+
+    from rasa.core.tracker_store import InMemoryTrackerStore
+    from rasa.shared.core.domain import Domain
+    from common.tracker_store import SQLiteTrackerStore
+
+    domain = Domain.load(os.path.join(ROOT, "domain.yml"))
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, "trackers.db")
+        init_database(db_path)
+        stores = {
+            "in-memory": InMemoryTrackerStore(domain),
+            "sqlite": SQLiteTrackerStore(domain, db=db_path, max_turns=args.max_turns,
+                                         archive_every=args.archive_every),
+        }
+        print(f"{'store':<11}{'turn':>6}{'events':>8}{'tracker KB':>12}{'save ms':>9}{'load ms':>9}")
+        for name, store in stores.items():
+            for turn, events, size, save_ms, load_ms in asyncio.run(play(store, args.turns, args.reply_chars)):
+                print(f"{name:<11}{turn:>6}{events:>8}{size / 1024:>12.1f}{save_ms:>9.2f}{load_ms:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# benchmarks/triage.py
+# How many LLM calls the local triage (common/triage.py) avoids.
+#
+#   python -m benchmarks.triage                                     # synthetic sessions from the corpus
+#   python -m benchmarks.triage /var/tmp/reqbot-capture             # replay captured Ollama calls
+#
+# With capture paths, every "ollama" record the action server captured is a
+# turn that went to the model; the user message, the bot's previous reply
+# and the phase are taken from the recorded payload, and each is classified
+# the way the action would classify it now. Rasa's intent ranking is not
+# captured, so only the keyword rules apply and the count is a lower bound.
+#
+# Without paths, --sessions synthetic sessions walk through the phases with
+# the corpus messages, a follow-up ("ok", "no, I meant...") after a share
+# of them (--follow-up).
+
+import argparse
+import json
+import os
+import random
+import sys
+from collections import Counter, defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from common.log import configure_logging
+
+configure_logging(level="WARNING")
+
+from benchmarks.corpus import FOLLOW_UPS, PHASE_MESSAGES, PHASE_ORDER
+from common.capture import read_capture
+from common.triage import classify_turn
+
+
+def captured_turns(paths):
+    """(phase, user message, previous bot reply) for each captured Ollama call."""
+    for record in read_capture(paths, kind="ollama"):
+        messages = (record.get("payload") or {}).get("messages") or []
+        users = [m for m in messages if m.get("role") == "user"]
+        if not users:
+            continue
+        bot_text = None
+        for message in reversed(messages):
+            if message.get("role") == "assistant":
+                try:
+                    bot_text = json.loads(message["content"]).get("reply")
+                except (ValueError, AttributeError):
+                    bot_text = message["content"]
+                break
+        yield record.get("phase") or "vision", users[-1]["content"], bot_text
+
+
+def synthetic_turns(sessions, follow_up, seed):
+    rng = random.Random(seed)
+    for _ in range(sessions):
+        for phase in PHASE_ORDER:
+            for message in PHASE_MESSAGES[phase]:
+                yield phase, message, None
+                if rng.random() < follow_up:
+                    yield phase, rng.choice(FOLLOW_UPS), None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count the LLM calls local triage would avoid")
+    parser.add_argument("paths", nargs="*", help="capture files or directories (default: synthetic sessions)")
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--follow-up", type=float, default=0.3,
+                        help="share of corpus messages followed by a follow-up")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    turns = captured_turns(args.paths) if args.paths else synthetic_turns(args.sessions, args.follow_up, args.seed)
+    by_phase = defaultdict(Counter)
+    reasons = Counter()
+    for phase, text, bot_text in turns:
+        kind, reason = classify_turn(text, last_bot_text=bot_text)
+        by_phase[phase][kind] += 1
+        reasons[kind, reason] += 1
+
+    total = Counter()
+    print(f"{'phase':<16}{'turns':>7}{'llm':>7}{'ack':>7}{'done':>7}{'avoided':>9}")
+    for phase in PHASE_ORDER + sorted(set(by_phase) - set(PHASE_ORDER)):
+        counts = by_phase.get(phase)
+        if not counts:
+            continue
+        total.update(counts)
+        turns = sum(counts.values())
+        print(f"{phase:<16}{turns:>7}{counts['llm']:>7}{counts['ack']:>7}{counts['done']:>7}"
+              f"{1 - counts['llm'] / turns:>9.1%}")
+    turns = sum(total.values())
+    if not turns:
+        print("no turns")
+        return
+    print(f"{'total':<16}{turns:>7}{total['llm']:>7}{total['ack']:>7}{total['done']:>7}"
+          f"{1 - total['llm'] / turns:>9.1%}")
+    print("reasons: " + ", ".join(f"{kind}/{reason} {n}" for (kind, reason), n in sorted(reasons.items())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+# benchmarks/vector_index.py
+# Search speed, load time and accuracy of the per-project vector index
+# (common/vector_index.py) at growing project sizes.
+#
+#   python -m benchmarks.vector_index --sizes 1000,100000,1000000 --dimensions 384
+#
+# Vectors are synthetic: unit vectors scattered around --clusters centres,
+# like requirements that circle a few hundred topics, generated chunk by
+# chunk from a fixed seed so the float32 originals can be regenerated for
+# the exact answer. For each size the index is built with add() and saved,
+# then opened again (memory-mapped) and searched:
+#
+#   first        the first search: pages the file in and, within
+#                --resident-mb, builds the float32 copy
+#   query        one query at a time, p50/p95
+#   batch        --batch queries in one search() call, time per query
+#   recall@10    share of the exact float32 top 10 found from the float16 index
+#   scan         what a search costs without the index: read every embedding
+#                blob of the project from SQLite, decode and score them
+#                (sizes up to --scan-max)
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from common.log import configure_logging
+
+configure_logging(level="WARNING")
+
+from benchmarks.stats import summarize
+from common import vector_index
+from common.embeddings import from_blob, normalize_rows, to_blob
+from common.vector_index import ProjectIndex
+
+CHUNK = 65536
+
+
+def centres(args):
+    return normalize_rows(np.random.default_rng(args.seed).standard_normal((args.clusters, args.dimensions)))
+
+
+def chunk(args, index, size, topics):
+    """Rows [index * CHUNK, ...) of the synthetic vectors, as float32."""
+    rng = np.random.default_rng((args.seed, index))
+    rows = min(CHUNK, size - index * CHUNK)
+    noise = rng.standard_normal((rows, args.dimensions)) * args.spread / np.sqrt(args.dimensions)
+    return normalize_rows(topics[rng.integers(0, len(topics), rows)] + noise)
+
+
+def chunks(args, size, topics):
+    for index in range((size + CHUNK - 1) // CHUNK):
+        yield np.arange(index * CHUNK, index * CHUNK + min(CHUNK, size - index * CHUNK), dtype=np.int64) + 1, \
+            chunk(args, index, size, topics)
+
+
+def exact_top(args, size, topics, queries, k):
+    best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+    best_ids = np.zeros((len(queries), 0), dtype=np.int64)
+    for ids, vectors in chunks(args, size, topics):
+        best_scores = np.hstack([best_scores, queries @ vectors.T])
+        best_ids = np.hstack([best_ids, np.broadcast_to(ids, (len(queries), len(ids)))])
+        top = np.argsort(-best_scores, axis=1)[:, :k]
+        best_scores = np.take_along_axis(best_scores, top, axis=1)
+        best_ids = np.take_along_axis(best_ids, top, axis=1)
+    return [set(row) for row in best_ids.tolist()]
+
+
+def scan(conn, query, k):
+    rows = conn.execute('SELECT id, embedding FROM requirements WHERE project_id = 1').fetchall()
+    matrix = np.vstack([from_blob(blob) for _, blob in rows]).astype(np.float32)
+    scores = matrix @ query
+    return [rows[i][0] for i in np.argsort(-scores)[:k]]
+
+
+def run_size(size, args, workdir):
+    topics = centres(args)
+    rng = np.random.default_rng(args.seed + size)
+    directory = os.path.join(workdir, f"index-{size}")
+
+    start = time.perf_counter()
+    index = ProjectIndex(directory, 1, "synthetic", args.dimensions)
+    for ids, vectors in chunks(args, size, topics):
+        index.add(ids, vectors)
+    index.save()
+    build = time.perf_counter() - start
+    file_mb = os.path.getsize(index.path) / 1e6
+    del index
+
+    start = time.perf_counter()
+    index = ProjectIndex(directory, 1, "synthetic", args.dimensions)
+    load = time.perf_counter() - start
+
+    # Queries: perturbed copies of stored vectors
+    picked = rng.integers(0, size, args.queries)
+    rows = np.asarray(index.base[picked], dtype=np.float32)
+    queries = normalize_rows(rows + rng.standard_normal(rows.shape) * args.spread / np.sqrt(args.dimensions))
+
+    begin = time.perf_counter()
+    index.search(queries[:1], k=10)  # faults the mapped pages in, builds the float32 copy
+    first = time.perf_counter() - begin
+    latencies, found = [], []
+    for query in queries:
+        begin = time.perf_counter()
+        found.append({i for i, _ in index.search(query, k=10)[0]})
+        latencies.append(time.perf_counter() - begin)
+    single = summarize(latencies)
+
+    begin = time.perf_counter()
+    for offset in range(0, len(queries), args.batch):
+        index.search(queries[offset:offset + args.batch], k=10)
+    batch = (time.perf_counter() - begin) / len(queries)
+
+    adds = []
+    extra = normalize_rows(rng.standard_normal((200, args.dimensions)))
+    for n, vector in enumerate(extra):
+        begin = time.perf_counter()
+        index.add(np.array([size + 1 + n], dtype=np.int64), vector[None, :])
+        adds.append(time.perf_counter() - begin)
+
+    truth = exact_top(args, size, topics, queries, 10)
+    recall = np.mean([len(a & b) / 10 for a, b in zip(found, truth)])
+
+    scan_ms = "-"
+    if size <= args.scan_max:
+        path = os.path.join(workdir, f"scan-{size}.db")
+        conn = sqlite3.connect(path)
+        conn.execute('CREATE TABLE requirements (id INTEGER PRIMARY KEY, project_id INTEGER, embedding BLOB)')
+        conn.execute('CREATE INDEX idx_requirements_project ON requirements (project_id)')
+        for ids, vectors in chunks(args, size, topics):
+            conn.executemany('INSERT INTO requirements VALUES (?, 1, ?)',
+                             [(int(i), to_blob(v)) for i, v in zip(ids, vectors)])
+        conn.commit()
+        samples = []
+        for query in queries[:10]:
+            begin = time.perf_counter()
+            scan(conn, query, 10)
+            samples.append(time.perf_counter() - begin)
+        conn.close()
+        scan_ms = f"{summarize(samples)['p50'] * 1000:.1f}"
+
+    print(f"{size:>9,}{file_mb:>9.1f}{build:>9.2f}{load * 1000:>9.2f}{first * 1000:>9.1f}{single['p50'] * 1000:>9.2f}"
+          f"{single['p95'] * 1000:>9.2f}{batch * 1000:>9.2f}{summarize(adds)['p50'] * 1e6:>9.1f}"
+          f"{recall:>9.3f}{scan_ms:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the per-project vector index")
+    parser.add_argument("--sizes", default="1000,100000,1000000", type=lambda s: [int(x) for x in s.split(",")])
+    parser.add_argument("--dimensions", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=500, help="topics the synthetic vectors scatter around")
+    parser.add_argument("--spread", type=float, default=0.6, help="noise around each topic (0 = identical)")
+    parser.add_argument("--queries", type=int, default=64)
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--scan-max", type=int, default=100000, help="largest size timed without the index")
+    parser.add_argument("--resident-mb", type=int, default=vector_index.RESIDENT_BYTES // 2 ** 20,
+                        help="memory for float32 copies (VECTOR_INDEX_RESIDENT_MB)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    vector_index.RESIDENT_BYTES = args.resident_mb * 2 ** 20
+    print(f"{'vectors':>9}{'file MB':>9}{'build s':>9}{'load ms':>9}{'first ms':>9}{'p50 ms':>9}{'p95 ms':>9}"
+          f"{'batch ms':>9}{'add us':>9}{'recall':>9}{'scan ms':>10}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            run_size(size, args, workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,374 @@
+# common/action_server.py
+# Multi-process action server: several rasa_sdk workers behind one port.
+#
+#   python -m common.action_server --workers 4       # instead of `rasa run actions`
+#   kill -HUP <pid>                                   # rolling restart, e.g. after a deploy
+#
+# The front process listens on --port (5055, where endpoints.yml points)
+# and forwards every action call to a worker process picked by consistent
+# hashing on the sender id (common/pool.py, strategy="hash"). A
+# conversation keeps hitting one worker, whose Ollama pool already knows
+# which server holds that conversation's prompt cache. Each worker is a
+# stock rasa_sdk app serving the `actions` package on 127.0.0.1, port
+# --port + 1 + index. Within a worker, actions are async and run their
+# blocking work on ACTION_THREADS threads sharing one Ollama session. Only
+# worker 0 runs the Ollama warmers (common/warmup.py).
+#
+# SIGHUP restarts the workers one at a time:
+#   - a worker leaves the ring and its in-flight calls finish (up to
+#     --drain-timeout)
+#   - it is replaced by a fresh process, which picks up changed action code
+#   - it rejoins the ring once it answers /health
+# Its senders go to the next worker in the meantime, so with two or more
+# workers no call is refused. SIGTERM / Ctrl-C stops accepting calls, lets
+# the in-flight ones finish the same way, then stops the workers. A worker
+# that dies on its own is restarted.
+#
+# GET /metrics on the front port serves this process's metrics plus every
+# worker's, each labelled worker="<index>". GET /health reports the state
+# of every worker.
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from common import metrics
+from common.log import configure_logging, get_logger
+from common.pool import EndpointPool
+
+log = get_logger("action_server")
+
+FORWARDED = metrics.counter(
+    "action_server_requests_total", "Action calls forwarded by the front process", ["worker", "outcome"])
+FORWARD_LATENCY = metrics.histogram(
+    "action_server_request_seconds", "Action call latency through the front process", ["worker"])
+WORKER_RESTARTS = metrics.counter(
+    "action_server_worker_restarts_total", "Worker processes replaced", ["worker", "reason"])
+
+# How long a fresh worker may take to import the actions and answer /health
+WORKER_START_TIMEOUT = 120.0
+
+
+# ============================================
+# SANIC SERVER LIFECYCLE
+# ============================================
+
+async def start_server(app, host, port):
+    """Serve a Sanic app on the running event loop and return the server."""
+    server = await app.create_server(host=host, port=port, return_asyncio_server=True, access_log=False)
+    await server.startup()
+    await server.before_start()
+    await server.after_start()
+    return server
+
+
+async def stop_server(server, timeout):
+    """Stop accepting connections, give open requests `timeout` seconds to finish, then close."""
+    await server.before_stop()
+    server.close()
+    await server.wait_closed()
+    deadline = time.monotonic() + timeout
+    while server.connections and time.monotonic() < deadline:
+        for connection in list(server.connections):
+            connection.close_if_idle()
+        await asyncio.sleep(0.05)
+    for connection in list(server.connections):
+        connection.abort()
+    await server.after_stop()
+
+
+def wait_for_signal(*signals):
+    """Future resolved with the first of `signals` this process receives."""
+    loop = asyncio.get_running_loop()
+    received = loop.create_future()
+    for sig in signals:
+        loop.add_signal_handler(sig, lambda s=sig: received.done() or received.set_result(s))
+    return received
+
+
+# ============================================
+# WORKER PROCESS
+# ============================================
+
+async def serve_worker(args):
+    from rasa_sdk.endpoint import create_app
+    from sanic import response
+
+    app = create_app(args.actions)
+
+    @app.get("/metrics")
+    async def worker_metrics(_):
+        return response.raw(metrics.render().encode("utf-8"), content_type=metrics.CONTENT_TYPE)
+
+    server = await start_server(app, "127.0.0.1", args.port)
+    log.info("worker.started", worker=args.worker, port=args.port, pid=os.getpid())
+    await wait_for_signal(signal.SIGTERM, signal.SIGINT)
+    log.info("worker.stopping", worker=args.worker, connections=len(server.connections))
+    await stop_server(server, args.drain_timeout)
+
+
+# ============================================
+# FRONT PROCESS
+# ============================================
+
+class Worker:
+    def __init__(self, index, port, endpoint):
+        self.index = index
+        self.port = port
+        self.endpoint = endpoint
+        self.process = None
+        self.replacing = False
+
+
+class Supervisor:
+    """Starts, watches and replaces the worker processes, and routes calls to them."""
+
+    def __init__(self, args):
+        self.args = args
+        urls = [f"http://127.0.0.1:{args.port + 1 + i}" for i in range(args.workers)]
+        self.pool = EndpointPool("action_workers", urls, strategy="hash", cooldown=2.0,
+                                 health_path="/health", health_interval=2.0)
+        self.workers = [Worker(i, args.port + 1 + i, endpoint) for i, endpoint in enumerate(self.pool.endpoints)]
+        self.by_endpoint = {worker.endpoint: worker for worker in self.workers}
+        self.executor = ThreadPoolExecutor(max_workers=args.max_connections, thread_name_prefix="forward")
+        self.http = requests.Session()
+        self.http.mount("http://", HTTPAdapter(pool_connections=args.workers, pool_maxsize=args.max_connections))
+        self.restart_lock = asyncio.Lock()
+        self.stopping = False
+
+    async def _call(self, fn, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, lambda: fn(*args, **kwargs))
+
+    # ---------- worker processes ----------
+
+    def _spawn(self, worker):
+        command = [sys.executable, "-m", "common.action_server", "--worker", str(worker.index),
+                   "--port", str(worker.port), "--actions", self.args.actions,
+                   "--drain-timeout", str(self.args.drain_timeout)]
+        # Workers serve /metrics themselves; the side metrics server would clash
+        env = dict(os.environ, ACTIONS_METRICS_PORT="0")
+        # Worker 0 keeps the models warm; one keep-warm ping per server is enough
+        if worker.index:
+            env["OLLAMA_WARMUP"] = "0"
+        worker.process = subprocess.Popen(command, env=env)
+
+    async def _wait_healthy(self, worker):
+        deadline = time.monotonic() + WORKER_START_TIMEOUT
+        while time.monotonic() < deadline:
+            if worker.process.poll() is not None:
+                break
+            try:
+                response = await self._call(self.http.get, f"{worker.endpoint.url}/health", timeout=2)
+                if response.ok:
+                    return True
+            except requests.RequestException:
+                pass
+            await asyncio.sleep(0.2)
+        log.error("worker.unhealthy", worker=worker.index, exit_code=worker.process.poll())
+        return False
+
+    async def _stop(self, worker):
+        process = worker.process
+        if process.poll() is None:
+            process.terminate()
+            try:
+                await self._call(process.wait, timeout=self.args.drain_timeout + 5)
+            except subprocess.TimeoutExpired:
+                log.warning("worker.killed", worker=worker.index, pid=process.pid)
+                process.kill()
+                await self._call(process.wait)
+
+    async def _wait_idle(self, endpoints):
+        deadline = time.monotonic() + self.args.drain_timeout
+        while any(e.in_flight for e in endpoints) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        return sum(e.in_flight for e in endpoints)
+
+    async def start_workers(self):
+        for worker in self.workers:
+            self._spawn(worker)
+        healthy = await asyncio.gather(*(self._wait_healthy(w) for w in self.workers))
+        if not any(healthy):
+            raise RuntimeError("no action server worker came up")
+
+    async def replace(self, worker, reason):
+        """Drain one worker, start a fresh process in its place and put it back in the ring."""
+        worker.replacing = True
+        try:
+            self.pool.drain(worker.endpoint)
+            unfinished = await self._wait_idle([worker.endpoint])
+            await self._stop(worker)
+            log.info("worker.replacing", worker=worker.index, reason=reason, unfinished=unfinished)
+            self._spawn(worker)
+            if await self._wait_healthy(worker):
+                self.pool.undrain(worker.endpoint)
+            WORKER_RESTARTS.inc(worker=str(worker.index), reason=reason)
+        finally:
+            worker.replacing = False
+
+    async def rolling_restart(self):
+        async with self.restart_lock:
+            log.info("workers.restarting", workers=len(self.workers))
+            for worker in self.workers:
+                if self.stopping:
+                    return
+                await self.replace(worker, "reload")
+            log.info("workers.restarted", workers=len(self.workers))
+
+    async def watch(self):
+        """Restart workers that exit on their own."""
+        while not self.stopping:
+            await asyncio.sleep(1.0)
+            for worker in self.workers:
+                if not worker.replacing and not self.stopping and worker.process.poll() is not None:
+                    log.error("worker.exited", worker=worker.index, exit_code=worker.process.returncode)
+                    async with self.restart_lock:
+                        await self.replace(worker, "exited")
+
+    async def shutdown(self):
+        self.stopping = True
+        unfinished = await self._wait_idle(self.pool.endpoints)
+        log.info("workers.stopping", unfinished=unfinished)
+        await asyncio.gather(*(self._stop(w) for w in self.workers))
+
+    # ---------- forwarding ----------
+
+    @staticmethod
+    def sender_of(body, encoding):
+        try:
+            if encoding == "deflate":
+                body = zlib.decompress(body)
+            return json.loads(body).get("sender_id")
+        except (ValueError, AttributeError, zlib.error):
+            return None
+
+    async def forward(self, request):
+        """Send an action call to its sender's worker; fail over if that worker refuses the connection."""
+        headers = {name: request.headers[name] for name in ("Content-Type", "Content-Encoding")
+                   if name in request.headers}
+        sender_id = self.sender_of(request.body, headers.get("Content-Encoding"))
+        tried = []
+        while True:
+            start = time.perf_counter()
+            try:
+                with self.pool.acquire(sender_id, exclude=tried) as endpoint:
+                    response = await self._call(self.http.post, f"{endpoint.url}/webhook", data=request.body,
+                                                headers=headers, timeout=self.args.timeout)
+            except requests.exceptions.ConnectionError as e:
+                # Not delivered: the worker is down or restarting
+                worker = self.by_endpoint[endpoint].index
+                FORWARDED.inc(worker=str(worker), outcome="refused")
+                tried.append(endpoint)
+                if len(tried) >= len(self.workers):
+                    raise
+                log.warning("worker.failover", worker=worker, sender_id=sender_id, error=str(e))
+                continue
+            worker = str(self.by_endpoint[endpoint].index)
+            FORWARDED.inc(worker=worker, outcome=str(response.status_code))
+            FORWARD_LATENCY.observe(time.perf_counter() - start, worker=worker)
+            return response
+
+    async def worker_metrics(self):
+        async def scrape(worker):
+            try:
+                response = await self._call(self.http.get, f"{worker.endpoint.url}/metrics", timeout=5)
+                return {"worker": str(worker.index)}, response.text
+            except requests.RequestException:
+                return {"worker": str(worker.index)}, ""
+        return await asyncio.gather(*(scrape(w) for w in self.workers))
+
+    def snapshot(self):
+        states = self.pool.snapshot()
+        for worker, state in zip(self.workers, states):
+            state.update(worker=worker.index, pid=worker.process.pid if worker.process else None)
+        return states
+
+
+def create_front_app(supervisor):
+    from sanic import Sanic, response
+
+    app = Sanic("action_server", configure_logging=False)
+
+    @app.post("/webhook")
+    async def webhook(request):
+        try:
+            forwarded = await supervisor.forward(request)
+        except requests.RequestException as e:
+            log.error("forward.failed", error=str(e))
+            return response.json({"error": "no action server worker available"}, status=503)
+        return response.raw(forwarded.content, status=forwarded.status_code,
+                            content_type=forwarded.headers.get("Content-Type", "application/json"))
+
+    @app.get("/health")
+    async def health(_):
+        workers = supervisor.snapshot()
+        ok = any(w["healthy"] for w in workers)
+        return response.json({"status": "ok" if ok else "unavailable", "workers": workers},
+                             status=200 if ok else 503)
+
+    @app.get("/actions")
+    async def actions(_):
+        with supervisor.pool.acquire() as endpoint:
+            listed = await supervisor._call(supervisor.http.get, f"{endpoint.url}/actions", timeout=10)
+        return response.raw(listed.content, status=listed.status_code, content_type="application/json")
+
+    @app.get("/metrics")
+    async def front_metrics(_):
+        merged = metrics.merge([({}, metrics.render())] + await supervisor.worker_metrics())
+        return response.raw(merged.encode("utf-8"), content_type=metrics.CONTENT_TYPE)
+
+    return app
+
+
+async def serve_front(args):
+    supervisor = Supervisor(args)
+    await supervisor.start_workers()
+    server = await start_server(create_front_app(supervisor), args.host, args.port)
+    log.info("action_server.started", port=args.port, workers=args.workers, pid=os.getpid())
+
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGHUP, lambda: asyncio.ensure_future(supervisor.rolling_restart()))
+    watcher = asyncio.ensure_future(supervisor.watch())
+    await wait_for_signal(signal.SIGTERM, signal.SIGINT)
+
+    log.info("action_server.stopping", port=args.port)
+    supervisor.stopping = True
+    watcher.cancel()
+    server.close()
+    await supervisor.shutdown()
+    await stop_server(server, 1.0)
+    log.info("action_server.stopped", port=args.port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the action server as several worker processes behind one port")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5055, help="front port; workers use the next --workers ports")
+    parser.add_argument("--actions", default="actions", help="package or module holding the actions")
+    parser.add_argument("--drain-timeout", type=float, default=120.0,
+                        help="seconds a stopping worker gets to finish its in-flight calls")
+    parser.add_argument("--timeout", type=float, default=300.0, help="seconds to wait for a worker's reply")
+    parser.add_argument("--max-connections", type=int, default=64, help="action calls forwarded at once")
+    parser.add_argument("--worker", type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    configure_logging()
+    if args.worker is not None:
+        asyncio.run(serve_worker(args))
+    else:
+        asyncio.run(serve_front(args))
+
+
+if __name__ == "__main__":
+    main()
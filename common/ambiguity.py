@@ -0,0 +1,247 @@
+# common/ambiguity.py
+# Flags vague wording in stakeholder messages without asking the LLM.
+#
+#   findings = detect("It should be fast and user-friendly for many users")
+#   # [{"term": "fast", "category": "performance", "start": 13, "end": 17}, ...]
+#
+#   python -m common.ambiguity --db requirements.db              # rescan all stored history
+#   python -m common.ambiguity --db requirements.db --project 3
+#
+# The lexicons below are compiled once into an Aho-Corasick automaton over
+# words, so a message is scanned in one pass whatever the number of terms,
+# and "user friendly" also matches "user-friendly". Where terms overlap the
+# longest one wins, which is how exceptions work: "responsive design" is
+# listed as ALLOWED so it hides "responsive".
+#
+# Terms that a number would make precise ("fast", "many users", "highly
+# available", "soon") are only flagged when their sentence has no digits:
+# "high availability, at least 99.9% uptime" is fine.
+#
+# Findings are written to the ambiguities table with source 'lexicon', one
+# row per message. The content is built from the message, so a rescan of
+# history already scanned live adds nothing.
+
+import argparse
+import json
+import re
+import sqlite3
+import time
+from collections import deque
+
+from common import metrics
+from common.log import get_logger
+
+log = get_logger("ambiguity")
+
+AMBIGUITY_TERMS = metrics.counter(
+    "ambiguity_terms_total", "Vague terms flagged by the lexicon detector", ["category"])
+
+LEXICONS = {
+    "performance": """
+        fast | faster | quick | quickly | speedy | snappy | responsive | efficient | efficiently | performant
+        high performance | low latency | lightweight | instant | instantly | smooth | no lag | without delay
+    """,
+    "scale": """
+        many | many users | lots of | lots of users | a lot of | a lot of users | large number of | huge
+        massive | numerous | plenty of | scalable | highly scalable | scale well | large scale
+    """,
+    "usability": """
+        user friendly | easy | easy to use | easy to learn | intuitive | simple to use
+        beautiful | attractive | seamless | seamlessly | convenient | straightforward
+    """,
+    "security": """
+        secure | securely | safely | protected | very secure | highly secure | hack proof
+    """,
+    "reliability": """
+        reliable | robust | always available | always on | highly available | high availability
+        never go down | never crash | no downtime | fault tolerant | resilient
+    """,
+    "time": """
+        soon | asap | as soon as possible | eventually | shortly | in the future | near future
+        timely | in a timely manner | at some point | regularly | periodically | from time to time
+    """,
+    "open_ended": """
+        etc | and so on | and more | as needed | as appropriate | if possible | where possible | if needed
+        adequate | sufficient | reasonable | user defined | and or
+    """,
+}
+
+# Precise phrases that contain a lexicon term
+ALLOWED = """
+    responsive design | how many | as many | quick start | real time | easy install
+"""
+
+# Categories a number in the same sentence makes precise
+QUANTIFIABLE = frozenset(["performance", "scale", "reliability", "time"])
+
+_WORD = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+# A sentence ends at . ! ? ; followed by a space, or at a line break ("99.9%" stays whole)
+_SENTENCE = re.compile(r"(?:[^.!?;\n]|[.!?;](?!\s|$))+")
+_DIGIT = re.compile(r"\d")
+
+
+class Matcher:
+    """Aho-Corasick automaton over word tokens."""
+
+    def __init__(self, phrases):
+        """`phrases` maps a phrase ("easy to use") to its category (None = allowed)."""
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]          # (length in words, phrase, category) ending at each state
+        for phrase, category in phrases.items():
+            words = phrase.split()
+            state = 0
+            for word in words:
+                if word not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                    self.goto[state][word] = len(self.goto) - 1
+                state = self.goto[state][word]
+            self.out[state].append((len(words), phrase, category))
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for word, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and word not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(word, 0)
+                self.out[child] = self.out[child] + self.out[self.fail[child]]
+
+    def scan(self, tokens):
+        """Leftmost-longest non-overlapping matches as (first token, last token, phrase, category)."""
+        goto, fail, out = self.goto, self.fail, self.out
+        matches = []
+        state = 0
+        for i, word in enumerate(tokens):
+            while state and word not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(word, 0)
+            for length, phrase, category in out[state]:
+                matches.append((i - length + 1, i, phrase, category))
+        if len(matches) < 2:
+            return matches
+
+        matches.sort(key=lambda m: (m[0], m[0] - m[1]))
+        kept = []
+        for match in matches:
+            if not kept or match[0] > kept[-1][1]:
+                kept.append(match)
+        return kept
+
+
+def _phrases():
+    phrases = {phrase.strip(): None for phrase in ALLOWED.split("|")}
+    for category, terms in LEXICONS.items():
+        for phrase in terms.split("|"):
+            phrases[" ".join(phrase.split())] = category
+    return {phrase: category for phrase, category in phrases.items() if phrase}
+
+
+MATCHER = Matcher(_phrases())
+
+
+def detect(text):
+    """Vague terms in `text` as dicts with term, category and character span."""
+    lowered = text.lower().replace("’", "'")
+    tokens = list(_WORD.finditer(lowered))
+    if not tokens:
+        return []
+    matches = MATCHER.scan([t.group() for t in tokens])
+    if not matches:
+        return []
+
+    findings = []
+    quantified = None
+    for first, last, phrase, category in matches:
+        if category is None:
+            continue
+        start, end = tokens[first].start(), tokens[last].end()
+        if category in QUANTIFIABLE:
+            if quantified is None:
+                quantified = [m.span() for m in _SENTENCE.finditer(lowered) if _DIGIT.search(m.group())]
+            if any(s <= start < e for s, e in quantified):
+                continue
+        findings.append({"term": text[start:end], "category": category, "start": start, "end": end})
+    return findings
+
+
+def describe(text, findings):
+    """The ambiguities.content text for a message and its findings."""
+    terms = ", ".join(f'"{f["term"]}" ({f["category"]})' for f in findings)
+    return f"Vague wording {terms} in: {text}"
+
+
+def llm_hint(findings):
+    """A note for the model listing the terms to ask the stakeholder to make measurable."""
+    terms = ", ".join(f'"{f["term"]}" ({f["category"]})' for f in findings)
+    return (f"Local checks found vague wording in the last message: {terms}. "
+            "Classify and report the message as you normally would, and also ask the user to make "
+            "these terms specific or measurable.")
+
+
+def record(conn, project_id, text, findings):
+    """Insert one 'lexicon' ambiguity for a message unless it is already stored; True if inserted."""
+    if not findings:
+        return False
+    for finding in findings:
+        AMBIGUITY_TERMS.inc(category=finding["category"])
+    content = describe(text, findings)
+    cursor = conn.execute('''
+        INSERT INTO ambiguities (project_id, content, status, source, terms)
+        SELECT ?, ?, 'detected', 'lexicon', ?
+        WHERE NOT EXISTS (SELECT 1 FROM ambiguities WHERE project_id = ? AND content = ?)
+    ''', (project_id, content, json.dumps([f["term"] for f in findings]), project_id, content))
+    return cursor.rowcount > 0
+
+
+def rescan(db_path, project_id=None, batch_size=5000):
+    """Scan stored conversation history and record what it finds; returns counts."""
+    conn = sqlite3.connect(db_path)
+    query = 'SELECT id, project_id, user_message FROM conversation_history WHERE user_message IS NOT NULL'
+    params = ()
+    if project_id is not None:
+        query += ' AND project_id = ?'
+        params = (project_id,)
+    query += ' ORDER BY id'
+
+    counts = {"messages": 0, "flagged": 0, "inserted": 0}
+    started = time.perf_counter()
+    read = conn.cursor()
+    read.execute(query, params)
+    while True:
+        rows = read.fetchmany(batch_size)
+        if not rows:
+            break
+        with conn:
+            for _, pid, text in rows:
+                findings = detect(text)
+                counts["messages"] += 1
+                if findings:
+                    counts["flagged"] += 1
+                    counts["inserted"] += record(conn, pid, text, findings)
+    conn.close()
+    counts["seconds"] = round(time.perf_counter() - started, 3)
+    log.info("ambiguity.rescan", db=db_path, project_id=project_id, **counts)
+    return counts
+
+
+def main():
+    from common.log import configure_logging
+
+    parser = argparse.ArgumentParser(description="Rescan stored conversation history for vague wording")
+    parser.add_argument("--db", default="requirements.db")
+    parser.add_argument("--project", type=int, default=None, help="only this project")
+    args = parser.parse_args()
+    configure_logging()
+
+    from database.setup import init_database
+    init_database(args.db)
+    rescan(args.db, args.project)
+
+
+if __name__ == "__main__":
+    main()
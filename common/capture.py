@@ -0,0 +1,120 @@
+# common/capture.py
+# Optional traffic capture for replaying real sessions (benchmarks/replay.py).
+#
+#   CAPTURE_DIR=/var/tmp/reqbot-capture python backend/app.py
+#   CAPTURE_DIR=/var/tmp/reqbot-capture rasa run actions
+#
+# When CAPTURE_DIR is set, the backend records every /api/chat request and
+# response with its arrival time and duration, and the action server records
+# the payload it sent to Ollama together with the reply and Ollama's timing
+# fields. Records from both sides share the chat turn's trace_id.
+#
+# Each process appends newline-delimited JSON to its own file per day
+# (<service>-YYYYMMDD.ndjson), so files never need locking and a "day of
+# traffic" is simply a pair of files. Writes happen on a background thread;
+# if the queue fills up, records are dropped rather than slowing requests.
+
+import glob
+import gzip
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from common import metrics
+from common.log import get_logger
+
+log = get_logger("capture")
+
+CAPTURE_RECORDS = metrics.counter(
+    "capture_records_total", "Traffic capture records by outcome", ["service", "outcome"])
+
+
+class Capture:
+    """Appends capture records for one service to CAPTURE_DIR."""
+
+    def __init__(self, service, directory=None, max_queue=10000):
+        self.service = service
+        self.directory = directory if directory is not None else os.environ.get("CAPTURE_DIR")
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._writer = None
+        self._writer_lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self.directory)
+
+    def record(self, kind, ts=None, **fields):
+        """Queue one record. `ts` defaults to now (epoch seconds)."""
+        if not self.directory:
+            return
+        entry = {"type": kind, "service": self.service, "ts": ts if ts is not None else time.time()}
+        entry.update(fields)
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            CAPTURE_RECORDS.inc(service=self.service, outcome="dropped")
+            log.warning("capture.dropped", sample=0.01, service=self.service)
+            return
+        if self._writer is None:
+            with self._writer_lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(
+                        target=self._write_loop, name=f"capture-{self.service}", daemon=True)
+                    self._writer.start()
+
+    def _path_for(self, ts):
+        day = datetime.fromtimestamp(ts).strftime("%Y%m%d")
+        return os.path.join(self.directory, f"{self.service}-{day}.ndjson")
+
+    def _write_loop(self):
+        while True:
+            entries = [self._queue.get()]
+            while True:
+                try:
+                    entries.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._write(entries)
+
+    def _write(self, entries):
+        by_path = {}
+        for entry in entries:
+            line = json.dumps(entry, default=str, ensure_ascii=False, separators=(",", ":"))
+            by_path.setdefault(self._path_for(entry["ts"]), []).append(line)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            for path, lines in by_path.items():
+                with open(path, "a", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n")
+            CAPTURE_RECORDS.inc(len(entries), service=self.service, outcome="written")
+        except OSError as e:
+            CAPTURE_RECORDS.inc(len(entries), service=self.service, outcome="dropped")
+            log.warning("capture.write_failed", count=len(entries), error=str(e))
+
+
+def read_capture(paths, kind=None):
+    """
+    Yield records from capture files (plain or .gz; directories and globs
+    are expanded), optionally only those of one type. A truncated last
+    line, e.g. from a process killed mid-write, is skipped.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "*.ndjson*"))))
+        else:
+            files.extend(sorted(glob.glob(path)) or [path])
+
+    for path in files:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if kind is None or entry.get("type") == kind:
+                    yield entry
@@ -0,0 +1,337 @@
+# common/contradictions.py
+# Checks each new requirement against the rest of its project without an
+# LLM call, so conflicts far apart in the conversation are still caught.
+#
+#   findings = check_requirement(conn, project_id, requirement_id, content, values)
+#   record(conn, project_id, requirement_id, findings)
+#
+# Two checks:
+#
+#   interval   the requirement's extracted values (common/quantities.py)
+#              against the project's values with the same subject and unit:
+#              "budget is $50,000" and "budget is $80,000", "launch by March
+#              2025" and "deadline is June 2025", "at least 1000 concurrent
+#              users" and "up to 200 concurrent users" cannot all hold
+#   polarity   the requirement's text against every earlier requirement's:
+#              a near-identical statement with the opposite polarity ("must
+#              work offline" / "does not need to work offline", "login is
+#              optional" / "login is required")
+#
+# For the polarity check each requirement is a hashed bag of content words
+# (stopwords and negations dropped, antonyms folded onto one word) plus a
+# polarity sign; the project's vectors are kept in memory as one NumPy
+# matrix, extended with the rows added since the last check, so a check is
+# one matrix-vector product however many requirements the project has.
+# Rows deleted after they were loaded are dropped when a check meets them.
+
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import date, timedelta
+from functools import lru_cache
+
+import numpy as np
+
+from common import metrics
+from common.log import get_logger
+
+log = get_logger("contradictions")
+
+CONTRADICTIONS_FOUND = metrics.counter(
+    "contradictions_found_total", "Contradictions found by the local checks", ["check"])
+
+# Subjects whose values must agree across a project; per-feature figures
+# (response times, counts of stores or languages) legitimately differ
+CHECKED_SUBJECTS = ("budget", "deadline", "timeline", "team_size", "users", "concurrent_users", "uptime")
+
+DIMENSIONS = 512
+# Cosine similarity above which two requirements say the same thing
+SIMILARITY = 0.8
+# Content words a requirement needs before the polarity check applies
+MIN_WORDS = 2
+MAX_FINDINGS = 3
+# Similar opposite-polarity requirements whose negations are compared word by word
+MAX_CANDIDATES = 20
+# Projects whose vectors are kept in memory
+CACHED_PROJECTS = 16
+
+STOPWORDS = frozenset("""
+    a an the and or of to for in on at by with from as is are be been being it its this that these those
+    should shall must will would can could may might need needs needed has have having do does
+    system application app user users able also all any each every some such which who
+    we our they their there then than so very just only when while if into via per
+""".split())
+
+_NEGATION = re.compile(
+    r"\b(?:not|never|without|cannot|can't|won't|don't|doesn't|shouldn't|mustn't|isn't|aren't|wasn't|"
+    r"needn't|nor|no)\b")
+# "No more than 5 s" is a limit, not a negation
+_NOT_NEGATION = re.compile(r"\bno (?:more|less|later|earlier|fewer) than\b|\bnot exceed")
+
+# Opposite word groups, folded onto the first word; words of the second
+# group flip polarity ("optional" reads as "not required")
+ANTONYMS = [
+    ("online", "offline"),
+    ("required mandatory compulsory", "optional"),
+    ("enable enabled", "disable disabled"),
+    ("allow allowed permit permitted", "forbid forbidden prohibit prohibited disallow disallowed"),
+    ("include included", "exclude excluded"),
+    ("public", "private"),
+    ("encrypted", "unencrypted plaintext"),
+    ("automatic automated automatically", "manual manually"),
+    ("accept accepted", "reject rejected"),
+    ("visible shown", "hidden"),
+    ("synchronous", "asynchronous"),
+    ("free", "paid"),
+]
+FOLD = {}
+for positive, negative in ANTONYMS:
+    canonical = positive.split()[0]
+    FOLD.update({word: (canonical, 1) for word in positive.split()})
+    FOLD.update({word: (canonical, -1) for word in negative.split()})
+
+_WORD = re.compile(r"[a-z][a-z0-9']*")
+# A negation covers the next few content words of its clause
+_CLAUSE = re.compile(r"[,.;:!?()]|\b(?:and|but|which|because|while|although|whereas|so)\b")
+NEGATION_SCOPE = 4
+
+
+# ============================================
+# VECTORS
+# ============================================
+
+def _stem(word):
+    # Plurals only: "reports" and "report" must meet, nothing fancier
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+@lru_cache(maxsize=65536)
+def _bucket(word):
+    # crc32, not hash(): the same word must land in the same column in every process
+    return zlib.crc32(word.encode()) % DIMENSIONS
+
+
+def terms(text):
+    """(content words, words under a negation, polarity) of a requirement's text."""
+    lowered = _NOT_NEGATION.sub(" ", text.lower().replace("’", "'"))
+    words, negated = [], set()
+    polarity = 1
+    for clause in _CLAUSE.split(lowered):
+        scope = 0
+        for word in _WORD.findall(clause):
+            if _NEGATION.fullmatch(word):
+                polarity, scope = -polarity, NEGATION_SCOPE
+                continue
+            if word in STOPWORDS:
+                continue
+            word, sign = FOLD.get(word, (word, 1))
+            word = _stem(word)
+            if sign < 0:
+                polarity = -polarity
+                negated.add(word)
+            if scope:
+                negated.add(word)
+                scope -= 1
+            words.append(word)
+    return words, negated, polarity
+
+
+def embed(text):
+    """(unit vector, polarity, content word count) for a requirement's text."""
+    words, _, polarity = terms(text)
+    vector = np.zeros(DIMENSIONS, dtype=np.float32)
+    for word in words:
+        vector[_bucket(word)] = 1.0
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm else vector), polarity, len(words)
+
+
+def negates_shared_content(a, b):
+    """
+    True if what one text negates and the other doesn't is mostly said by
+    both: "cannot pay by card" / "can pay by card", but not "export reports
+    without extra work" / "export reports".
+    """
+    words_a, negated_a, _ = terms(a)
+    words_b, negated_b, _ = terms(b)
+    differing = negated_a ^ negated_b
+    shared = set(words_a) & set(words_b)
+    return bool(differing) and 2 * len(differing & shared) >= len(differing)
+
+
+class ProjectVectors:
+    """One project's requirement vectors, grown with the rows added since the last refresh."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.last_id = 0
+        self.count = 0
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.matrix = np.zeros((0, DIMENSIONS), dtype=np.float32)
+        self.polarity = np.zeros(0, dtype=np.int8)
+
+    def refresh(self, conn, project_id):
+        rows = conn.execute('SELECT id, content FROM requirements WHERE project_id = ? AND id > ? ORDER BY id',
+                            (project_id, self.last_id)).fetchall()
+        if not rows:
+            return
+        needed = self.count + len(rows)
+        if needed > len(self.ids):
+            capacity = max(needed, 2 * len(self.ids), 64)
+            self.ids = np.resize(self.ids, capacity)
+            self.polarity = np.resize(self.polarity, capacity)
+            matrix = np.zeros((capacity, DIMENSIONS), dtype=np.float32)
+            matrix[:self.count] = self.matrix[:self.count]
+            self.matrix = matrix
+        for requirement_id, content in rows:
+            vector, polarity, words = embed(content or "")
+            self.ids[self.count] = requirement_id
+            self.matrix[self.count] = vector if words >= MIN_WORDS else 0.0
+            self.polarity[self.count] = polarity
+            self.count += 1
+        self.last_id = rows[-1][0]
+
+    def forget(self, requirement_id):
+        """Stop matching a requirement that no longer exists."""
+        self.matrix[:self.count][self.ids[:self.count] == requirement_id] = 0.0
+
+    def opposites(self, requirement_id, content):
+        """Earlier requirements saying the same as `content` with the opposite polarity, most similar first."""
+        vector, polarity, words = embed(content)
+        if words < MIN_WORDS or not self.count:
+            return []
+        similarity = self.matrix[:self.count] @ vector
+        hits = np.flatnonzero((similarity >= SIMILARITY) & (self.polarity[:self.count] != polarity)
+                              & (self.ids[:self.count] != requirement_id))
+        hits = hits[np.argsort(-similarity[hits])][:MAX_CANDIDATES]
+        return [(int(self.ids[i]), float(similarity[i])) for i in hits]
+
+
+_projects = OrderedDict()
+_projects_lock = threading.Lock()
+
+
+def project_vectors(project_id):
+    with _projects_lock:
+        vectors = _projects.pop(project_id, None) or ProjectVectors()
+        _projects[project_id] = vectors
+        while len(_projects) > CACHED_PROJECTS:
+            _projects.popitem(last=False)
+        return vectors
+
+
+# ============================================
+# INTERVALS
+# ============================================
+
+def _period_end(start, granularity):
+    day = date.fromisoformat(start)
+    if granularity == "day":
+        return start
+    if granularity == "year":
+        return f"{day.year}-12-31"
+    months = 3 if granularity == "quarter" else 1
+    month = day.month + months
+    following = date(day.year + (month - 1) // 12, (month - 1) % 12 + 1, 1)
+    return (following - timedelta(days=1)).isoformat()
+
+
+def interval(value):
+    """(low, high) a value allows; None = unbounded. Dates compare as ISO strings."""
+    if value["kind"] == "date":
+        low, high = value["date_value"], _period_end(value["date_value"], value["unit"])
+    else:
+        low = high = value["value"]
+    if value["comparator"] == "<=":
+        return None, high
+    if value["comparator"] == ">=":
+        return low, None
+    return low, high
+
+
+def disjoint(a, b):
+    (a_low, a_high), (b_low, b_high) = a, b
+    return ((a_high is not None and b_low is not None and a_high < b_low)
+            or (b_high is not None and a_low is not None and b_high < a_low))
+
+
+def interval_conflicts(conn, project_id, requirement_id, values):
+    """(value, conflicting stored value row) pairs for the new requirement's values."""
+    conflicts = []
+    for value in values:
+        if value["subject"] not in CHECKED_SUBJECTS:
+            continue
+        rows = conn.execute('''
+            SELECT v.requirement_id, v.kind, v.comparator, v.value, v.unit, v.date_value, v.text, r.content
+            FROM requirement_values v LEFT JOIN requirements r ON r.id = v.requirement_id
+            WHERE v.project_id = ? AND v.subject = ? AND v.kind = ? AND v.unit IS ?
+              AND v.requirement_id IS NOT ?
+            ORDER BY v.id DESC
+        ''', (project_id, value["subject"], value["kind"], value["unit"], requirement_id)).fetchall()
+        new = interval({"kind": value["kind"], "comparator": value["comparator"], "value": value["value"],
+                        "unit": value["unit"], "date_value": value["date"]})
+        for row in rows:
+            old = interval({"kind": row[1], "comparator": row[2], "value": row[3], "unit": row[4],
+                            "date_value": row[5]})
+            if disjoint(new, old):
+                conflicts.append((value, row))
+                if len(conflicts) >= MAX_FINDINGS:
+                    return conflicts
+                break
+    return conflicts
+
+
+# ============================================
+# CHECK & RECORD
+# ============================================
+
+def check_requirement(conn, project_id, requirement_id, content, values=()):
+    """Findings for a newly stored requirement, as dicts with check, other_id and message."""
+    findings = []
+    for value, row in interval_conflicts(conn, project_id, requirement_id, values):
+        findings.append({
+            "check": "interval", "other_id": row[0],
+            "message": f'{value["subject"].replace("_", " ")}: "{value["text"]}" conflicts with "{row[6]}" '
+                       f'in requirement #{row[0]} ("{row[7]}")',
+        })
+
+    vectors = project_vectors(project_id)
+    with vectors.lock:
+        vectors.refresh(conn, project_id)
+        opposites = vectors.opposites(requirement_id, content or "")
+    polarity_findings = 0
+    for other_id, similarity in opposites:
+        row = conn.execute('SELECT content FROM requirements WHERE id = ?', (other_id,)).fetchone()
+        if row is None:
+            # Folded into another requirement (python -m common.dedupe --merge) since it was loaded
+            with vectors.lock:
+                vectors.forget(other_id)
+            continue
+        other = row[0] or ""
+        if not negates_shared_content(content, other):
+            continue
+        findings.append({
+            "check": "polarity", "other_id": other_id,
+            "message": f'"{content}" contradicts requirement #{other_id}: "{other}"',
+            "similarity": round(similarity, 3),
+        })
+        polarity_findings += 1
+        if polarity_findings >= MAX_FINDINGS:
+            break
+    for finding in findings:
+        CONTRADICTIONS_FOUND.inc(check=finding["check"])
+    return findings
+
+
+def record(conn, project_id, requirement_id, findings):
+    """Insert findings into contradictions as 'local' rows; returns the number inserted."""
+    conn.executemany('''
+        INSERT INTO contradictions (project_id, message, status, source, requirement_id, other_requirement_id)
+        VALUES (?, ?, 'flagged', 'local', ?, ?)
+    ''', [(project_id, f["message"], requirement_id, f["other_id"]) for f in findings])
+    return len(findings)
@@ -0,0 +1,279 @@
+# common/dedupe.py
+# Keeps repeated and rephrased requirements out of the requirements table.
+#
+#   duplicate = find_duplicate(conn, project_id, content)
+#   if duplicate:
+#       record_merge(conn, project_id, duplicate, content, req_type, priority)
+#   else:
+#       ... INSERT INTO requirements (..., content_hash) ... ON CONFLICT DO NOTHING
+#       index_requirement(conn, project_id, requirement_id, content)
+#
+# Exact duplicates: content_hash is a hash of the normalised text
+# (lowercase, punctuation and articles dropped), unique per project, so
+# "The system shall send reminders." and "system shall send reminders"
+# are one requirement, enforced by SQLite.
+#
+# Near duplicates ("An admin dashboard with daily statistics" / "Admin
+# dashboard showing daily statistics"): each requirement's set of content
+# words gets a MinHash signature, stored as BANDS band keys in
+# requirement_minhash. Requirements sharing a band key are candidates; a
+# candidate is a duplicate when the word sets' Jaccard similarity is at
+# least NEAR_DUPLICATE, with the same numbers and the same negations, so
+# "$50,000" vs "$80,000" or "can" vs "cannot" are never merged. The lookup
+# is a handful of index probes, whatever the project size.
+#
+# Merged statements go to requirement_merges, pointing at the requirement
+# they were folded into.
+#
+# Requirements stored before this module need a one-off upgrade step,
+# which hashes and indexes them. Exact duplicates among them are only
+# counted; folding them deletes rows, so it takes --merge and makes a
+# backup first:
+#
+#   python -m common.dedupe --db requirements.db            # hash, count duplicates
+#   python -m common.dedupe --db requirements.db --merge    # hash, fold duplicates
+
+import argparse
+import hashlib
+import re
+import sqlite3
+import time
+import zlib
+from functools import lru_cache
+
+from common import metrics
+from common.log import get_logger
+
+log = get_logger("dedupe")
+
+REQUIREMENTS_MERGED = metrics.counter(
+    "requirements_merged_total", "Requirements folded into an existing one", ["kind"])
+
+# Jaccard similarity of content words above which two requirements are one
+NEAR_DUPLICATE = 0.8
+# MinHash signature: BANDS bands of ROWS values; with 8 x 4, pairs at
+# Jaccard 0.8 share a band 98% of the time, pairs at 0.3 6% of the time
+BANDS = 8
+ROWS = 4
+# Candidates checked per lookup, most shared bands first
+MAX_CANDIDATES = 10
+
+_PRIME = (1 << 61) - 1
+# (a * h + b) mod _PRIME with a, b spread over the whole field, or the
+# minimum would just follow the smallest h
+_SEEDS = [tuple(int.from_bytes(hashlib.blake2b(b"%s%d" % (name, i), digest_size=8).digest(), "big") % _PRIME
+                for name in (b"a", b"b"))
+          for i in range(BANDS * ROWS)]
+
+_WORD = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+ARTICLES = frozenset(["a", "an", "the"])
+STOPWORDS = ARTICLES | frozenset("""
+    and or of to for in on at by with from as is are be been being it its this that these those
+    should shall must will would can could may might need needs has have do does
+    system application app user users able also all any each every some such which who
+    we our they their there then than so very just only when while if into via per
+""".split())
+NEGATIONS = frozenset("not never without cannot can't won't don't doesn't shouldn't mustn't isn't aren't "
+                      "needn't nor no".split())
+
+
+def normalize(text):
+    """Lowercase words without punctuation or articles: the text content_hash is taken of."""
+    return " ".join(w for w in _WORD.findall((text or "").lower().replace("’", "'")) if w not in ARTICLES)
+
+
+def content_hash(text):
+    return hashlib.blake2b(normalize(text).encode(), digest_size=16).hexdigest()
+
+
+def _stem(word):
+    # Plurals only, as in common/contradictions.py
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith(("sses", "shes", "ches", "xes")):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def features(text):
+    """(content words, numbers, negation count parity) compared for near duplicates."""
+    words = _WORD.findall((text or "").lower().replace("’", "'"))
+    content = frozenset(_stem(w) for w in words if w not in STOPWORDS and w not in NEGATIONS)
+    numbers = frozenset(n.replace(",", "") for n in _NUMBER.findall(text or ""))
+    negated = sum(1 for w in words if w in NEGATIONS) % 2
+    return content, numbers, negated
+
+
+@lru_cache(maxsize=65536)
+def _word_hashes(word):
+    h = zlib.crc32(word.encode())
+    return tuple((a * h + b) % _PRIME for a, b in _SEEDS)
+
+
+def band_keys(words):
+    """BANDS signed 64-bit keys of the MinHash signature of a word set."""
+    if not words:
+        return []
+    signature = list(map(min, zip(*map(_word_hashes, words))))
+    keys = []
+    for band in range(BANDS):
+        key = band
+        for value in signature[band * ROWS:(band + 1) * ROWS]:
+            key = (key * _PRIME + value) % (1 << 64)
+        keys.append(key - (1 << 64) if key >= 1 << 63 else key)
+    return keys
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+# ============================================
+# LOOKUP & INSERT
+# ============================================
+
+def find_duplicate(conn, project_id, content):
+    """
+    The requirement `content` repeats, as {"id", "kind", "similarity"}
+    (kind "exact" or "near"), or None.
+    """
+    row = conn.execute('SELECT id FROM requirements WHERE project_id = ? AND content_hash = ?',
+                       (project_id, content_hash(content))).fetchone()
+    if row:
+        return {"id": row[0], "kind": "exact", "similarity": 1.0}
+
+    words, numbers, negated = features(content)
+    keys = band_keys(words)
+    if not keys:
+        return None
+    candidates = conn.execute(f'''
+        SELECT m.requirement_id, r.content FROM requirement_minhash m
+        JOIN requirements r ON r.id = m.requirement_id
+        WHERE m.project_id = ? AND m.band_key IN ({",".join("?" * len(keys))})
+        GROUP BY m.requirement_id ORDER BY COUNT(*) DESC, m.requirement_id LIMIT ?
+    ''', (project_id, *keys, MAX_CANDIDATES)).fetchall()
+    for requirement_id, other in candidates:
+        other_words, other_numbers, other_negated = features(other)
+        similarity = jaccard(words, other_words)
+        if similarity >= NEAR_DUPLICATE and numbers == other_numbers and negated == other_negated:
+            return {"id": requirement_id, "kind": "near", "similarity": round(similarity, 3)}
+    return None
+
+
+def index_requirement(conn, project_id, requirement_id, content):
+    """Store the band keys of a newly inserted requirement."""
+    conn.executemany('INSERT INTO requirement_minhash (project_id, band_key, requirement_id) VALUES (?, ?, ?)',
+                     [(project_id, key, requirement_id) for key in set(band_keys(features(content)[0]))])
+
+
+def record_merge(conn, project_id, duplicate, content, req_type=None, priority=None, source="action"):
+    """Record `content` as folded into the requirement `duplicate` points at."""
+    REQUIREMENTS_MERGED.inc(kind=duplicate["kind"])
+    conn.execute('''
+        INSERT INTO requirement_merges (project_id, requirement_id, content, req_type, priority,
+                                        kind, similarity, source)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (project_id, duplicate["id"], content, req_type, priority, duplicate["kind"],
+          duplicate["similarity"], source))
+
+
+# ============================================
+# MIGRATION
+# ============================================
+
+def _fold(conn, project_id, kept_id, requirement_id, content, req_type, priority):
+    """Fold stored requirement `requirement_id` into `kept_id` and delete it."""
+    record_merge(conn, project_id, {"id": kept_id, "kind": "exact", "similarity": 1.0},
+                 content, req_type, priority, source="migration")
+    conn.execute('UPDATE requirement_merges SET requirement_id = ? WHERE requirement_id = ?',
+                 (kept_id, requirement_id))
+    # Same text, so the kept row already has the same values
+    conn.execute('DELETE FROM requirement_values WHERE requirement_id = ?', (requirement_id,))
+    # A contradiction between the two copies would become one with itself
+    conn.execute('DELETE FROM contradictions WHERE (requirement_id = ? AND other_requirement_id = ?) '
+                 'OR (requirement_id = ? AND other_requirement_id = ?)',
+                 (requirement_id, kept_id, kept_id, requirement_id))
+    for column in ("requirement_id", "other_requirement_id"):
+        conn.execute(f'UPDATE contradictions SET {column} = ? WHERE {column} = ?', (kept_id, requirement_id))
+    # Both copies may have conflicted with the same requirement: keep the first finding
+    conn.execute('''
+        DELETE FROM contradictions WHERE id IN (
+            SELECT c.id FROM contradictions c JOIN contradictions d
+              ON d.id < c.id AND d.source IS c.source
+             AND min(d.requirement_id, d.other_requirement_id) = min(c.requirement_id, c.other_requirement_id)
+             AND max(d.requirement_id, d.other_requirement_id) = max(c.requirement_id, c.other_requirement_id)
+            WHERE ? IN (c.requirement_id, c.other_requirement_id))
+    ''', (kept_id,))
+    # Ambiguities name what they are about by its text
+    conn.execute('UPDATE ambiguities SET content = (SELECT content FROM requirements WHERE id = ?) '
+                 'WHERE project_id = ? AND content = ?', (kept_id, project_id, content))
+    conn.execute('DELETE FROM requirement_minhash WHERE requirement_id = ?', (requirement_id,))
+    conn.execute('DELETE FROM requirements WHERE id = ?', (requirement_id,))
+
+
+def migrate(conn, batch_size=5000, merge=False):
+    """
+    Hash and index requirements stored before deduplication. Exact
+    duplicates within a project keep a NULL hash unless `merge`, which
+    folds them into the oldest (lowest id) copy and records them in
+    requirement_merges. Returns counts.
+    """
+    counts = {"hashed": 0, "duplicates": 0, "merged": 0}
+    last_id = 0
+    while True:
+        rows = conn.execute('SELECT id, project_id, content, req_type, priority FROM requirements '
+                            'WHERE id > ? AND content_hash IS NULL ORDER BY id LIMIT ?',
+                            (last_id, batch_size)).fetchall()
+        if not rows:
+            break
+        for requirement_id, project_id, content, req_type, priority in rows:
+            digest = content_hash(content)
+            kept = conn.execute('SELECT id FROM requirements WHERE project_id = ? AND content_hash = ?',
+                                (project_id, digest)).fetchone()
+            if kept and merge:
+                _fold(conn, project_id, kept[0], requirement_id, content, req_type, priority)
+                counts["merged"] += 1
+            elif kept:
+                counts["duplicates"] += 1
+            else:
+                conn.execute('UPDATE requirements SET content_hash = ? WHERE id = ?', (digest, requirement_id))
+                index_requirement(conn, project_id, requirement_id, content)
+                counts["hashed"] += 1
+        last_id = rows[-1][0]
+        conn.commit()
+    if counts["duplicates"]:
+        log.warning("dedupe.duplicates_pending", duplicates=counts["duplicates"],
+                    hint="python -m common.dedupe --db <path> --merge")
+    if counts["hashed"] or counts["merged"]:
+        log.info("dedupe.migrated", **counts)
+    return counts
+
+
+def main():
+    from common.log import configure_logging
+
+    parser = argparse.ArgumentParser(description="Hash and index requirements stored before deduplication")
+    parser.add_argument("--db", default="requirements.db")
+    parser.add_argument("--merge", action="store_true",
+                        help="delete the duplicates (after a backup); without it, only count them")
+    parser.add_argument("--backup", help="backup path (default <db>.<timestamp>.bak)")
+    args = parser.parse_args()
+    configure_logging()
+
+    from database.setup import init_database
+    init_database(args.db)
+    conn = sqlite3.connect(args.db)
+    if args.merge:
+        backup = args.backup or f"{args.db}.{time.strftime('%Y%m%d-%H%M%S')}.bak"
+        with sqlite3.connect(backup) as target:
+            conn.backup(target)
+        log.info("dedupe.backup", path=backup)
+    print(migrate(conn, merge=args.merge))
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
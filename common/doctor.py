@@ -0,0 +1,209 @@
+# common/doctor.py
+# Dependency probes shared by `python database/setup.py` and the backend's
+# deep health check (/api/health?deep=1).
+#
+# Every probe returns a dict with at least name/ok/latency_ms, plus details
+# (model state for Ollama, integrity and size stats for SQLite) and a hint
+# on how to fix a failure. run_probes() runs them concurrently, so a dead
+# stack reports in one timeout instead of one timeout per dependency.
+
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+RASA_URL = "http://localhost:5005"
+ACTION_SERVER_URL = "http://localhost:5055"
+OLLAMA_URL = "http://localhost:11434"
+BACKEND_URL = "http://localhost:5000"
+OLLAMA_MODEL = "phi3:mini"
+PROBE_TIMEOUT = 3.0
+
+REQUIRED_TABLES = ['projects', 'requirements', 'ambiguities', 'contradictions', 'conversation_history']
+
+
+def _timed_get(url, timeout):
+    start = time.perf_counter()
+    response = requests.get(url, timeout=timeout)
+    return response, round((time.perf_counter() - start) * 1000, 1)
+
+
+def _failure(name, start, error, hint):
+    return {"name": name, "ok": False, "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+            "error": error, "hint": hint}
+
+
+def _model_matches(entry, model):
+    names = {entry.get("name"), entry.get("model")}
+    return model in names or (":" not in model and f"{model}:latest" in names)
+
+
+# ============================================
+# PROBES
+# ============================================
+
+def probe_rasa(url=RASA_URL, timeout=PROBE_TIMEOUT):
+    start = time.perf_counter()
+    try:
+        response, latency = _timed_get(f"{url}/", timeout)
+        response.raise_for_status()
+        result = {"name": "rasa", "ok": True, "latency_ms": latency, "version": response.text.strip()}
+    except requests.RequestException as e:
+        return _failure("rasa", start, str(e), "rasa run -m models --enable-api --port 5005")
+
+    # /status is only served with --enable-api; report the loaded model when available
+    try:
+        status = requests.get(f"{url}/status", timeout=timeout)
+        if status.ok:
+            result["model_id"] = status.json().get("model_id")
+    except (requests.RequestException, ValueError):
+        pass
+    return result
+
+
+def probe_action_server(url=ACTION_SERVER_URL, timeout=PROBE_TIMEOUT):
+    start = time.perf_counter()
+    try:
+        response, latency = _timed_get(f"{url}/health", timeout)
+        response.raise_for_status()
+        return {"name": "action_server", "ok": True, "latency_ms": latency}
+    except requests.RequestException as e:
+        return _failure("action_server", start, str(e), "rasa run actions")
+
+
+def probe_ollama(url=OLLAMA_URL, model=OLLAMA_MODEL, timeout=PROBE_TIMEOUT):
+    """Installed models via GET /api/tags, resident (loaded) models via GET /api/ps."""
+    start = time.perf_counter()
+    try:
+        response, latency = _timed_get(f"{url}/api/tags", timeout)
+        response.raise_for_status()
+        installed = response.json().get("models", [])
+    except (requests.RequestException, ValueError) as e:
+        return _failure("ollama", start, str(e), "ollama serve")
+
+    result = {
+        "name": "ollama",
+        "ok": any(_model_matches(m, model) for m in installed),
+        "latency_ms": latency,
+        "model": model,
+        "installed": [m.get("name") for m in installed],
+    }
+    if not result["ok"]:
+        result["error"] = f"{model} is not installed"
+        result["hint"] = f"ollama pull {model}"
+
+    try:
+        ps = requests.get(f"{url}/api/ps", timeout=timeout).json().get("models", [])
+        loaded = next((m for m in ps if _model_matches(m, model)), None)
+        result["loaded"] = [m.get("name") for m in ps]
+        result["resident"] = loaded is not None
+        if loaded:
+            result["expires_at"] = loaded.get("expires_at")
+            result["size_vram"] = loaded.get("size_vram")
+    except (requests.RequestException, ValueError):
+        result["resident"] = None
+    return result
+
+
+def probe_backend(url=BACKEND_URL, timeout=PROBE_TIMEOUT):
+    start = time.perf_counter()
+    try:
+        response, latency = _timed_get(f"{url}/api/health", timeout)
+        response.raise_for_status()
+        return {"name": "backend", "ok": True, "latency_ms": latency}
+    except requests.RequestException as e:
+        return _failure("backend", start, str(e), "python backend/app.py")
+
+
+def probe_database(db_path, full_integrity=False):
+    """
+    Schema, integrity and size stats. PRAGMA quick_check by default;
+    full_integrity=True runs the slower integrity_check (also verifies indexes).
+    """
+    start = time.perf_counter()
+    if not os.path.exists(db_path):
+        return _failure("database", start, f"{db_path} not found", "python database/setup.py")
+
+    try:
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, timeout=5)
+        tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+        missing = [t for t in REQUIRED_TABLES if t not in tables]
+        integrity = conn.execute("PRAGMA integrity_check" if full_integrity else "PRAGMA quick_check").fetchone()[0]
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        rows = {t: conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+                for t in REQUIRED_TABLES if t in tables}
+        conn.close()
+    except sqlite3.Error as e:
+        return _failure("database", start, str(e), "check file permissions or restore a backup")
+
+    result = {
+        "name": "database",
+        "ok": not missing and integrity == "ok",
+        "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+        "path": db_path,
+        "integrity": integrity,
+        "size_bytes": page_size * page_count,
+        "free_bytes": page_size * freelist,
+        "journal_mode": journal_mode,
+        "rows": rows,
+    }
+    if missing:
+        result["error"] = f"missing tables: {', '.join(missing)}"
+        result["hint"] = "python database/setup.py"
+    elif integrity != "ok":
+        result["error"] = f"integrity check failed: {integrity}"
+        result["hint"] = "restore a backup or run .recover in the sqlite3 shell"
+    return result
+
+
+# ============================================
+# RUNNING
+# ============================================
+
+def default_probes(db_path, include_backend=True, timeout=PROBE_TIMEOUT, full_integrity=False):
+    probes = [
+        lambda: probe_rasa(timeout=timeout),
+        lambda: probe_action_server(timeout=timeout),
+        lambda: probe_ollama(timeout=timeout),
+        lambda: probe_database(db_path, full_integrity),
+    ]
+    if include_backend:
+        probes.insert(3, lambda: probe_backend(timeout=timeout))
+    return probes
+
+
+def run_probes(probes):
+    """Run all probes concurrently; results keep the order of `probes`."""
+    with ThreadPoolExecutor(max_workers=len(probes)) as pool:
+        return list(pool.map(lambda probe: probe(), probes))
+
+
+class CachedHealth:
+    """
+    Serves probe results for at most `ttl` seconds before re-probing, so
+    frequent deep health checks cost one probe round per ttl. Concurrent
+    callers during a refresh wait for the same round instead of starting
+    their own.
+    """
+
+    def __init__(self, probes, ttl=10.0):
+        self.probes = probes
+        self.ttl = ttl
+        self._results = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            age = time.monotonic() - self._checked_at
+            if self._results is None or age >= self.ttl:
+                self._results = run_probes(self.probes)
+                self._checked_at = time.monotonic()
+                age = 0.0
+            return self._results, age
@@ -0,0 +1,126 @@
+# common/embeddings.py
+# Text embeddings for requirements. EMBEDDER picks where they come from:
+#
+#   hashing                (default) signed feature hashing of words and word
+#                          pairs into EMBED_DIMENSIONS columns: offline,
+#                          deterministic, what tests and benchmarks use
+#   ollama                 a local Ollama's /api/embed (EMBED_URL) with
+#                          EMBED_MODEL, e.g. nomic-embed-text
+#   package.module:Class   any local model wrapped in a class with `name`,
+#                          `dimensions` and `embed(texts)`
+#
+#   embedder = get_embedder()
+#   vectors = embedder.embed(["Users can export reports", ...])  # (n, d) float32, unit rows
+#   blob = to_blob(vectors[0])                                   # float16 bytes for requirements.embedding
+#
+# Every stored embedding is tagged with the embedder's name, so switching
+# models never mixes vectors from two of them in one search.
+
+import importlib
+import os
+import re
+import threading
+import zlib
+from functools import lru_cache
+
+import numpy as np
+import requests
+
+from common import metrics
+from common.dedupe import STOPWORDS
+from common.log import get_logger
+
+log = get_logger("embeddings")
+
+EMBEDDINGS_COMPUTED = metrics.counter("embeddings_computed_total", "Texts embedded", ["embedder"])
+
+EMBEDDER = os.environ.get("EMBEDDER", "hashing")
+EMBED_DIMENSIONS = int(os.environ.get("EMBED_DIMENSIONS", "384"))
+EMBED_URL = os.environ.get("EMBED_URL", "http://localhost:11434")
+EMBED_MODEL = os.environ.get("EMBED_MODEL", "nomic-embed-text")
+EMBED_TIMEOUT = 30
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def normalize_rows(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def to_blob(vector):
+    return np.asarray(vector, dtype=np.float16).tobytes()
+
+
+def from_blob(blob):
+    return np.frombuffer(blob, dtype=np.float16)
+
+
+# ============================================
+# EMBEDDERS
+# ============================================
+
+class HashingEmbedder:
+    """Words and adjacent word pairs hashed into signed columns; no model needed."""
+
+    def __init__(self, dimensions=EMBED_DIMENSIONS):
+        self.dimensions = dimensions
+        self.name = f"hashing-{dimensions}"
+
+    @lru_cache(maxsize=65536)
+    def _feature(self, feature):
+        h = zlib.crc32(feature.encode())
+        return h % self.dimensions, 1.0 if h & 0x80000000 else -1.0
+
+    def embed(self, texts):
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = [w[:-1] if len(w) > 3 and w.endswith("s") and not w.endswith("ss") else w
+                     for w in _WORD.findall((text or "").lower()) if w not in STOPWORDS]
+            for feature, weight in [(w, 1.0) for w in words] + [(f"{a} {b}", 0.5) for a, b in zip(words, words[1:])]:
+                column, sign = self._feature(feature)
+                vectors[row, column] += sign * weight
+        EMBEDDINGS_COMPUTED.inc(len(texts), embedder="hashing")
+        return normalize_rows(vectors)
+
+
+class OllamaEmbedder:
+    """Batches texts through a local Ollama's /api/embed."""
+
+    def __init__(self, url=EMBED_URL, model=EMBED_MODEL, timeout=EMBED_TIMEOUT):
+        self.url = url.rstrip("/")
+        self.model = model
+        self.timeout = timeout
+        self.name = f"ollama:{model}"
+        self.dimensions = None
+        self.session = requests.Session()
+
+    def embed(self, texts):
+        response = self.session.post(f"{self.url}/api/embed", json={"model": self.model, "input": list(texts)},
+                                     timeout=self.timeout)
+        response.raise_for_status()
+        vectors = normalize_rows(response.json()["embeddings"])
+        self.dimensions = vectors.shape[1]
+        EMBEDDINGS_COMPUTED.inc(len(texts), embedder="ollama")
+        return vectors
+
+
+_embedders = {}
+_embedders_lock = threading.Lock()
+
+
+def get_embedder(spec=None):
+    """The embedder named by `spec` (default EMBEDDER), created once per process."""
+    spec = spec or EMBEDDER
+    with _embedders_lock:
+        if spec not in _embedders:
+            if spec == "hashing":
+                _embedders[spec] = HashingEmbedder()
+            elif spec == "ollama":
+                _embedders[spec] = OllamaEmbedder()
+            else:
+                module, _, attribute = spec.partition(":")
+                _embedders[spec] = getattr(importlib.import_module(module), attribute)()
+            log.info("embeddings.embedder", spec=spec, name=_embedders[spec].name)
+        return _embedders[spec]
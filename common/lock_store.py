@@ -0,0 +1,148 @@
+# common/lock_store.py
+# Rasa lock store on a SQLite file, so several Rasa processes can serve one
+# deployment without Redis.
+#
+#   lock_store:                             # endpoints.yml
+#     type: common.lock_store.SQLiteLockStore
+#     db: locks.db
+#     poll_interval: 0.05
+#
+# Rasa serialises the messages of a conversation with ticket locks: every
+# incoming message takes the next ticket number and waits until it holds
+# the lowest live ticket. Rasa's base LockStore changes a lock with
+# separate get and save calls, which is only safe inside one process. Here
+# every change - issuing a ticket, dropping expired ones, finishing one -
+# is a single BEGIN IMMEDIATE transaction, so tickets are handed out in
+# arrival order across processes and none is lost.
+#
+# Waiting messages re-check every poll_interval seconds rather than Rasa's
+# default of once a second. Tickets still expire after TICKET_LOCK_LIFETIME
+# seconds (60 by default), which must stay above the slowest turn. Lock
+# operations are short synchronous transactions, like Rasa's Redis store.
+#
+# The locks live in their own database file, in WAL mode with
+# synchronous=NORMAL: commits don't wait for an fsync, and a crash can
+# lose the last lock writes but never corrupt the file, let alone the
+# project database.
+
+import json
+import sqlite3
+from contextlib import asynccontextmanager, contextmanager
+
+from rasa.core.lock import TicketLock
+from rasa.core.lock_store import LOCK_LIFETIME, LockError, LockStore
+
+
+class SQLiteLockStore(LockStore):
+    """Ticket locks in the rasa_locks table, safe to share between processes."""
+
+    def __init__(self, endpoint_config=None, db="locks.db", poll_interval=0.05, timeout=10.0):
+        config = endpoint_config.kwargs if endpoint_config else {}
+        self.db_path = (endpoint_config.url if endpoint_config else None) or config.get("db", db)
+        self.poll_interval = float(config.get("poll_interval", poll_interval))
+        self.timeout = float(config.get("timeout", timeout))
+        self._conn = None
+        self._connection().execute('''
+            CREATE TABLE IF NOT EXISTS rasa_locks (
+                conversation_id TEXT PRIMARY KEY,
+                lock_data TEXT NOT NULL,
+                updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        super().__init__()
+
+    def _connection(self):
+        # One autocommit connection per store: waiters poll several times a
+        # second, and reconnecting each time costs more than the query
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, timeout=self.timeout, isolation_level=None,
+                                         check_same_thread=False)
+            # No fsync per commit, without risking corruption on a crash
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.execute("PRAGMA synchronous = NORMAL")
+        return self._conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @staticmethod
+    def _load(conn, conversation_id):
+        row = conn.execute('SELECT lock_data FROM rasa_locks WHERE conversation_id = ?',
+                           (conversation_id,)).fetchone()
+        return TicketLock.from_dict(json.loads(row[0])) if row else None
+
+    @staticmethod
+    def _store(conn, lock):
+        conn.execute('''
+            INSERT INTO rasa_locks (conversation_id, lock_data) VALUES (?, ?)
+            ON CONFLICT(conversation_id) DO UPDATE SET lock_data = excluded.lock_data, updated = CURRENT_TIMESTAMP
+        ''', (lock.conversation_id, lock.dumps()))
+
+    # ---------- storage primitives ----------
+
+    def get_lock(self, conversation_id):
+        return self._load(self._connection(), conversation_id)
+
+    def save_lock(self, lock):
+        with self._transaction() as conn:
+            self._store(conn, lock)
+
+    def delete_lock(self, conversation_id):
+        with self._transaction() as conn:
+            deleted = conn.execute('DELETE FROM rasa_locks WHERE conversation_id = ?', (conversation_id,)).rowcount
+        self._log_deletion(conversation_id, deleted > 0)
+
+    # ---------- atomic read-modify-write ----------
+
+    def issue_ticket(self, conversation_id, lock_lifetime=LOCK_LIFETIME):
+        try:
+            with self._transaction() as conn:
+                lock = self._load(conn, conversation_id) or self.create_lock(conversation_id)
+                ticket = lock.issue_ticket(lock_lifetime)
+                self._store(conn, lock)
+            return ticket
+        except Exception as e:
+            raise LockError(f"Error while acquiring lock. Error:\n{e}")
+
+    def update_lock(self, conversation_id):
+        # Called on every poll of every waiter: only take the write lock when
+        # there is an expired ticket to drop
+        lock = self.get_lock(conversation_id)
+        if not lock or not any(ticket.has_expired() for ticket in lock.tickets):
+            return
+        with self._transaction() as conn:
+            lock = self._load(conn, conversation_id)
+            if lock:
+                lock.remove_expired_tickets()
+                self._store(conn, lock)
+
+    def finish_serving(self, conversation_id, ticket_number):
+        with self._transaction() as conn:
+            lock = self._load(conn, conversation_id)
+            if lock:
+                lock.remove_ticket_for(ticket_number)
+                self._store(conn, lock)
+
+    def cleanup(self, conversation_id, ticket_number):
+        with self._transaction() as conn:
+            lock = self._load(conn, conversation_id)
+            if lock:
+                lock.remove_ticket_for(ticket_number)
+                if lock.is_someone_waiting():
+                    self._store(conn, lock)
+                else:
+                    conn.execute('DELETE FROM rasa_locks WHERE conversation_id = ?', (conversation_id,))
+
+    @asynccontextmanager
+    async def lock(self, conversation_id, lock_lifetime=LOCK_LIFETIME, wait_time_in_seconds=None):
+        async with super().lock(conversation_id, lock_lifetime,
+                                wait_time_in_seconds or self.poll_interval) as ticket_lock:
+            yield ticket_lock
@@ -0,0 +1,150 @@
+# common/log.py
+# Structured logging for the backend, action server and setup scripts.
+#
+#   log = get_logger("actions")
+#   log.info("ollama.request", model=OLLAMA_MODEL, phase=current_phase)
+#   log.debug("history.built", sample=0.1, messages=len(history))
+#
+# Every call is an event name plus key/value fields. Records are handed to a
+# QueueHandler, so the calling thread only pays for an enqueue; a background
+# QueueListener formats them (JSON by default, or key=value text) and writes
+# to stderr. Verbose events can be sampled, either per call (sample=0.1) or
+# per event name via configure_logging(sample_rates=...).
+#
+# LOG_LEVEL and LOG_FORMAT ("json" or "text") environment variables set the
+# defaults. Our loggers live under a "reqbot" parent that does not propagate,
+# so the root logger set up by Rasa/Flask is left alone.
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+
+ROOT_LOGGER = "reqbot"
+
+_configured = False
+_configure_lock = threading.Lock()
+_listener = None
+_sample_rates = {}
+
+
+def _short_name(name):
+    return name[len(ROOT_LOGGER) + 1:] if name.startswith(ROOT_LOGGER + ".") else name
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "logger": _short_name(record.name),
+            "event": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        ts = datetime.fromtimestamp(record.created).strftime("%H:%M:%S.%f")[:-3]
+        fields = " ".join(f"{k}={v}" for k, v in getattr(record, "fields", {}).items())
+        line = f"{ts} {record.levelname:<7} {_short_name(record.name):<8} {record.getMessage()}"
+        if fields:
+            line += " " + fields
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+
+class _FieldQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that keeps exception text but leaves formatting to the listener."""
+
+    def prepare(self, record):
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def configure_logging(level=None, fmt=None, sample_rates=None, stream=None):
+    """
+    Install the queue-based handler on the reqbot logger. Safe to call more
+    than once; only the first call installs handlers, later calls can still
+    update sample rates.
+    """
+    global _configured, _listener
+    if sample_rates:
+        _sample_rates.update(sample_rates)
+    with _configure_lock:
+        if _configured:
+            return
+        level = (level or os.environ.get("LOG_LEVEL", "INFO")).upper()
+        fmt = fmt or os.environ.get("LOG_FORMAT", "json")
+
+        output = logging.StreamHandler(stream or sys.stderr)
+        output.setFormatter(TextFormatter() if fmt == "text" else JsonFormatter())
+
+        log_queue = queue.SimpleQueue()
+        _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+        root = logging.getLogger(ROOT_LOGGER)
+        root.handlers = [_FieldQueueHandler(log_queue)]
+        root.setLevel(level)
+        root.propagate = False
+        _configured = True
+
+
+class StructLogger:
+    def __init__(self, name):
+        self._logger = logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+    def _log(self, level, event, sample=None, exc_info=False, **fields):
+        if not _configured:
+            configure_logging()
+        if not self._logger.isEnabledFor(level):
+            return
+        rate = _sample_rates.get(event, 1.0) if sample is None else sample
+        if rate < 1.0 and random.random() >= rate:
+            return
+        if rate < 1.0:
+            fields["sample_rate"] = rate
+        self._logger.log(level, event, exc_info=exc_info, extra={"fields": fields})
+
+    def debug(self, event, **fields):
+        self._log(logging.DEBUG, event, **fields)
+
+    def info(self, event, **fields):
+        self._log(logging.INFO, event, **fields)
+
+    def warning(self, event, **fields):
+        self._log(logging.WARNING, event, **fields)
+
+    def error(self, event, **fields):
+        self._log(logging.ERROR, event, **fields)
+
+    def exception(self, event, **fields):
+        self._log(logging.ERROR, event, exc_info=True, **fields)
+
+
+def get_logger(name):
+    """
+    Return a structured logger. Logging is configured with defaults on the
+    first log call unless configure_logging() was called before that.
+    """
+    return StructLogger(name)
@@ -0,0 +1,295 @@
+# common/pool.py
+# Client-side load balancing over several HTTP backends of the same kind.
+#
+#   pool = EndpointPool("ollama", ["http://gpu1:11434", "http://gpu2:11434"], health_path="/")
+#   with pool.acquire(key=sender_id) as endpoint:
+#       requests.post(f"{endpoint.url}/api/chat", ...)
+#
+# Requests go to the healthy endpoint with the lowest expected wait,
+# (in-flight + 1) x smoothed latency, so a slow node gets proportionally
+# less traffic. A key (e.g. the sender id) sticks to the endpoint it was
+# last sent to while that endpoint is healthy and its expected wait is
+# within `sticky_tolerance` of the best alternative; for Ollama this keeps a
+# conversation on the node that already holds its prompt cache.
+#
+# With strategy="hash" a key always maps to the same endpoint through a
+# consistent-hash ring (`replicas` virtual nodes per endpoint), whatever the
+# load - for Rasa, where a conversation's tracker lives on one node. When
+# that endpoint is ejected only its keys move, to the next endpoint on the
+# ring, and they move back once it recovers. The ring uses md5 rather than
+# hash() so every process maps a key the same way. Requests without a key
+# fall back to the least expected wait.
+#
+# Only errors that say the endpoint itself is unwell count as failures:
+# refused or dropped connections, timeouts and 5xx responses. A 4xx (model
+# not found), a reply that does not parse or a bug in the caller fails the
+# request but leaves the endpoint's record alone, so a bad payload cannot
+# eject every healthy node.
+# After `max_failures` consecutive failures an endpoint is ejected for
+# `cooldown` seconds (doubling on repeated ejections, up to max_cooldown);
+# once the cooldown is over, a single failure before the first success
+# ejects it again.
+# With health_path set, a background thread probes every endpoint each
+# health_interval: a failed probe counts as a failure, and an ejected
+# endpoint comes back as soon as it answers. If every endpoint is ejected,
+# the one due back first is used anyway rather than failing outright.
+#
+# drain() takes an endpoint out of rotation for a planned restart without
+# counting it as a failure: requests already sent to it finish, new ones go
+# elsewhere (hashed keys to the next endpoint on the ring) until undrain().
+
+import bisect
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import requests
+
+from common import metrics
+from common.log import get_logger
+
+log = get_logger("pool")
+
+POOL_REQUESTS = metrics.counter(
+    "pool_requests_total", "Requests sent through an endpoint pool", ["pool", "endpoint", "outcome"])
+POOL_IN_FLIGHT = metrics.gauge(
+    "pool_in_flight", "Requests currently open per pooled endpoint", ["pool", "endpoint"])
+POOL_EJECTIONS = metrics.counter(
+    "pool_ejections_total", "Times an endpoint was taken out of rotation", ["pool", "endpoint"])
+POOL_HEALTHY = metrics.gauge(
+    "pool_endpoint_healthy", "1 while an endpoint is in rotation", ["pool", "endpoint"])
+
+STRATEGIES = ("least_wait", "hash")
+
+
+def is_endpoint_failure(error):
+    """True if `error` says the endpoint is unwell: unreachable, timed out, stream dropped or a 5xx."""
+    if isinstance(error, requests.exceptions.HTTPError):
+        return error.response is None or error.response.status_code >= 500
+    return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                              requests.exceptions.ChunkedEncodingError))
+
+
+def _ring_hash(value):
+    return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+
+class Endpoint:
+    def __init__(self, url):
+        self.url = url.rstrip("/")
+        self.in_flight = 0
+        self.latency = None  # smoothed seconds per request
+        self.failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.draining = False
+
+    def healthy(self, now):
+        return not self.draining and now >= self.ejected_until
+
+    def expected_wait(self, default_latency):
+        return (self.in_flight + 1) * (self.latency or default_latency)
+
+
+class EndpointPool:
+
+    def __init__(self, name, urls, strategy="least_wait", max_failures=3, cooldown=10.0,
+                 max_cooldown=300.0, sticky_tolerance=1.5, max_sticky_keys=10000, smoothing=0.2,
+                 replicas=100, health_path=None, health_interval=5.0, health_timeout=2.0):
+        if not urls:
+            raise ValueError(f"{name} pool needs at least one endpoint")
+        if strategy not in STRATEGIES:
+            raise ValueError(f"unknown pool strategy {strategy!r}, expected one of {STRATEGIES}")
+        self.name = name
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.strategy = strategy
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.sticky_tolerance = sticky_tolerance
+        self.max_sticky_keys = max_sticky_keys
+        self.smoothing = smoothing
+        self.health_path = health_path
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self._sticky = OrderedDict()
+        self._lock = threading.Lock()
+        self._health_thread = None
+        ring = sorted((_ring_hash(f"{e.url}#{i}"), n)
+                      for n, e in enumerate(self.endpoints) for i in range(replicas))
+        self._ring_points = [point for point, _ in ring]
+        self._ring_owners = [self.endpoints[n] for _, n in ring]
+        for endpoint in self.endpoints:
+            POOL_HEALTHY.set(1, pool=self.name, endpoint=endpoint.url)
+
+    # ---------- selection ----------
+
+    def _default_latency(self):
+        known = [e.latency for e in self.endpoints if e.latency is not None]
+        return sum(known) / len(known) if known else 1.0
+
+    def ring_order(self, key):
+        """Distinct endpoints in the order the hash ring visits them for `key`."""
+        start = bisect.bisect(self._ring_points, _ring_hash(str(key)))
+        order = []
+        for i in range(len(self._ring_owners)):
+            endpoint = self._ring_owners[(start + i) % len(self._ring_owners)]
+            if endpoint not in order:
+                order.append(endpoint)
+                if len(order) == len(self.endpoints):
+                    break
+        return order
+
+    def pick(self, key=None, exclude=()):
+        """Choose an endpoint for one request and count it as in flight."""
+        hashed = self.strategy == "hash" and key is not None
+        with self._lock:
+            now = time.monotonic()
+            candidates = self.ring_order(key) if hashed else self.endpoints
+            candidates = [e for e in candidates if e not in exclude] or list(candidates)
+            healthy = [e for e in candidates if e.healthy(now)]
+            if not healthy:
+                # Everything is ejected: try the endpoint that is due back first
+                healthy = [min(candidates, key=lambda e: (e.draining, e.ejected_until))]
+
+            default = self._default_latency()
+            best = min(healthy, key=lambda e: e.expected_wait(default))
+            chosen = best
+            if hashed:
+                chosen = healthy[0]
+            elif key is not None:
+                sticky = self._sticky.get(key)
+                if sticky in healthy and \
+                        sticky.expected_wait(default) <= best.expected_wait(default) * self.sticky_tolerance:
+                    chosen = sticky
+                self._sticky[key] = chosen
+                self._sticky.move_to_end(key)
+                while len(self._sticky) > self.max_sticky_keys:
+                    self._sticky.popitem(last=False)
+
+            chosen.in_flight += 1
+        POOL_IN_FLIGHT.inc(pool=self.name, endpoint=chosen.url)
+        self._ensure_health_checks()
+        return chosen
+
+    # ---------- outcomes ----------
+
+    def release(self, endpoint, latency=None, ok=True):
+        """Finish a request started with pick(); latency in seconds, ok=False counts a failure."""
+        with self._lock:
+            endpoint.in_flight -= 1
+            if ok:
+                endpoint.failures = 0
+                endpoint.ejections = 0
+                if latency is not None:
+                    if endpoint.latency is None:
+                        endpoint.latency = latency
+                    else:
+                        endpoint.latency += self.smoothing * (latency - endpoint.latency)
+            else:
+                self._record_failure(endpoint)
+        POOL_IN_FLIGHT.dec(pool=self.name, endpoint=endpoint.url)
+        POOL_REQUESTS.inc(pool=self.name, endpoint=endpoint.url, outcome="ok" if ok else "error")
+
+    def _record_failure(self, endpoint):
+        endpoint.failures += 1
+        # Back from a cooldown but not yet succeeded: one failure is enough
+        limit = 1 if endpoint.ejections else self.max_failures
+        if endpoint.failures >= limit and endpoint.healthy(time.monotonic()):
+            self._eject(endpoint)
+
+    def _eject(self, endpoint):
+        cooldown = min(self.max_cooldown, self.cooldown * 2 ** endpoint.ejections)
+        endpoint.ejections += 1
+        endpoint.failures = 0
+        endpoint.ejected_until = time.monotonic() + cooldown
+        POOL_EJECTIONS.inc(pool=self.name, endpoint=endpoint.url)
+        POOL_HEALTHY.set(0, pool=self.name, endpoint=endpoint.url)
+        log.warning("pool.ejected", pool=self.name, endpoint=endpoint.url, cooldown=cooldown)
+
+    def _restore(self, endpoint):
+        with self._lock:
+            endpoint.ejected_until = 0.0
+            endpoint.failures = 0
+        POOL_HEALTHY.set(1, pool=self.name, endpoint=endpoint.url)
+        log.info("pool.restored", pool=self.name, endpoint=endpoint.url)
+
+    def drain(self, endpoint):
+        """Stop sending new requests to `endpoint`; requests in flight on it finish."""
+        with self._lock:
+            endpoint.draining = True
+        POOL_HEALTHY.set(0, pool=self.name, endpoint=endpoint.url)
+        log.info("pool.draining", pool=self.name, endpoint=endpoint.url, in_flight=endpoint.in_flight)
+
+    def undrain(self, endpoint):
+        """Put a drained endpoint back into rotation, with a clean failure record."""
+        with self._lock:
+            endpoint.draining = False
+            endpoint.ejected_until = 0.0
+            endpoint.failures = 0
+            endpoint.ejections = 0
+        POOL_HEALTHY.set(1, pool=self.name, endpoint=endpoint.url)
+        log.info("pool.undrained", pool=self.name, endpoint=endpoint.url)
+
+    @contextmanager
+    def acquire(self, key=None, exclude=(), ignore=()):
+        """
+        pick() and release() around a block. An exception counts as a
+        failure of the endpoint if is_endpoint_failure() says so and it is
+        not an instance of `ignore` (e.g. the caller abandoning a request
+        on purpose).
+        """
+        endpoint = self.pick(key, exclude)
+        start = time.perf_counter()
+        try:
+            yield endpoint
+        except ignore:
+            self.release(endpoint)
+            raise
+        except BaseException as e:
+            self.release(endpoint, ok=not is_endpoint_failure(e))
+            raise
+        self.release(endpoint, time.perf_counter() - start)
+
+    # ---------- health checks ----------
+
+    def _ensure_health_checks(self):
+        if self.health_path and self._health_thread is None:
+            with self._lock:
+                if self._health_thread is None:
+                    self._health_thread = threading.Thread(
+                        target=self._health_loop, name=f"pool-{self.name}-health", daemon=True)
+                    self._health_thread.start()
+
+    def _health_loop(self):
+        session = requests.Session()
+        while True:
+            time.sleep(self.health_interval)
+            for endpoint in self.endpoints:
+                if endpoint.draining:
+                    continue
+                try:
+                    ok = session.get(f"{endpoint.url}{self.health_path}", timeout=self.health_timeout).ok
+                except requests.RequestException:
+                    ok = False
+                healthy = endpoint.healthy(time.monotonic())
+                if ok and not healthy:
+                    self._restore(endpoint)
+                elif not ok and healthy:
+                    with self._lock:
+                        self._record_failure(endpoint)
+
+    def snapshot(self):
+        """Current state of every endpoint, for logs and health pages."""
+        now = time.monotonic()
+        with self._lock:
+            return [{
+                "url": e.url,
+                "healthy": e.healthy(now),
+                "in_flight": e.in_flight,
+                "latency_ms": round(e.latency * 1000, 1) if e.latency is not None else None,
+                "ejected_for": round(e.ejected_until - now, 1) if now < e.ejected_until else 0,
+                "draining": e.draining,
+            } for e in self.endpoints]
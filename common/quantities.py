@@ -0,0 +1,300 @@
+# common/quantities.py
+# Pulls budgets, deadlines, durations, counts and percentages out of
+# requirement text into typed values, without an LLM call.
+#
+#   extract("Budget is $50,000 and we need it live by March 2025")
+#   # [{"kind": "money", "subject": "budget", "comparator": "=", "value": 50000.0, "unit": "USD", ...},
+#   #  {"kind": "date", "subject": "deadline", "comparator": "<=", "date": "2025-03-01", "unit": "month", ...}]
+#
+#   python -m common.quantities --db requirements.db       # backfill stored requirements
+#
+# Values are normalised so they can be compared in SQL:
+#
+#   money      amount in the currency's units ("$1.2m" -> 1200000, unit USD);
+#              "budget of 1.5 million" has no currency, so unit NULL
+#   date       ISO date of the period's first day, unit = day/month/quarter/year
+#   duration   seconds ("three-month" -> 7776000, "under 2 seconds" -> 2)
+#   count      number of the thing counted, unit = the noun ("five developers" -> 5 developer)
+#   percent    0-100 ("99.9% uptime" -> 99.9)
+#
+# `subject` says what the value is about (budget, deadline, timeline,
+# response_time, users, concurrent_users, team_size, uptime, test_coverage),
+# from keywords in the same sentence; `comparator` is <=, >= or = from
+# words like "under", "at least", "by" in front of the figure. A date with
+# no keyword that must be met ("by March 2025") is a deadline. Spelled-out
+# numbers up to the millions are understood ("one hundred and fifty").
+# Values go to the requirement_values table, one row per value, linked to
+# the requirement they were read from.
+
+import argparse
+import re
+import sqlite3
+import time
+
+from common import metrics
+from common.log import get_logger
+
+log = get_logger("quantities")
+
+VALUES_EXTRACTED = metrics.counter(
+    "quantities_extracted_total", "Values extracted from requirement text", ["kind"])
+
+# ============================================
+# NUMBERS
+# ============================================
+UNITS = {w: i for i, w in enumerate(
+    "zero one two three four five six seven eight nine ten eleven twelve thirteen fourteen fifteen "
+    "sixteen seventeen eighteen nineteen".split())}
+TENS = {w: 10 * (i + 2) for i, w in enumerate("twenty thirty forty fifty sixty seventy eighty ninety".split())}
+SCALES = {"dozen": 12, "hundred": 100, "thousand": 1e3, "k": 1e3, "million": 1e6, "mn": 1e6, "m": 1e6,
+          "billion": 1e9, "bn": 1e9}
+
+_NUMBER_WORD = r"(?:%s)\b" % "|".join(sorted(list(UNITS) + list(TENS) + ["dozen", "hundred", "thousand",
+                                                                           "million", "billion"],
+                                              key=len, reverse=True))
+# "two thousand five hundred", "twenty-five", "one hundred and fifty"; "a" only
+# before a scale ("a dozen stores")
+_AFTER_SCALE = r"(?:(?<=hundred)|(?<=thousand)|(?<=million)|(?<=billion))"
+_WORD_NUMBER = (r"(?:an?\s+(?=(?:dozen|hundred|thousand|million|billion)\b))?%s(?:(?:%s\s+and)?[\s-]+%s)*"
+                % (_NUMBER_WORD, _AFTER_SCALE, _NUMBER_WORD))
+_DIGITS = (r"(?:\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?)"
+           r"(?:[\s-]?(?:hundred|thousand|million|billion|mn|bn|k|m)\b)?")
+# A number, with an optional scale ("1.2m", "50 thousand", "two hundred")
+NUMBER = r"(?P<num>%s|%s)" % (_DIGITS, _WORD_NUMBER)
+
+
+def parse_number(text):
+    """Value of a NUMBER match: "50,000", "1.2m", "two thousand five hundred", "a hundred and fifty"."""
+    words = re.findall(r"\d[\d,]*(?:\.\d+)?|[a-z]+", text)
+    if words[0][0].isdigit():
+        value = float(words[0].replace(",", ""))
+        return value * SCALES[words[1]] if len(words) > 1 else value
+    total = current = 0.0
+    for word in words:
+        if word in UNITS or word in TENS:
+            current += UNITS.get(word, TENS.get(word, 0))
+        elif word in ("hundred", "dozen"):
+            current = (current or 1) * SCALES[word]
+        elif word in SCALES:
+            total += (current or 1) * SCALES[word]
+            current = 0.0
+    return total + current
+
+
+# ============================================
+# PATTERNS
+# ============================================
+MONTHS = {m: i + 1 for i, m in enumerate(
+    "january february march april may june july august september october november december".split())}
+MONTHS.update({m[:3]: i for m, i in list(MONTHS.items())})
+MONTHS["sept"] = 9
+_MONTH = r"(?P<month>%s)\.?" % "|".join(sorted(MONTHS, key=len, reverse=True))
+
+CURRENCIES = {"$": "USD", "usd": "USD", "dollar": "USD", "dollars": "USD", "€": "EUR", "eur": "EUR",
+              "euro": "EUR", "euros": "EUR", "£": "GBP", "gbp": "GBP", "pound": "GBP", "pounds": "GBP",
+              "rs": "PKR", "pkr": "PKR", "rupee": "PKR", "rupees": "PKR", "₹": "INR", "inr": "INR"}
+
+SECONDS = {"ms": 0.001, "millisecond": 0.001, "s": 1, "sec": 1, "second": 1, "min": 60, "minute": 60,
+           "h": 3600, "hr": 3600, "hour": 3600, "day": 86400, "week": 7 * 86400, "month": 30 * 86400,
+           "year": 365 * 86400}
+
+# Counted nouns (singular) and the subject they belong to
+COUNTED = {
+    "users": "user customer visitor patient client shopper student subscriber account",
+    "team_size": "developer engineer programmer tester designer people person member staff",
+}
+COUNTED_OTHER = ("request transaction order booking language clinic store branch location server site "
+                 "device report page document")
+NOUNS = {noun: subject for subject, nouns in COUNTED.items() for noun in nouns.split()}
+NOUNS.update({noun: noun for noun in COUNTED_OTHER.split()})
+_NOUN = r"(?P<noun>%s)(?:e?s)?" % "|".join(sorted(set(NOUNS) | {"people"}, key=len, reverse=True))
+_NOUN_MODIFIER = r"(?:(?P<modifier>concurrent|simultaneous|active|daily|monthly|registered|full[- ]time|" \
+                 r"part[- ]time|new|total)\s+)?"
+
+PATTERNS = [
+    # Dates first, so their years and days are not read as counts
+    ("date", re.compile(r"\b(?P<year>(?:19|20)\d{2})-(?P<mnum>\d{2})-(?P<day>\d{2})\b")),
+    ("date", re.compile(r"\b(?P<day>\d{1,2})(?:st|nd|rd|th)?\s+(?:of\s+)?%s,?\s+(?P<year>(?:19|20)\d{2})\b"
+                        % _MONTH)),
+    ("date", re.compile(r"\b%s\s+(?P<day>\d{1,2})(?:st|nd|rd|th)?,?\s+(?P<year>(?:19|20)\d{2})\b" % _MONTH)),
+    ("date", re.compile(r"\b%s,?\s+(?P<year>(?:19|20)\d{2})\b" % _MONTH)),
+    ("date", re.compile(r"\bq(?P<quarter>[1-4])\s+(?P<year>(?:19|20)\d{2})\b")),
+    ("date", re.compile(r"\b(?P<keyword>by|in|before|until|till|from|after|end of|early|mid|late)\s+"
+                        r"(?P<year>(?:19|20)\d{2})\b")),
+    ("money", re.compile(r"(?P<currency>[$€£₹]|\brs\.?|\b(?:usd|eur|gbp|pkr|inr)\b)\s?" + NUMBER)),
+    ("money", re.compile(r"\b" + NUMBER + r"\s*(?P<currency>usd|eur|gbp|pkr|inr|dollars?|euros?|pounds?|rupees?)\b")),
+    # "budget of 1.5 million": no currency, so only right after the word and at the end of the phrase
+    ("money", re.compile(r"\b(?:budget|cost|funding|spend(?:ing)?)(?:\s+(?:is|of|at|around|about|approximately|"
+                         r"roughly|up to|under|below|within|at most|no more than|max(?:imum)?)\b|\s*:)*\s*"
+                         + NUMBER + r"(?=\s*(?:[.,;!?)]|$)|\s+(?:for|in|per|and|or|over|across|in total|overall|"
+                                    r"which|that|but|to)\b)")),
+    ("percent", re.compile(r"\b" + NUMBER + r"\s*(?:%|percent\b|per cent\b)")),
+    ("duration", re.compile(r"\b" + NUMBER + r"[\s-]?(?P<unit>ms|milliseconds?|s|secs?|seconds?|mins?|minutes?|h|hrs?|"
+                                            r"hours?|days?|weeks?|months?|years?)\b")),
+    ("count", re.compile(r"\b(?:team of|staff of)\s+" + NUMBER + r"\b")),
+    ("count", re.compile(r"\b" + NUMBER + r"\s+" + _NOUN_MODIFIER + _NOUN + r"\b")),
+]
+
+LESS = re.compile(r"\b(?:under|below|less than|fewer than|within|at most|no more than|max(?:imum)?|up to|"
+                  r"not exceed(?:ing)?|by|before|until|till|no later than|cap(?:ped)? (?:at|of))\W*$")
+MORE = re.compile(r"\b(?:at least|above|over|more than|minimum|no less than|exceed(?:ing|s)?|"
+                  r"after|from|starting|beyond)\W*$")
+
+SUBJECTS = [
+    ("money", re.compile(r"\bbudget|\bcost|\bspend|\bfunding|\binvest"), "budget"),
+    ("money", re.compile(r"\bprice|\bfee\b|\bcharge|\bsubscription"), "price"),
+    ("date", re.compile(r"\bdeadline|\bdue\b|\blaunch|\blive\b|\brelease|\bdeliver|\bready|\bship|\bcomplete|"
+                        r"\bfinish|\bdone\b"), "deadline"),
+    ("duration", re.compile(r"\bload|\brespon|\blatency|\bpage|\bscreen|\bquery|\bsearch"), "response_time"),
+    ("duration", re.compile(r"\btimeline|\bmvp\b|\bproject|\bdeliver|\bschedule|\bphase|\bdeadline|\bbuild"),
+     "timeline"),
+    ("percent", re.compile(r"\buptime|\bavailab|\bsla\b"), "uptime"),
+    ("percent", re.compile(r"\bcoverage"), "test_coverage"),
+]
+# Comparators implied by the word a date pattern starts with ("by 2025")
+KEYWORD_COMPARATORS = {"by": "<=", "before": "<=", "until": "<=", "till": "<=", "from": ">=", "after": ">="}
+# Durations that can be each subject, in seconds
+DURATION_RANGE = {"response_time": (0, 3600), "timeline": (86400, float("inf"))}
+_SENTENCE = re.compile(r"(?:[^.!?;\n]|[.!?;](?!\s|$))+")
+
+
+def _subject(kind, sentence, match, value, comparator):
+    if kind == "count":
+        groups = match.groupdict()
+        if groups.get("noun") is None:
+            return "team_size"
+        subject = NOUNS.get(groups["noun"], groups["noun"])
+        if subject == "users" and (groups.get("modifier") in ("concurrent", "simultaneous")
+                                   or re.search(r"\bconcurrent|\bsimultaneous|same time|at once", sentence)):
+            return "concurrent_users"
+        return subject
+    for subject_kind, pattern, subject in SUBJECTS:
+        if subject_kind == kind and pattern.search(sentence):
+            low, high = DURATION_RANGE.get(subject, (0, float("inf")))
+            if kind == "duration" and not low <= value < high:
+                continue
+            return subject
+    # "by March 2025", "no later than 1 June 2025": a date things must happen by
+    if kind == "date" and comparator == "<=":
+        return "deadline"
+    return kind
+
+
+def _value(kind, match):
+    groups = match.groupdict()
+    if kind == "date":
+        year = int(groups["year"])
+        if groups.get("quarter"):
+            return None, f"{year:04d}-{3 * int(groups['quarter']) - 2:02d}-01", "quarter"
+        month = int(groups["mnum"]) if groups.get("mnum") else MONTHS.get(groups.get("month"))
+        if month is None:
+            return None, f"{year:04d}-01-01", "year"
+        if groups.get("day"):
+            return None, f"{year:04d}-{month:02d}-{int(groups['day']):02d}", "day"
+        return None, f"{year:04d}-{month:02d}-01", "month"
+
+    value = parse_number(groups["num"])
+    if kind == "money":
+        currency = groups.get("currency")
+        return value, None, CURRENCIES[currency.rstrip(".")] if currency else None
+    if kind == "duration":
+        unit = groups["unit"]
+        base = "ms" if unit.startswith("milli") else unit if unit in ("ms", "s", "h") else unit.rstrip("s")
+        return value * SECONDS[base], None, "s"
+    if kind == "percent":
+        return value, None, "%"
+    noun = groups.get("noun") or "person"
+    return value, None, noun
+
+
+def extract(text):
+    """Typed values in `text`, in order of appearance."""
+    if not text:
+        return []
+    lowered = text.lower().replace("’", "'")
+    if not re.search(r"\d|%|[$€£₹]|\b(?:" + "|".join(list(UNITS)[1:] + list(TENS)) + r"|a dozen)\b", lowered):
+        return []
+
+    taken = []
+    values = []
+    for kind, pattern in PATTERNS:
+        for match in pattern.finditer(lowered):
+            start, end = match.span()
+            if any(start < e and s < end for s, e in taken):
+                continue
+            try:
+                value, date, unit = _value(kind, match)
+            except (KeyError, ValueError):
+                continue
+            taken.append((start, end))
+            sentence = next((m.group() for m in _SENTENCE.finditer(lowered) if m.start() <= start < m.end()),
+                            lowered)
+            # Bounds come before the figure itself, or are the keyword a date pattern matched
+            begin = match.start("num") if match.groupdict().get("num") else start
+            before = lowered[max(0, begin - 24):begin]
+            comparator = (KEYWORD_COMPARATORS.get(match.groupdict().get("keyword"))
+                          or ("<=" if LESS.search(before) else ">=" if MORE.search(before) else "="))
+            values.append({"kind": kind, "subject": _subject(kind, sentence, match, value, comparator),
+                           "comparator": comparator, "value": value, "date": date, "unit": unit,
+                           "text": text[start:end], "start": start, "end": end})
+    values.sort(key=lambda v: v["start"])
+    return values
+
+
+# ============================================
+# STORAGE
+# ============================================
+
+def record(conn, project_id, requirement_id, values):
+    """Insert extracted values for one requirement; returns the number of rows."""
+    for value in values:
+        VALUES_EXTRACTED.inc(kind=value["kind"])
+    conn.executemany('''
+        INSERT INTO requirement_values (requirement_id, project_id, kind, subject, comparator,
+                                        value, unit, date_value, text)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', [(requirement_id, project_id, v["kind"], v["subject"], v["comparator"], v["value"], v["unit"],
+           v["date"], v["text"]) for v in values])
+    return len(values)
+
+
+def backfill(db_path, batch_size=5000):
+    """Extract values from stored requirements that have none yet; returns counts."""
+    conn = sqlite3.connect(db_path)
+    counts = {"requirements": 0, "values": 0}
+    started = time.perf_counter()
+    read = conn.cursor()
+    read.execute('''
+        SELECT id, project_id, content FROM requirements r
+        WHERE NOT EXISTS (SELECT 1 FROM requirement_values v WHERE v.requirement_id = r.id)
+        ORDER BY id
+    ''')
+    while True:
+        rows = read.fetchmany(batch_size)
+        if not rows:
+            break
+        with conn:
+            for requirement_id, project_id, content in rows:
+                counts["requirements"] += 1
+                counts["values"] += record(conn, project_id, requirement_id, extract(content))
+    conn.close()
+    counts["seconds"] = round(time.perf_counter() - started, 3)
+    log.info("quantities.backfill", db=db_path, **counts)
+    return counts
+
+
+def main():
+    from common.log import configure_logging
+
+    parser = argparse.ArgumentParser(description="Extract typed values from stored requirements")
+    parser.add_argument("--db", default="requirements.db")
+    args = parser.parse_args()
+    configure_logging()
+
+    from database.setup import init_database
+    init_database(args.db)
+    backfill(args.db)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# common/router.py
+# Per-turn model selection for the elicitation action.
+#
+# A turn's complexity (0..1) is estimated from the message alone - length,
+# sentence/list structure, numbers and NLU entities - plus a per-phase
+# weight, with no model call. The model ladder is ordered smallest first
+# and splits the range evenly: with two models, turns scoring up to 0.5
+# go to the small one. When time-to-first-token (which includes queueing
+# inside Ollama) rises above the target, scores are shifted down so more
+# traffic lands on the smaller, faster model.
+
+import re
+import threading
+
+from common import metrics
+
+ROUTED_TURNS = metrics.counter(
+    "router_turns_total", "Turns routed to each model", ["model"])
+ROUTER_PRESSURE = metrics.gauge(
+    "router_load_pressure", "0 when TTFT is at or below target, 1 at the maximum downshift")
+MODEL_LATENCY = metrics.histogram(
+    "router_model_latency_seconds", "Ollama call latency per routed model", ["model"])
+MODEL_PARSE = metrics.counter(
+    "router_model_parse_total", "LLM replies per model by JSON parse outcome", ["model", "outcome"])
+
+PHASE_WEIGHTS = {"vision": 0.1, "functional": 0.15, "non_functional": 0.25, "constraints": 0.25}
+
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)?")
+_SENTENCE_END = re.compile(r"[.!?]+(?:\s|$)")
+_LIST_ITEM = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+", re.MULTILINE)
+
+
+def turn_complexity(text, phase=None, entities=None):
+    """Cheap 0..1 estimate of how much reasoning a reply to `text` needs."""
+    words = len(text.split())
+    sentences = max(1, len(_SENTENCE_END.findall(text)))
+    list_items = len(_LIST_ITEM.findall(text))
+    mentions = len(_NUMBER.findall(text)) + len(entities or [])
+
+    score = (0.45 * min(1.0, words / 120)
+             + 0.15 * min(1.0, (sentences - 1) / 6 + list_items / 5)
+             + 0.15 * min(1.0, mentions / 6)
+             + PHASE_WEIGHTS.get(phase, 0.1))
+    return min(1.0, score)
+
+
+class ModelRouter:
+    """
+    Picks a model from `ladder` (smallest first) for each turn. Call
+    observe_ttft() with the time to first token of every call so the
+    router can downshift under load, and record_result() once the reply
+    is parsed so per-model latency and parse success can be compared.
+    """
+
+    def __init__(self, ladder, ttft_target=4.0, max_shift=0.5, smoothing=0.2):
+        self.ladder = list(ladder)
+        self.ttft_target = ttft_target
+        self.max_shift = max_shift
+        self.smoothing = smoothing
+        self._ttft = None
+        self._lock = threading.Lock()
+
+    def pressure(self):
+        """0..1: how far smoothed TTFT is above target (2x target or more = 1)."""
+        with self._lock:
+            ttft = self._ttft
+        if ttft is None or ttft <= self.ttft_target:
+            return 0.0
+        return min(1.0, ttft / self.ttft_target - 1)
+
+    def choose(self, complexity):
+        """Return (model, effective_complexity) for a turn of the given complexity."""
+        if len(self.ladder) == 1:
+            model = self.ladder[0]
+            effective = complexity
+        else:
+            pressure = self.pressure()
+            ROUTER_PRESSURE.set(pressure)
+            effective = max(0.0, complexity - self.max_shift * pressure)
+            index = min(len(self.ladder) - 1, int(effective * len(self.ladder)))
+            model = self.ladder[index]
+        ROUTED_TURNS.inc(model=model)
+        return model, effective
+
+    def observe_ttft(self, seconds):
+        with self._lock:
+            if self._ttft is None:
+                self._ttft = seconds
+            else:
+                self._ttft += self.smoothing * (seconds - self._ttft)
+
+    def record_result(self, model, latency, parsed):
+        MODEL_LATENCY.observe(latency, model=model)
+        MODEL_PARSE.inc(model=model, outcome="ok" if parsed else "failed")
@@ -0,0 +1,214 @@
+# common/tracing.py
+# Lightweight span tracing across backend -> Rasa -> action server -> Ollama.
+#
+# The backend mints a trace id per /api/chat request and passes it (plus the
+# id of its Rasa span) to Rasa in the message metadata. The action server
+# picks both up from tracker.latest_message and records its own spans as
+# children. Every process writes its spans to the shared trace_spans table
+# from a background thread so the hot path never waits on SQLite.
+#
+# Spans go to their own database file (traces.db next to the project
+# database), in WAL mode with synchronous=NORMAL, so the 8-10 rows written
+# per chat turn never hold the project database's write lock. Each writer
+# deletes spans older than TRACE_RETENTION_HOURS every PRUNE_INTERVAL
+# seconds.
+
+import contextvars
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from common.log import get_logger
+
+log = get_logger("tracing")
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+TRACE_RETENTION_HOURS = float(os.environ.get("TRACE_RETENTION_HOURS", "24"))
+PRUNE_INTERVAL = 60.0
+
+
+def new_trace_id():
+    return uuid.uuid4().hex
+
+
+def _new_span_id():
+    return uuid.uuid4().hex[:16]
+
+
+class Span:
+    def __init__(self, name, trace_id, parent_id, attributes):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = _new_span_id()
+        self.parent_id = parent_id
+        self.attributes = dict(attributes)
+        self.start_time = time.time()
+        self.duration_ms = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+
+def connect(db_path, timeout=10):
+    """Connection to a span database, creating trace_spans if needed."""
+    conn = sqlite3.connect(db_path, timeout=timeout)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS trace_spans (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            trace_id TEXT NOT NULL,
+            span_id TEXT NOT NULL,
+            parent_id TEXT,
+            service TEXT,
+            name TEXT NOT NULL,
+            start_time REAL,
+            duration_ms REAL,
+            attributes TEXT
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_trace_spans_trace ON trace_spans (trace_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_trace_spans_start ON trace_spans (start_time)')
+    conn.commit()
+    return conn
+
+
+class Tracer:
+    """Records spans for one service into the trace_spans table of `db_path` (traces.db)."""
+
+    def __init__(self, service, db_path, batch_size=200, flush_interval=1.0, enabled=True,
+                 retention_hours=TRACE_RETENTION_HOURS):
+        self.service = service
+        self.db_path = db_path
+        self.enabled = enabled
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention_hours = retention_hours
+        self._queue = queue.Queue()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self._conn = None
+        self._pruned = 0.0
+
+    @contextmanager
+    def span(self, name, trace_id=None, parent_id=None, **attributes):
+        """
+        Time a block of work. Nested spans inherit the trace and parent from
+        the enclosing span; pass trace_id/parent_id explicitly to continue a
+        trace started in another process.
+        """
+        parent = _current_span.get()
+        if trace_id is None:
+            trace_id = parent.trace_id if parent else new_trace_id()
+        if parent_id is None and parent is not None and parent.trace_id == trace_id:
+            parent_id = parent.span_id
+
+        span = Span(name, trace_id, parent_id, attributes)
+        token = _current_span.set(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.set(error=type(e).__name__)
+            raise
+        finally:
+            span.duration_ms = (time.perf_counter() - start) * 1000
+            _current_span.reset(token)
+            self._submit(span)
+
+    def _submit(self, span):
+        if not self.enabled:
+            return
+        self._queue.put((
+            span.trace_id, span.span_id, span.parent_id, self.service, span.name,
+            span.start_time, span.duration_ms, json.dumps(span.attributes, default=str),
+        ))
+        if self._writer is None:
+            with self._writer_lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(
+                        target=self._write_loop, name=f"tracer-{self.service}", daemon=True)
+                    self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            rows = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(rows) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    rows.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write(rows)
+
+    def _write(self, rows):
+        try:
+            # Only the writer thread uses this connection
+            if self._conn is None:
+                self._conn = connect(self.db_path)
+            self._conn.executemany('''
+                INSERT INTO trace_spans
+                    (trace_id, span_id, parent_id, service, name, start_time, duration_ms, attributes)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+            self._conn.commit()
+        except sqlite3.Error as e:
+            log.warning("trace.spans_dropped", count=len(rows), error=str(e))
+            return
+        if time.monotonic() - self._pruned >= PRUNE_INTERVAL:
+            self._pruned = time.monotonic()
+            self._prune()
+
+    def _prune(self):
+        try:
+            cursor = self._conn.execute('DELETE FROM trace_spans WHERE start_time < ?',
+                                        (time.time() - self.retention_hours * 3600,))
+            self._conn.commit()
+        except sqlite3.Error as e:
+            log.warning("trace.prune_failed", error=str(e))
+            return
+        if cursor.rowcount:
+            log.info("trace.pruned", service=self.service, spans=cursor.rowcount)
+
+
+def current_span():
+    return _current_span.get()
+
+
+def get_span_tree(conn, trace_id):
+    """Return the spans of a trace as a list of root nodes with nested children."""
+    rows = conn.execute('''
+        SELECT span_id, parent_id, service, name, start_time, duration_ms, attributes
+        FROM trace_spans WHERE trace_id = ? ORDER BY start_time
+    ''', (trace_id,)).fetchall()
+
+    nodes = {}
+    for span_id, parent_id, service, name, start_time, duration_ms, attributes in rows:
+        nodes[span_id] = {
+            "span_id": span_id,
+            "parent_id": parent_id,
+            "service": service,
+            "name": name,
+            "start_time": start_time,
+            "duration_ms": round(duration_ms, 3),
+            "attributes": json.loads(attributes or "{}"),
+            "children": [],
+        }
+
+    roots = []
+    for node in nodes.values():
+        parent = nodes.get(node["parent_id"])
+        if parent is not None:
+            parent["children"].append(node)
+        else:
+            roots.append(node)
+    return roots
@@ -0,0 +1,181 @@
+# common/tracker_store.py
+# Rasa tracker store on the project's SQLite database, with bounded retention.
+#
+#   tracker_store:                          # endpoints.yml
+#     type: common.tracker_store.SQLiteTrackerStore
+#     db: requirements.db
+#     max_turns: 20
+#     archive_every: 8
+#
+# Each conversation is one row in rasa_trackers holding the serialised
+# tracker. Once a tracker has more than max_turns + archive_every user
+# turns, the oldest ones are cut so that max_turns remain:
+#
+#   - their events are archived to conversation_history, on the row the
+#     backend already wrote for that exchange (matched by sender id and
+#     message text), or on a new row for messages that did not come
+#     through the backend (rasa shell, REST clients). The backend writes a
+#     row for every message, superseded ones included, so a backend turn
+#     without one (the write failed) is not archived as an exchange
+#   - the state they built up - slot values and an active loop - is carried
+#     over as SlotSet / ActiveLoop events in front of the retained turns
+#
+# so the tracker Rasa loads, and the event list it sends to the action
+# server with every action call, stays bounded however long a session runs.
+# Archiving archive_every turns at a time keeps the event list unchanged
+# between cuts, which the action's block-anchored history window relies on
+# for Ollama prompt-cache reuse.
+#
+# retrieve() returns every retained event, across conversation sessions,
+# so saving a tracker never drops an earlier session that has not been
+# archived yet. Only Rasa imports this module; database calls run on a
+# worker thread so they don't block Rasa's event loop.
+
+import asyncio
+import functools
+import json
+import sqlite3
+
+from rasa.core.tracker_store import SerializedTrackerAsText, TrackerStore
+from rasa.shared.core.conversation import Dialogue
+from rasa.shared.core.events import ActiveLoop, BotUttered, SlotSet, UserUttered
+
+from common.log import get_logger
+from database.setup import init_database
+
+log = get_logger("tracker_store")
+
+
+class SQLiteTrackerStore(TrackerStore, SerializedTrackerAsText):
+    """Keeps the last `max_turns` user turns per conversation and archives older ones."""
+
+    def __init__(self, domain=None, host=None, db="requirements.db", max_turns=20, archive_every=8,
+                 timeout=30.0, event_broker=None, **kwargs):
+        super().__init__(domain, event_broker, **kwargs)
+        self.db_path = host or db
+        self.max_turns = int(max_turns)
+        self.archive_every = int(archive_every)
+        self.timeout = float(timeout)
+        init_database(self.db_path)
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=self.timeout)
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, functools.partial(fn, *args))
+
+    # ---------- retention ----------
+
+    def _cut_index(self, events):
+        """Index of the first event to keep, or None while the tracker is within bounds."""
+        turn_starts = [i for i, event in enumerate(events) if isinstance(event, UserUttered)]
+        if len(turn_starts) <= self.max_turns + self.archive_every:
+            return None
+        return turn_starts[len(turn_starts) - self.max_turns]
+
+    def _carried_state(self, sender_id, archived, timestamp):
+        """SlotSet / ActiveLoop events that rebuild the state the archived events left behind."""
+        before = self.init_tracker(sender_id)
+        before.recreate_from_dialogue(Dialogue(sender_id, archived))
+        carried = [SlotSet(name, slot.value, timestamp=timestamp)
+                   for name, slot in before.slots.items() if slot.value != slot.initial_value]
+        if before.active_loop_name:
+            carried.append(ActiveLoop(before.active_loop_name, timestamp=timestamp))
+        return carried
+
+    @staticmethod
+    def _archived_turns(archived):
+        """Group archived events into (user event, bot texts, all events) per user turn."""
+        turns = []
+        for event in archived:
+            if isinstance(event, UserUttered):
+                turns.append((event, [], [event]))
+            elif turns:
+                turns[-1][2].append(event)
+                if isinstance(event, BotUttered) and event.text:
+                    turns[-1][1].append(event.text)
+        return turns
+
+    # ---------- storage ----------
+
+    async def save(self, tracker):
+        await self.stream_events(tracker)
+
+        events = list(tracker.events)
+        cut = self._cut_index(events)
+        turns = []
+        if cut is not None:
+            archived = events[:cut]
+            turns = self._archived_turns(archived)
+            events = self._carried_state(tracker.sender_id, archived, events[cut].timestamp) + events[cut:]
+
+        project_id = tracker.get_slot("project_id")
+        project_id = int(project_id) if project_id is not None else None
+        serialised = json.dumps(Dialogue(tracker.sender_id, events).as_dict())
+        await self._run(self._write, tracker.sender_id, project_id, serialised, len(events), turns)
+        if turns:
+            log.info("tracker.archived", sender_id=tracker.sender_id, turns=len(turns), kept_events=len(events))
+
+    def _write(self, sender_id, project_id, serialised, event_count, turns):
+        conn = self._connect()
+        try:
+            with conn:
+                for user, bot_texts, turn_events in turns:
+                    data = json.dumps([event.as_dict() for event in turn_events])
+                    cursor = conn.execute('''
+                        UPDATE conversation_history SET events = ?
+                        WHERE id = (SELECT id FROM conversation_history
+                                    WHERE sender_id = ? AND user_message = ? AND events IS NULL
+                                    ORDER BY id LIMIT 1)
+                    ''', (data, sender_id, user.text))
+                    # The backend tags its turns with turn_seq and saves a row for each
+                    if cursor.rowcount == 0 and not (user.metadata or {}).get("turn_seq"):
+                        conn.execute('''
+                            INSERT INTO conversation_history
+                                (project_id, user_message, bot_response, intent, sender_id, events, timestamp)
+                            VALUES (?, ?, ?, ?, ?, ?, datetime(?, 'unixepoch'))
+                        ''', (project_id, user.text, " ".join(bot_texts), user.intent_name,
+                              sender_id, data, user.timestamp))
+                conn.execute('''
+                    INSERT INTO rasa_trackers (sender_id, project_id, tracker, event_count, archived_turns)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(sender_id) DO UPDATE SET
+                        project_id = excluded.project_id,
+                        tracker = excluded.tracker,
+                        event_count = excluded.event_count,
+                        archived_turns = archived_turns + excluded.archived_turns,
+                        updated = CURRENT_TIMESTAMP
+                ''', (sender_id, project_id, serialised, event_count, len(turns)))
+        finally:
+            conn.close()
+
+    def _read(self, sender_id):
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT tracker FROM rasa_trackers WHERE sender_id = ?', (sender_id,)).fetchone()
+        finally:
+            conn.close()
+        return row[0] if row else None
+
+    async def retrieve(self, sender_id):
+        serialised = await self._run(self._read, sender_id)
+        if serialised is None:
+            return None
+        return self.deserialise_tracker(sender_id, serialised)
+
+    async def retrieve_full_tracker(self, conversation_id):
+        """Retained events only; archived turns live in conversation_history."""
+        return await self.retrieve(conversation_id)
+
+    async def exists(self, conversation_id):
+        return await self._run(self._read, conversation_id) is not None
+
+    def _keys(self):
+        conn = self._connect()
+        try:
+            return [row[0] for row in conn.execute('SELECT sender_id FROM rasa_trackers')]
+        finally:
+            conn.close()
+
+    async def keys(self):
+        return await self._run(self._keys)
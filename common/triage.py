@@ -0,0 +1,152 @@
+# common/triage.py
+# Answers trivial elicitation turns locally instead of calling the LLM.
+#
+#   kind, reason = classify_turn("ok", intent={"name": "confirm", "confidence": 0.97})
+#   if kind != "llm":
+#       reply, next_phase = local_reply(kind, phase, turn)
+#
+# Two kinds of turn have a predictable outcome:
+#
+#   ack   "ok", "yes, that's right", "sounds good": acknowledged with the
+#         phase's prompt for more input, and the phase stays
+#   done  "that's all", "no more features", "I think we're done": the phase
+#         advances (vision -> functional -> non_functional -> constraints ->
+#         done) and the reply opens the next one
+#
+# Only short messages without numbers qualify, and never a question ("is
+# it?", "that is it?"). A done phrase with more content around it ("that's
+# all, but it also needs an export") goes to the LLM, and so does an ack
+# that answers a yes/no question from the bot ("Should it work offline?" /
+# "yes"), since that carries a requirement.
+# Rasa's intent ranking backs the keyword rules: a confident `confirm`
+# counts as an ack even without a known phrase, and a confident `inform`
+# overrides the ack keywords.
+
+import re
+
+from common import metrics
+
+TRIAGE_TURNS = metrics.counter(
+    "triage_turns_total", "Elicitation turns by triage outcome (llm = sent to the model)", ["kind", "reason"])
+
+PHASE_ORDER = ["vision", "functional", "non_functional", "constraints", "done"]
+
+# Messages longer than this always go to the LLM
+MAX_WORDS = 12
+# Rasa intent confidence above which the NLU verdict overrides the keywords
+CONFIDENT = 0.9
+
+ACK_WORDS = frozenset("""
+    ok okay k yes yeah yep yup sure correct right exactly indeed true absolutely agree agreed
+    sounds sound good great perfect fine cool alright thanks thank you
+    of course makes sense fair enough noted understood
+""".split())
+# Acknowledgements built from function words, which alone ("is it?") are not
+_ACK_PHRASE = re.compile(
+    r"\b(?:that'?s|that is|it'?s|it is) (?:right|correct|fine|good|great|perfect|true)\b"
+    r"|\b(?:i agree|got it|i see|i think so)\b")
+
+# Words that may surround a done phrase without making the turn substantive
+DONE_FILLER = ACK_WORDS | frozenset("""
+    the a i we can think for now so about any really more else guess believe all from me my side with
+    those these them
+    at this point stage there are to add have nothing let's lets go on please that's it
+    feature features requirement requirements constraint constraints detail details idea ideas
+    vision goal goals functional non quality
+""".split())
+
+_WORD = re.compile(r"[a-z0-9']+")
+_DIGIT = re.compile(r"\d")
+_DONE = re.compile(
+    r"\b(?:that'?s (?:all|it|everything)|that is (?:all|it|everything)|no (?:more|other|further)"
+    r"|nothing (?:else|more)|(?:we'?re|we are|i'?m|i am|all) (?:done|finished)|done|move on"
+    r"|next (?:phase|section|topic))\b")
+_YES_NO_QUESTION = re.compile(
+    r"(?:^|[.!?]\s+)(?:should|shall|do|does|did|is|are|was|were|will|would|can|could|must|has|have|may)\b"
+    r"[^.!?]*\?\s*$", re.IGNORECASE)
+
+ACK_REPLIES = {
+    "vision": [
+        "Got it. Who will use the system, and what problem should it solve for them?",
+        "Understood. What should the project make easier compared with how things work today?",
+    ],
+    "functional": [
+        "Got it. What other features should the system have?",
+        "Understood. Which other tasks should users be able to perform?",
+        "Okay. Is there another feature or workflow we should capture?",
+    ],
+    "non_functional": [
+        "Got it. Any other quality requirements - performance, security, availability or usability?",
+        "Understood. How many users should it support at once, and how fast should it respond?",
+    ],
+    "constraints": [
+        "Got it. Are there other constraints - budget, deadline, team size or mandated technology?",
+        "Understood. Is anything else limiting the project, such as hosting or compliance rules?",
+    ],
+}
+
+# Reply that opens each phase when the previous one is declared done
+PHASE_OPENERS = {
+    "functional": "Great, let's move on to features. What are the key things users should be able to do?",
+    "non_functional": "Thanks, that covers the features. Now for quality requirements: how many users "
+                      "should it support at the same time, and how quickly should it respond?",
+    "constraints": "Thanks. Finally, the constraints: what budget, deadline and team do you have, "
+                   "and is any technology mandated?",
+    "done": "✅ I believe I have captured all essential requirements. You can now export your SRS document. "
+            "Great work!",
+}
+
+
+def asks_yes_no(bot_text):
+    """True if the bot's last message ends with a yes/no question."""
+    return bool(bot_text) and bool(_YES_NO_QUESTION.search(bot_text.strip()))
+
+
+def classify_turn(text, intent=None, last_bot_text=None):
+    """
+    Return (kind, reason): kind is "ack", "done" or "llm". `intent` is Rasa's
+    {"name", "confidence"} for the message, `last_bot_text` the bot's
+    previous reply.
+    """
+    words = _WORD.findall(text.lower().replace("’", "'"))
+    name = (intent or {}).get("name")
+    confidence = (intent or {}).get("confidence") or 0.0
+
+    if not words or len(words) > MAX_WORDS or _DIGIT.search(text):
+        kind, reason = "llm", "substantive"
+    elif text.rstrip().endswith("?"):
+        kind, reason = "llm", "question"
+    elif _DONE.search(" ".join(words)):
+        leftover = _WORD.findall(_DONE.sub(" ", " ".join(words)))
+        if all(word in DONE_FILLER for word in leftover):
+            kind, reason = "done", "keywords"
+        else:
+            kind, reason = "llm", "substantive"
+    elif all(word in ACK_WORDS for word in _WORD.findall(_ACK_PHRASE.sub(" ", " ".join(words)))):
+        if name == "inform" and confidence >= CONFIDENT:
+            kind, reason = "llm", "nlu_inform"
+        else:
+            kind, reason = "ack", "keywords"
+    elif name == "confirm" and confidence >= CONFIDENT and len(words) <= 3:
+        kind, reason = "ack", "nlu_confirm"
+    else:
+        kind, reason = "llm", "substantive"
+
+    if kind == "ack" and asks_yes_no(last_bot_text):
+        kind, reason = "llm", "answers_question"
+    TRIAGE_TURNS.inc(kind=kind, reason=reason)
+    return kind, reason
+
+
+def next_phase(phase):
+    index = PHASE_ORDER.index(phase) if phase in PHASE_ORDER else 0
+    return PHASE_ORDER[min(index + 1, len(PHASE_ORDER) - 1)]
+
+
+def local_reply(kind, phase, turn=0):
+    """(reply, next_phase) for a turn classified as "ack" or "done"; `turn` rotates the templates."""
+    if kind == "done":
+        following = next_phase(phase)
+        return PHASE_OPENERS[following], following
+    replies = ACK_REPLIES.get(phase, ACK_REPLIES["vision"])
+    return replies[turn % len(replies)], phase
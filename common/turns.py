@@ -0,0 +1,65 @@
+# common/turns.py
+# Per-session turn sequencing shared by the backend and the action server.
+#
+# The backend bumps a session's turn number every time a new /api/chat
+# message arrives and passes that number to Rasa in the message metadata.
+# The action server compares its own turn number against the latest one
+# while it is generating; if a newer message has arrived, the generation
+# is stale and can be abandoned.
+
+import sqlite3
+
+from common import metrics
+
+# Work abandoned because a newer message superseded it. Kinds:
+#   turns_superseded      - backend: stale replies dropped
+#   generations_cancelled - action server: Ollama streams closed early
+#   analyses_skipped      - action server: analysis DB writes skipped
+CANCELLED_WORK = metrics.counter(
+    "cancelled_work_total",
+    "Work abandoned because a newer message arrived for the same session",
+    ["kind"]
+)
+
+
+def count_cancelled(kind, amount=1):
+    CANCELLED_WORK.inc(amount, kind=kind)
+
+
+def session_key(sender_id, project_id):
+    """Key identifying one conversation: a sender working on one project."""
+    return f"{sender_id}:{project_id}"
+
+
+def begin_turn(conn, key):
+    """Register a new incoming message for `key` and return its turn number."""
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT INTO session_turns (session_key, turn_seq, updated)
+        VALUES (?, 1, CURRENT_TIMESTAMP)
+        ON CONFLICT(session_key) DO UPDATE
+        SET turn_seq = turn_seq + 1, updated = CURRENT_TIMESTAMP
+    ''', (key,))
+    cursor.execute('SELECT turn_seq FROM session_turns WHERE session_key = ?', (key,))
+    turn_seq = cursor.fetchone()[0]
+    conn.commit()
+    return turn_seq
+
+
+def latest_turn(conn, key):
+    """Return the newest turn number registered for `key` (0 if none)."""
+    try:
+        row = conn.execute(
+            'SELECT turn_seq FROM session_turns WHERE session_key = ?', (key,)
+        ).fetchone()
+    except sqlite3.OperationalError:
+        # Table not created yet (database predates turn tracking)
+        return 0
+    return row[0] if row else 0
+
+
+def is_superseded(conn, key, turn_seq):
+    """True if a newer message than `turn_seq` has arrived for `key`."""
+    if not key or not turn_seq:
+        return False
+    return latest_turn(conn, key) > int(turn_seq)
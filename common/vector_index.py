@@ -0,0 +1,345 @@
+# common/vector_index.py
+# Per-project in-memory index of requirement embeddings for "what else did
+# they say about this?" lookups, without scanning the requirements table.
+#
+#   index = project_index(db_path, project_id)
+#   with index.lock:
+#       index.refresh(conn)
+#       hits = index.search(embedder.embed(["export reports as PDF"]), k=10)[0]   # [(id, cosine), ...]
+#
+#   python -m common.vector_index --db requirements.db --backfill      # embed older requirements
+#   python -m common.vector_index --db requirements.db --project 1 --query "export reports"
+#
+# requirements.embedding holds each requirement's unit vector as float16
+# bytes (common/embeddings.py), written by the action when it stores the
+# requirement. The index is a cache of those columns: one file per project
+# and embedder next to the database (<db>.vectors/project-1-hashing-384.idx),
+# the ids as int64 followed by the vectors as float16, memory-mapped on
+# load so opening a million-vector project costs nothing up front.
+# Requirements added since the file was written are read from SQLite into
+# an in-memory float16 tail; once the tail is an eighth of the file (at least
+# SAVE_EVERY rows) the file is rewritten. New rows are found by id, so a
+# requirement embedded late (--backfill after a failed embedding) is not
+# picked up that way: backfill rebuilds the files of the projects it
+# touched, and every process reloads a file that changed on disk.
+#
+# A search is a batch of queries against the whole matrix, CHUNK_ROWS rows
+# at a time, keeping the best k per query with argpartition. Converting
+# float16 to float32 costs several times the matrix product itself, so the
+# first search keeps a float32 copy of the vectors in memory as long as it
+# fits in VECTOR_INDEX_RESIDENT_MB; bigger projects are converted chunk by
+# chunk from the mapped file on every search.
+
+import argparse
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from common import metrics
+from common.embeddings import from_blob, get_embedder, to_blob
+from common.log import configure_logging, get_logger
+
+log = get_logger("vector_index")
+
+SEARCH_SECONDS = metrics.histogram("vector_search_seconds", "Vector index search latency")
+
+# Rows converted to float32 and multiplied at once
+CHUNK_ROWS = 16384
+# Unsaved rows that trigger rewriting the index file
+SAVE_EVERY = 1024
+# Project indexes kept open per process
+CACHED_PROJECTS = 16
+# Memory for float32 copies of a project's vectors
+RESIDENT_BYTES = int(os.environ.get("VECTOR_INDEX_RESIDENT_MB", "1024")) * 2 ** 20
+
+
+def index_directory(db_path):
+    return f"{db_path}.vectors"
+
+
+class ProjectIndex:
+    """One project's vectors for one embedder: a memory-mapped file plus an in-memory tail."""
+
+    def __init__(self, directory, project_id, model, dimensions):
+        self.lock = threading.Lock()
+        self.project_id = project_id
+        self.model = model
+        self.dimensions = dimensions
+        self.path = os.path.join(directory, f"project-{project_id}-{re.sub(r'[^A-Za-z0-9.-]+', '-', model)}.idx")
+        self._unmap()
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.tail = np.zeros((0, dimensions), dtype=np.float16)
+        self._reset()
+        self._load()
+
+    def __len__(self):
+        return len(self.base_ids) + self.tail_count
+
+    def _reset(self):
+        """Forget everything in memory: the mapped file, the tail and the float32 copy."""
+        self._unmap()
+        self.tail_count = 0
+        self.last_id = 0
+        self.resident = None
+        self.resident_ids = None
+        self.resident_count = 0
+        self.stamp = None
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _load(self):
+        self.stamp = self._file_stamp()
+        if self.stamp is None:
+            return
+        rows = self.stamp[1] // (8 + 2 * self.dimensions)
+        if rows:
+            self.base_ids = np.memmap(self.path, dtype=np.int64, mode="r", shape=(rows,))
+            self.base = np.memmap(self.path, dtype=np.float16, mode="r", offset=8 * rows,
+                                  shape=(rows, self.dimensions))
+            self.last_id = max(self.last_id, int(self.base_ids.max()))
+
+    def add(self, ids, vectors):
+        """Append unit vectors for requirement ids larger than any already indexed."""
+        needed = self.tail_count + len(ids)
+        if needed > len(self.ids):
+            capacity = max(needed, 2 * len(self.ids), 64)
+            self.ids = np.resize(self.ids, capacity)
+            tail = np.zeros((capacity, self.dimensions), dtype=np.float16)
+            tail[:self.tail_count] = self.tail[:self.tail_count]
+            self.tail = tail
+        self.ids[self.tail_count:needed] = ids
+        self.tail[self.tail_count:needed] = vectors
+        self.tail_count = needed
+        self.last_id = max(self.last_id, int(ids.max()))
+
+    def refresh(self, conn):
+        """Add the project's requirements embedded since the last refresh; rewrite the file when due."""
+        if self._file_stamp() != self.stamp:
+            # Rewritten by another process, or rebuilt by backfill
+            self._reset()
+            self._load()
+        rows = conn.execute('SELECT id, embedding FROM requirements WHERE project_id = ? AND id > ? '
+                            'AND embedding_model = ? ORDER BY id',
+                            (self.project_id, self.last_id, self.model)).fetchall()
+        rows = [(i, blob) for i, blob in rows if blob and len(blob) == 2 * self.dimensions]
+        if rows:
+            self.add(np.array([i for i, _ in rows], dtype=np.int64),
+                     np.vstack([from_blob(blob) for _, blob in rows]))
+        if self.tail_count >= max(SAVE_EVERY, len(self.base_ids) // 8):
+            self.save()
+
+    def rebuild(self, conn):
+        """Index every embedded requirement of the project again and rewrite the file."""
+        self._reset()
+        rows = conn.execute('SELECT id, embedding FROM requirements WHERE project_id = ? AND embedding_model = ? '
+                            'ORDER BY id', (self.project_id, self.model)).fetchall()
+        rows = [(i, blob) for i, blob in rows if blob and len(blob) == 2 * self.dimensions]
+        if rows:
+            self.add(np.array([i for i, _ in rows], dtype=np.int64),
+                     np.vstack([from_blob(blob) for _, blob in rows]))
+            self.save()
+        elif os.path.exists(self.path):
+            os.remove(self.path)
+
+    def save(self):
+        """Rewrite the index file with the tail folded in and map it again."""
+        if not self.tail_count:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(self.base_ids.tobytes())
+            f.write(self.ids[:self.tail_count].tobytes())
+            for start in range(0, len(self.base), CHUNK_ROWS):
+                f.write(self.base[start:start + CHUNK_ROWS].tobytes())
+            f.write(self.tail[:self.tail_count].tobytes())
+        vectors = len(self)
+        self._unmap()
+        try:
+            os.replace(temporary, self.path)
+        except OSError as e:
+            # Windows refuses while another process has the file mapped; keep the tail for next time
+            os.remove(temporary)
+            self._load()
+            log.warning("vector_index.save_failed", project_id=self.project_id, error=str(e))
+            return
+        self.tail_count = 0
+        self._load()
+        log.info("vector_index.saved", project_id=self.project_id, model=self.model, vectors=vectors)
+
+    def _unmap(self):
+        self.base_ids = np.zeros(0, dtype=np.int64)
+        self.base = np.zeros((0, self.dimensions), dtype=np.float16)
+
+    def _stored(self, start, end):
+        """(ids, float32 vectors) of rows start..end of the file followed by the tail."""
+        parts = []
+        for ids, vectors, offset, count in ((self.base_ids, self.base, 0, len(self.base_ids)),
+                                            (self.ids, self.tail, len(self.base_ids), self.tail_count)):
+            low, high = max(start - offset, 0), min(end - offset, count)
+            if low < high:
+                parts.append((ids[low:high], vectors[low:high].astype(np.float32)))
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate([p[0] for p in parts]), np.vstack([p[1] for p in parts])
+
+    def _make_resident(self):
+        """Bring the float32 copy up to date; False if the project is too big to keep one."""
+        count = len(self)
+        if count * self.dimensions * 4 > RESIDENT_BYTES:
+            self.resident = self.resident_ids = None
+            self.resident_count = 0
+            return False
+        if self.resident is None or count > len(self.resident):
+            capacity = max(count, 2 * self.resident_count, 64)
+            resident = np.zeros((capacity, self.dimensions), dtype=np.float32)
+            resident_ids = np.zeros(capacity, dtype=np.int64)
+            resident[:self.resident_count] = self.resident[:self.resident_count] if self.resident_count else 0
+            resident_ids[:self.resident_count] = self.resident_ids[:self.resident_count] if self.resident_count else 0
+            self.resident, self.resident_ids = resident, resident_ids
+        for start in range(self.resident_count, count, CHUNK_ROWS):
+            end = min(start + CHUNK_ROWS, count)
+            self.resident_ids[start:end], self.resident[start:end] = self._stored(start, end)
+        self.resident_count = count
+        return True
+
+    def _chunks(self):
+        if self._make_resident():
+            for start in range(0, self.resident_count, CHUNK_ROWS):
+                end = min(start + CHUNK_ROWS, self.resident_count)
+                yield self.resident_ids[start:end], self.resident[start:end]
+            return
+        for start in range(0, len(self), CHUNK_ROWS):
+            yield self._stored(start, min(start + CHUNK_ROWS, len(self)))
+
+    def search(self, queries, k=10, exclude=()):
+        """
+        For each row of `queries` (unit vectors), the k most similar
+        requirements as [(id, cosine), ...], most similar first.
+        """
+        start = time.perf_counter()
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        fetch = k + len(exclude)
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_ids = np.zeros((len(queries), 0), dtype=np.int64)
+        for ids, block in self._chunks():
+            scores = queries @ block.T
+            if scores.shape[1] > fetch:
+                top = np.argpartition(-scores, fetch - 1, axis=1)[:, :fetch]
+                scores = np.take_along_axis(scores, top, axis=1)
+                ids = np.asarray(ids)[top]
+            else:
+                ids = np.broadcast_to(np.asarray(ids), scores.shape)
+            best_scores = np.hstack([best_scores, scores])
+            best_ids = np.hstack([best_ids, ids])
+            if best_scores.shape[1] > fetch:
+                top = np.argpartition(-best_scores, fetch - 1, axis=1)[:, :fetch]
+                best_scores = np.take_along_axis(best_scores, top, axis=1)
+                best_ids = np.take_along_axis(best_ids, top, axis=1)
+        order = np.argsort(-best_scores, axis=1)
+        results = []
+        for scores, ids, rank in zip(best_scores, best_ids, order):
+            hits = [(int(ids[i]), float(scores[i])) for i in rank if int(ids[i]) not in exclude]
+            results.append(hits[:k])
+        SEARCH_SECONDS.observe(time.perf_counter() - start)
+        return results
+
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def project_index(db_path, project_id, embedder=None):
+    """The cached index of a project's requirements for `embedder` (default get_embedder())."""
+    embedder = embedder or get_embedder()
+    if embedder.dimensions is None:
+        embedder.embed(["dimensions"])
+    key = (os.path.abspath(db_path), project_id, embedder.name)
+    with _indexes_lock:
+        index = _indexes.pop(key, None) or ProjectIndex(index_directory(db_path), project_id, embedder.name,
+                                                        embedder.dimensions)
+        _indexes[key] = index
+        while len(_indexes) > CACHED_PROJECTS:
+            _indexes.popitem(last=False)
+        return index
+
+
+# ============================================
+# BACKFILL & CLI
+# ============================================
+
+def backfill(db_path, embedder=None, batch_size=256):
+    """Embed requirements stored without an embedding from `embedder`; returns counts."""
+    embedder = embedder or get_embedder()
+    start = time.perf_counter()
+    conn = sqlite3.connect(db_path)
+    embedded, last_id, touched = 0, 0, set()
+    while True:
+        rows = conn.execute('SELECT id, content, project_id FROM requirements WHERE id > ? '
+                            'AND (embedding IS NULL OR embedding_model IS NOT ?) ORDER BY id LIMIT ?',
+                            (last_id, embedder.name, batch_size)).fetchall()
+        if not rows:
+            break
+        vectors = embedder.embed([content or "" for _, content, _ in rows])
+        conn.executemany('UPDATE requirements SET embedding = ?, embedding_model = ? WHERE id = ?',
+                         [(to_blob(vector), embedder.name, requirement_id)
+                          for (requirement_id, _, _), vector in zip(rows, vectors)])
+        conn.commit()
+        embedded += len(rows)
+        touched.update(project_id for _, _, project_id in rows)
+        last_id = rows[-1][0]
+    # Embedded rows can be older than ones already indexed, which refresh()
+    # would never read: rebuild those projects' files. Processes holding
+    # them reload on their next refresh.
+    for project_id in touched:
+        index = project_index(db_path, project_id, embedder)
+        with index.lock:
+            index.rebuild(conn)
+    conn.close()
+    result = {"embedded": embedded, "projects": len(touched), "seconds": round(time.perf_counter() - start, 2)}
+    log.info("vector_index.backfilled", model=embedder.name, **result)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embed requirements and search them")
+    parser.add_argument("--db", default="requirements.db")
+    parser.add_argument("--backfill", action="store_true", help="embed requirements that have no embedding yet")
+    parser.add_argument("--project", type=int)
+    parser.add_argument("--query")
+    parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+    configure_logging(level="WARNING")
+
+    if args.backfill:
+        print(backfill(args.db))
+    if args.query and args.project:
+        embedder = get_embedder()
+        conn = sqlite3.connect(args.db)
+        index = project_index(args.db, args.project, embedder)
+        with index.lock:
+            index.refresh(conn)
+            hits = index.search(embedder.embed([args.query]), k=args.k)[0]
+        for requirement_id, score in hits:
+            content = (conn.execute('SELECT content FROM requirements WHERE id = ?',
+                                    (requirement_id,)).fetchone() or [""])[0]
+            print(f"{score:.3f}  #{requirement_id}  {content}")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# common/warmup.py
+# Keeps the Ollama model loaded so elicitation turns don't pay the model load.
+#
+# Ollama unloads a model once it has been idle for its keep_alive (5 minutes
+# by default), and the next request then pays load_duration - several
+# seconds for phi3:mini on CPU - on top of generation. ModelWarmer preloads
+# the model when the action server starts, sends every real request with a
+# longer keep_alive, and, when nothing has used the model for almost a whole
+# keep_alive, sends an empty generate request that only resets the timer.
+#
+# Turns whose Ollama-reported load_duration exceeds COLD_LOAD_SECONDS count
+# as cold starts, so their latency can be compared with warm turns.
+
+import re
+import threading
+import time
+
+import requests
+
+from common import metrics
+from common.log import get_logger
+
+log = get_logger("warmup")
+
+# load_duration above this means the model was (re)loaded for the request
+COLD_LOAD_SECONDS = 0.5
+
+WARMUP_REQUESTS = metrics.counter(
+    "ollama_warmup_requests_total", "Preload and keep-warm requests sent to Ollama", ["kind", "outcome"])
+WARMUP_SECONDS = metrics.histogram(
+    "ollama_warmup_seconds", "Latency of preload and keep-warm requests", ["kind"])
+TURN_LATENCY = metrics.histogram(
+    "ollama_turn_seconds", "Ollama total_duration per chat turn, by cold or warm model", ["start"])
+MODEL_RESIDENT = metrics.gauge(
+    "ollama_model_resident", "1 while the model is believed to be loaded in Ollama", ["endpoint", "model"])
+
+
+def parse_keep_alive(value):
+    """Seconds for an Ollama keep_alive ("30m", "1h", "300s", 300); None means forever (negative)."""
+    if isinstance(value, (int, float)):
+        seconds = float(value)
+    else:
+        match = re.fullmatch(r"\s*(-?[\d.]+)\s*(ms|s|m|h)?\s*", str(value))
+        if not match:
+            raise ValueError(f"invalid keep_alive: {value!r}")
+        unit = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[match.group(2) or "s"]
+        seconds = float(match.group(1)) * unit
+    return None if seconds < 0 else seconds
+
+
+def is_cold_start(stats):
+    return (stats.get("load_duration") or 0) / 1e9 > COLD_LOAD_SECONDS
+
+
+class ModelWarmer:
+    """
+    Preloads `model` and keeps it resident. Call touch() after every real
+    request so keep-warm pings are only sent while the model sits idle.
+    `margin` is how long before the expected unload the ping goes out;
+    with max_idle set, pings stop once there has been no real traffic for
+    that long and Ollama is allowed to unload the model.
+    """
+
+    def __init__(self, base_url, model, keep_alive="30m", margin=30.0, max_idle=None, timeout=120):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.keep_alive = keep_alive
+        self.keep_alive_seconds = parse_keep_alive(keep_alive)
+        self.margin = margin
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self._last_used = time.monotonic()
+        self._last_real_use = time.monotonic()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Preload in the background, then keep the model warm until the process exits."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="ollama-warmer", daemon=True)
+            self._thread.start()
+
+    def _resident(self, value):
+        MODEL_RESIDENT.set(value, endpoint=self.base_url, model=self.model)
+
+    def touch(self, stats=None):
+        """Record a real request (and its cold/warm latency when stats are given)."""
+        now = time.monotonic()
+        self._last_used = now
+        self._last_real_use = now
+        self._resident(1)
+        if stats and stats.get("total_duration") is not None:
+            start = "cold" if is_cold_start(stats) else "warm"
+            TURN_LATENCY.observe(stats["total_duration"] / 1e9, start=start)
+            if start == "cold":
+                log.info("ollama.cold_start", model=self.model, load_ms=round(stats["load_duration"] / 1e6))
+        self._wake.set()
+
+    def ping(self, kind):
+        """Empty generate request: loads the model if needed and resets its keep_alive timer."""
+        start = time.perf_counter()
+        try:
+            response = requests.post(f"{self.base_url}/api/generate", timeout=self.timeout,
+                                     json={"model": self.model, "keep_alive": self.keep_alive})
+            response.raise_for_status()
+        except requests.RequestException as e:
+            WARMUP_REQUESTS.inc(kind=kind, outcome="error")
+            self._resident(0)
+            log.warning("warmup.failed", kind=kind, model=self.model, error=str(e))
+            return False
+        elapsed = time.perf_counter() - start
+        WARMUP_REQUESTS.inc(kind=kind, outcome="ok")
+        WARMUP_SECONDS.observe(elapsed, kind=kind)
+        self._resident(1)
+        self._last_used = time.monotonic()
+        log.info("warmup.ok", kind=kind, model=self.model, ms=round(elapsed * 1000))
+        return True
+
+    def _run(self):
+        while not self.ping("preload"):
+            time.sleep(min(30.0, self.margin))
+        if self.keep_alive_seconds is None:
+            return  # keep_alive < 0: Ollama keeps the model loaded forever
+
+        while True:
+            due = self._last_used + max(1.0, self.keep_alive_seconds - self.margin)
+            self._wake.clear()
+            if self._wake.wait(timeout=max(0.0, due - time.monotonic())):
+                continue  # real traffic reset the timer
+            if self.max_idle is not None and time.monotonic() - self._last_real_use > self.max_idle:
+                log.info("warmup.idle_release", model=self.model)
+                self._resident(0)
+                self._wake.wait()
+                continue
+            if not self.ping("keep_warm"):
+                # Retry shortly; _last_used is unchanged so the next round pings again
+                self._wake.wait(timeout=min(30.0, self.margin))
@@ -1,15 +1,29 @@
+import argparse
+import json
 import sqlite3
-import os
-import requests
 import sys
+import time
 from pathlib import Path
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from common import doctor
+from common.log import configure_logging, get_logger
+
 DB_PATH = "../requirements.db"
 
-def init_database():
+log = get_logger("setup")
+
+def add_column(cursor, table, column, declaration):
+    """Add a column to an existing table unless it is already there"""
+    columns = [row[1] for row in cursor.execute(f"PRAGMA table_info({table})")]
+    if column not in columns:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+
+def init_database(db_path=DB_PATH):
     """Initialize SQLite database with required tables"""
     
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -84,121 +98,183 @@ def init_database():
         )
     ''')
     
+    # Latest turn number per sender/project, used to cancel stale generations
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS session_turns (
+            session_key TEXT PRIMARY KEY,
+            turn_seq INTEGER NOT NULL DEFAULT 0,
+            updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Timing spans for each stage of a chat turn live in traces.db
+    # (common/tracing.py), away from this file's write lock
+    
+    # Token counts and Ollama-reported timings (nanoseconds) for every LLM call
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS llm_calls (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            project_id INTEGER,
+            session_key TEXT,
+            trace_id TEXT,
+            phase TEXT,
+            model TEXT,
+            prompt_eval_count INTEGER,
+            eval_count INTEGER,
+            total_duration INTEGER,
+            load_duration INTEGER,
+            prompt_eval_duration INTEGER,
+            eval_duration INTEGER,
+            complexity REAL,
+            parse_ok INTEGER,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (project_id) REFERENCES projects(id)
+        )
+    ''')
+    # Routing columns, added after the ledger was introduced
+    add_column(cursor, 'llm_calls', 'complexity', 'REAL')
+    add_column(cursor, 'llm_calls', 'parse_ok', 'INTEGER')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_llm_calls_project ON llm_calls (project_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_llm_calls_phase ON llm_calls (phase)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_llm_calls_model ON llm_calls (model)')
+    
+    # Live Rasa trackers (common/tracker_store.py); turns cut from them are
+    # archived, as Rasa events, on their conversation_history rows
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS rasa_trackers (
+            sender_id TEXT PRIMARY KEY,
+            project_id INTEGER,
+            tracker TEXT NOT NULL,
+            event_count INTEGER,
+            archived_turns INTEGER NOT NULL DEFAULT 0,
+            updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    add_column(cursor, 'conversation_history', 'sender_id', 'TEXT')
+    add_column(cursor, 'conversation_history', 'events', 'TEXT')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_conversation_history_sender ON conversation_history (sender_id)')
+    
+    # Lexicon-detected ambiguities (common/ambiguity.py) next to the LLM's ones
+    add_column(cursor, 'ambiguities', 'source', "TEXT DEFAULT 'llm'")
+    add_column(cursor, 'ambiguities', 'terms', 'TEXT')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_ambiguities_project_content ON ambiguities (project_id, content)')
+    
+    # Typed values read from requirement text (common/quantities.py): money,
+    # dates, durations (seconds), counts and percentages
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS requirement_values (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            requirement_id INTEGER,
+            project_id INTEGER,
+            kind TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            comparator TEXT NOT NULL DEFAULT '=',
+            value REAL,
+            unit TEXT,
+            date_value TEXT,
+            text TEXT,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (requirement_id) REFERENCES requirements(id),
+            FOREIGN KEY (project_id) REFERENCES projects(id)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_requirement_values_project ON requirement_values (project_id, subject)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_requirement_values_requirement ON requirement_values (requirement_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_requirement_values_kind ON requirement_values (kind, value)')
+    
+    # Contradictions found by the local checks (common/contradictions.py) name both requirements
+    add_column(cursor, 'contradictions', 'source', "TEXT DEFAULT 'llm'")
+    add_column(cursor, 'contradictions', 'requirement_id', 'INTEGER')
+    add_column(cursor, 'contradictions', 'other_requirement_id', 'INTEGER')
+    
+    # Duplicate suppression (common/dedupe.py): a normalised content hash,
+    # unique per project, and MinHash band keys for near duplicates.
+    # Statements folded into an existing requirement go to requirement_merges
+    add_column(cursor, 'requirements', 'content_hash', 'TEXT')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS requirement_minhash (
+            project_id INTEGER,
+            band_key INTEGER NOT NULL,
+            requirement_id INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_requirement_minhash_band ON requirement_minhash (project_id, band_key)')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS requirement_merges (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            project_id INTEGER,
+            requirement_id INTEGER,
+            content TEXT NOT NULL,
+            req_type TEXT,
+            priority TEXT,
+            kind TEXT NOT NULL,
+            similarity REAL,
+            source TEXT DEFAULT 'action',
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (requirement_id) REFERENCES requirements(id),
+            FOREIGN KEY (project_id) REFERENCES projects(id)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_requirement_merges_requirement ON requirement_merges (requirement_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_requirement_merges_project ON requirement_merges (project_id)')
+    # Rows from before the hash column are NULL, which the index allows; the
+    # one-off python -m common.dedupe hashes them
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_requirements_project_hash '
+                   'ON requirements (project_id, content_hash)')
+    
+    # Requirement embeddings (common/embeddings.py) as float16 bytes, tagged
+    # with the embedder; common/vector_index.py searches them per project
+    add_column(cursor, 'requirements', 'embedding', 'BLOB')
+    add_column(cursor, 'requirements', 'embedding_model', 'TEXT')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_requirements_project ON requirements (project_id)')
+    
     conn.commit()
     conn.close()
-    print(f"✓ Database initialized at {DB_PATH}")
+    log.info("db.initialized", path=db_path)
 
-def check_rasa_server():
-    """Verify Rasa server is running on port 5005"""
-    try:
-        response = requests.get("http://localhost:5005/", timeout=5)
-        print("✓ Rasa server is running on http://localhost:5005")
-        return True
-    except:
-        print("✗ Rasa server NOT running. Start with: rasa run -m models --enable-api --port 5005")
-        return False
-
-def check_action_server():
-    """Verify action server is running on port 5055"""
-    try:
-        response = requests.get("http://localhost:5055/webhook", timeout=5)
-        print("✓ Action server is running on http://localhost:5055")
-        return True
-    except:
-        print("✗ Action server NOT running. Start with: rasa run actions")
-        return False
-
-def check_ollama_server():
-    """Verify Ollama server is running on port 11434"""
-    try:
-        response = requests.post(
-            "http://localhost:11434/api/tags",
-            timeout=5
-        )
-        models = response.json().get("models", [])
-        if models:
-            print(f"✓ Ollama server is running with models: {[m.get('name') for m in models[:3]]}")
-            return True
+def report(results):
+    """Log one line per probe; returns True when every dependency is healthy."""
+    for result in results:
+        fields = {k: v for k, v in result.items() if k not in ("name", "ok")}
+        if result["ok"]:
+            log.info("check.ok", service=result["name"], **fields)
         else:
-            print("✗ Ollama running but no models found. Pull a model: ollama pull phi3:mini")
-            return False
-    except:
-        print("✗ Ollama server NOT running. Start with: ollama serve")
-        return False
+            log.error("check.failed", service=result["name"], **fields)
 
-def check_flask_backend():
-    """Verify Flask backend is running on port 5000"""
-    try:
-        response = requests.get("http://localhost:5000/api/health", timeout=5)
-        print("✓ Flask backend is running on http://localhost:5000")
-        return True
-    except:
-        print("✗ Flask backend NOT running. Start with: python backend/app.py")
-        return False
-
-def check_database():
-    """Verify database exists and has proper schema"""
-    db_path = "requirements.db"
-    if not os.path.exists(db_path):
-        print(f"✗ Database not found at {db_path}")
-        return False
-    
-    try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        # Check tables exist
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-        tables = [row[0] for row in cursor.fetchall()]
-        
-        required_tables = ['projects', 'requirements', 'ambiguities', 'contradictions', 'conversation_history']
-        missing = [t for t in required_tables if t not in tables]
-        
-        conn.close()
-        
-        if missing:
-            print(f"✗ Database missing tables: {missing}")
-            return False
-        
-        print(f"✓ Database OK with tables: {', '.join(required_tables)}")
-        return True
-    except Exception as e:
-        print(f"✗ Database error: {e}")
-        return False
-
-def main():
-    print("\n" + "="*60)
-    print("REQUIREMENTS BOT - SETUP VERIFICATION")
-    print("="*60 + "\n")
-    
-    checks = [
-        ("Rasa Server (port 5005)", check_rasa_server),
-        ("Action Server (port 5055)", check_action_server),
-        ("Ollama Server (port 11434)", check_ollama_server),
-        ("Flask Backend (port 5000)", check_flask_backend),
-        ("SQLite Database", check_database),
-    ]
-    
-    results = []
-    for name, check_func in checks:
-        print(f"Checking {name}...")
-        results.append(check_func())
-        print()
-    
-    print("="*60)
-    passed = sum(results)
+    passed = sum(1 for r in results if r["ok"])
     total = len(results)
-    print(f"SUMMARY: {passed}/{total} checks passed")
-    print("="*60 + "\n")
-    
     if passed == total:
-        print("✓ All systems ready! Bot is operational.")
-        print("\nYou can now access the chatbot at: http://localhost:3000")
+        log.info("setup.summary", passed=passed, total=total, status="ready", frontend="http://localhost:3000")
     else:
-        print("✗ Some systems are not running. Please check the messages above.")
-    
+        log.error("setup.summary", passed=passed, total=total, status="incomplete")
     return passed == total
 
+def main(db_path=DB_PATH, timeout=doctor.PROBE_TIMEOUT, full_integrity=False, as_json=False):
+    """Probe all dependencies concurrently and report latency and state"""
+    log.info("setup.verification_start")
+    results = doctor.run_probes(doctor.default_probes(db_path, timeout=timeout, full_integrity=full_integrity))
+    if as_json:
+        print(json.dumps(results, indent=2))
+        return all(r["ok"] for r in results)
+    return report(results)
+
 if __name__ == "__main__":
-    init_database()
-    sys.exit(0 if main() else 1)
+    parser = argparse.ArgumentParser(description="Create the database and check every dependency")
+    parser.add_argument("--db", default=DB_PATH, help="SQLite database path")
+    parser.add_argument("--timeout", type=float, default=doctor.PROBE_TIMEOUT, help="per-probe timeout (seconds)")
+    parser.add_argument("--full-integrity", action="store_true", help="PRAGMA integrity_check instead of quick_check")
+    parser.add_argument("--watch", type=float, default=None, metavar="SECONDS", help="re-check every N seconds")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    configure_logging(fmt="text")
+    init_database(args.db)
+    if args.watch:
+        try:
+            while True:
+                main(args.db, args.timeout, args.full_integrity, args.json)
+                time.sleep(args.watch)
+        except KeyboardInterrupt:
+            pass
+    else:
+        sys.exit(0 if main(args.db, args.timeout, args.full_integrity, args.json) else 1)
@@ -12,9 +12,16 @@ const ChatInterface = ({ projectId }) => {
     }
   ]);
   const [inputValue, setInputValue] = useState('');
-  const [isLoading, setIsLoading] = useState(false);
+  // Number of messages still waiting for a reply. Sending is allowed while
+  // a reply is pending so the user can correct themselves; the backend
+  // cancels the stale generation.
+  const [pendingCount, setPendingCount] = useState(0);
+  const isLoading = pendingCount > 0;
   const [summary, setSummary] = useState(null);
   const messagesEndRef = useRef(null);
+  // Message ids keep counting across overlapping sends; the greeting is 1
+  const nextMessageId = useRef(2);
+  const newMessageId = () => nextMessageId.current++;
 
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
@@ -47,15 +54,15 @@ const ChatInterface = ({ projectId }) => {
     if (!inputValue.trim()) return;
 
     const userMessage = {
-      id: messages.length + 1,
+      id: newMessageId(),
       text: inputValue,
       sender: 'user',
       timestamp: new Date()
     };
 
-    setMessages([...messages, userMessage]);
+    setMessages(prev => [...prev, userMessage]);
     setInputValue('');
-    setIsLoading(true);
+    setPendingCount(count => count + 1);
 
     try {
       const response = await axios.post('http://localhost:5000/api/chat', {
@@ -64,9 +71,9 @@ const ChatInterface = ({ projectId }) => {
         sender_id: 'user_1'
       });
 
-      if (response.data.success) {
+      if (response.data.success && !response.data.cancelled) {
         const botMessage = {
-          id: messages.length + 2,
+          id: newMessageId(),
           text: response.data.bot_response,
           sender: 'bot',
           timestamp: new Date()
@@ -77,14 +84,14 @@ const ChatInterface = ({ projectId }) => {
     } catch (error) {
       console.error('Error sending message:', error);
       const errorMessage = {
-        id: messages.length + 2,
+        id: newMessageId(),
         text: 'Sorry, I encountered an error. Please try again.',
         sender: 'bot',
         timestamp: new Date()
       };
       setMessages(prev => [...prev, errorMessage]);
     } finally {
-      setIsLoading(false);
+      setPendingCount(count => count - 1);
     }
   };
 
@@ -144,12 +151,11 @@ const ChatInterface = ({ projectId }) => {
               placeholder="Type your requirement or response..."
               value={inputValue}
               onChange={(e) => setInputValue(e.target.value)}
-              disabled={isLoading}
               className="message-input"
             />
             <button
               type="submit"
-              disabled={isLoading || !inputValue.trim()}
+              disabled={!inputValue.trim()}
               className="send-btn"
             >
               Send